@@ -1,14 +1,111 @@
 from flask import request, jsonify, current_app
 from flask_socketio import SocketIO, emit, join_room, leave_room
-from sqlalchemy import or_, text
+from sqlalchemy import or_, text, func
 from backend.db import db
-from backend.db.models import Equipment, PLCDataConfig, Log
-from datetime import datetime
+from backend.db.models import Equipment, PLCDataConfig, Log, LOG_VALUE_FIELDS
+from telemetry_codec import decode_log_batch, msgpack_available, MSGPACK_CONTENT_TYPE
+from datetime import datetime, timezone
+import io
+import time
+import zlib
+import threading
+
+# 一括保存のINSERT 1文あたりの行数（DBのパラメータ数上限に対する余裕）
+BULK_INSERT_CHUNK = 1000
+# gzip 圧縮されたリクエスト本文の展開後の上限（バイト）
+MAX_DECOMPRESSED_BODY = 64 * 1024 * 1024
+# 設定変更のロングポーリングで待機する最大時間（秒）
+CONFIG_LONG_POLL_MAX = 30
+
+class GzipRequestMiddleware:
+    """Content-Encoding: gzip のリクエスト本文を展開してからアプリに渡すWSGIミドルウェア"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        if environ.get("HTTP_CONTENT_ENCODING", "").lower() == "gzip":
+            try:
+                length = int(environ.get("CONTENT_LENGTH") or 0)
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                body = decompressor.decompress(environ["wsgi.input"].read(length), MAX_DECOMPRESSED_BODY)
+                if decompressor.unconsumed_tail:
+                    raise ValueError("展開後の本文が上限を超えています")
+            except (ValueError, zlib.error) as e:
+                start_response("400 Bad Request", [("Content-Type", "text/plain; charset=utf-8")])
+                return [f"Invalid gzip body: {e}".encode("utf-8")]
+            environ["wsgi.input"] = io.BytesIO(body)
+            environ["CONTENT_LENGTH"] = str(len(body))
+            del environ["HTTP_CONTENT_ENCODING"]
+        return self.wsgi_app(environ, start_response)
+
+class ConfigVersionNotifier:
+    """設備ごとの設定バージョンと、変更を待つロングポーリングへの通知
+
+    バージョンはサーバー起動時刻（ミリ秒）から始まる通し番号のため、
+    サーバーを再起動するとラズパイ側からは「変更あり」として見える。
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._base = int(time.time() * 1000)
+        self._counter = self._base
+        self._versions = {}
+
+    def get(self, equipment_id):
+        with self._cond:
+            return self._versions.get(equipment_id, self._base)
+
+    def bump(self, equipment_id):
+        """設定変更を記録して待機中のリクエストを起こす"""
+        with self._cond:
+            self._counter += 1
+            self._versions[equipment_id] = self._counter
+            self._cond.notify_all()
+            return self._counter
+
+    def wait(self, equipment_id, since, timeout):
+        """バージョンが since と異なるまで最大 timeout 秒待ち、現在のバージョンを返す"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._versions.get(equipment_id, self._base) != since, timeout)
+            return self._versions.get(equipment_id, self._base)
+
+config_versions = ConfigVersionNotifier()
+
+def conditional_json(data):
+    """内容のハッシュを ETag とした JSON 応答（If-None-Match が一致すれば 304 で本文を省略）"""
+    response = jsonify(data)
+    response.add_etag()
+    return response.make_conditional(request)
+
+def parse_log_timestamp(value):
+    """ログのタイムスタンプを UTC の naive datetime にする（ISO文字列・datetime。未指定は現在時刻）"""
+    if value is None:
+        return datetime.utcnow()
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    elif not isinstance(value, datetime):
+        raise ValueError(f"invalid timestamp: {value}")
+    if value.tzinfo is not None:
+        # "...Z" などタイムゾーン付きの時刻も naive で揃える（比較・保存で混在させない）
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
 
 def register_routes(app, socketio=None):
     print(f"🚀 [DEBUG] ===== APIルート登録開始 =====")
     print(f"🚀 [DEBUG] Flask app: {app}")
     print(f"🚀 [DEBUG] SocketIO: {socketio}")
+
+    # ラズパイからの gzip 圧縮された送信（大きなログのまとめ送信など）を受け付ける
+    app.wsgi_app = GzipRequestMiddleware(app.wsgi_app)
+
+    def notify_config_changed(*equipment_ids):
+        """設定変更をロングポーリング中のラズパイと Socket.IO の設備ルームへ通知"""
+        for equipment_id in set(filter(None, equipment_ids)):
+            version = config_versions.bump(equipment_id)
+            if socketio:
+                socketio.emit('config_changed', {"equipment_id": equipment_id, "version": version},
+                              to=f'equipment_{equipment_id}')
     
     @app.route("/api/register", methods=["POST"])
     def api_register():
@@ -34,6 +131,7 @@ def register_routes(app, socketio=None):
         
         equipment = Equipment.query.filter(or_(*search_conditions)).first()
 
+        previous_equipment_id = equipment.equipment_id if equipment else None
         if equipment:
             # 既存設備の更新
             equipment.equipment_id = equipment_id
@@ -68,6 +166,7 @@ def register_routes(app, socketio=None):
 
         try:
             db.session.commit()
+            notify_config_changed(equipment_id, previous_equipment_id)
             return jsonify({
                 "message": "登録完了", 
                 "cpu_serial_number": cpu_serial_number,
@@ -135,13 +234,13 @@ def register_routes(app, socketio=None):
     # ラズパイ側APIコール対応エンドポイント
     @app.route("/api/equipment/<equipment_id>", methods=["GET"])
     def get_equipment_config(equipment_id):
-        """設備基本設定を取得"""
+        """設備基本設定を取得（ETag 付き。If-None-Match が一致すれば 304）"""
         try:
             equipment = Equipment.query.filter_by(equipment_id=equipment_id).first()
             if not equipment:
                 return jsonify({"error": "Equipment not found"}), 404
             
-            return jsonify({
+            return conditional_json({
                 "equipment_id": equipment.equipment_id,
                 "manufacturer": equipment.manufacturer,
                 "series": equipment.series,
@@ -154,7 +253,7 @@ def register_routes(app, socketio=None):
                 "hostname": equipment.hostname,
                 "mac_address": equipment.mac_address,
                 "cpu_serial_number": getattr(equipment, "cpu_serial_number", "")  # CPUシリアル番号を追加
-            }), 200
+            })
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
@@ -189,6 +288,7 @@ def register_routes(app, socketio=None):
             print(f"🔍 [DEBUG] 受信したCPUシリアル番号: '{cpu_serial_number}'")
             
             equipment = None
+            previous_equipment_id = None
             
             if cpu_serial_number:
                 print(f"🔍 [DEBUG] CPUシリアル番号 '{cpu_serial_number}' で設備を検索中...")
@@ -196,6 +296,7 @@ def register_routes(app, socketio=None):
                 equipment = Equipment.query.filter_by(cpu_serial_number=cpu_serial_number).first()
                 
                 if equipment:
+                    previous_equipment_id = equipment.equipment_id
                     print(f"✅ [DEBUG] CPUシリアル番号で既存設備を発見!")
                     print(f"    既存設備ID: '{equipment.equipment_id}'")
                     print(f"    新設備ID: '{equipment_id}'")
@@ -248,6 +349,7 @@ def register_routes(app, socketio=None):
 
             print(f"💾 [DEBUG] データベースコミット実行中...")
             db.session.commit()
+            notify_config_changed(equipment_id, previous_equipment_id)
             print(f"✅ [DEBUG] 設備設定保存成功: {equipment_id}")
             print(f"🔧 [DEBUG] ===== save_equipment_config 正常終了 =====")
             return jsonify({"message": "Equipment config saved"}), 200
@@ -346,7 +448,7 @@ def register_routes(app, socketio=None):
 
     @app.route("/api/equipment/<equipment_id>/plc_configs", methods=["GET"])
     def get_plc_data_configs(equipment_id):
-        """PLCデータ設定を取得"""
+        """PLCデータ設定を取得（ETag 付き。If-None-Match が一致すれば 304）"""
         try:
             equipment = Equipment.query.filter_by(equipment_id=equipment_id).first()
             if not equipment:
@@ -360,13 +462,31 @@ def register_routes(app, socketio=None):
                     "enabled": config.enabled,
                     "address": config.address,
                     "scale_factor": config.scale_factor,
-                    "plc_data_type": getattr(config, "plc_data_type", "word")
+                    "plc_data_type": getattr(config, "plc_data_type", "word"),
+                    "scan_class": getattr(config, "scan_class", None),
+                    "deadband": getattr(config, "deadband", None),
+                    "deadband_percent": getattr(config, "deadband_percent", None)
                 })
             
-            return jsonify(configs), 200
+            return conditional_json(configs)
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
+    @app.route("/api/equipment/<equipment_id>/config_version", methods=["GET"])
+    def wait_config_version(equipment_id):
+        """設定バージョンを返す（ロングポーリング）
+
+        since に前回のバージョンを指定すると、変更されるか timeout 秒（最大 CONFIG_LONG_POLL_MAX）
+        経過するまで応答を保留する。since 省略時は現在のバージョンをすぐに返す。
+        """
+        since = request.args.get("since", type=int)
+        timeout = min(max(request.args.get("timeout", 25, type=float), 0), CONFIG_LONG_POLL_MAX)
+        if since is None:
+            version = config_versions.get(equipment_id)
+        else:
+            version = config_versions.wait(equipment_id, since, timeout)
+        return jsonify({"equipment_id": equipment_id, "version": version, "changed": version != since}), 200
+
     @app.route("/api/equipment/<equipment_id>/plc_configs", methods=["PUT"])
     def save_plc_data_configs(equipment_id):
         """PLCデータ設定を保存"""
@@ -418,7 +538,10 @@ def register_routes(app, socketio=None):
                     "enabled": config_data.get("enabled", False),
                     "address": config_data.get("address", ""),
                     "scale_factor": config_data.get("scale_factor", 1),
-                    "plc_data_type": config_data.get("plc_data_type", "word")
+                    "plc_data_type": config_data.get("plc_data_type", "word"),
+                    "scan_class": config_data.get("scan_class"),
+                    "deadband": config_data.get("deadband"),
+                    "deadband_percent": config_data.get("deadband_percent")
                 }
                 
                 # NULL値を除外
@@ -432,6 +555,7 @@ def register_routes(app, socketio=None):
                 db.session.execute(text(sql), filtered_data)
 
             db.session.commit()
+            notify_config_changed(equipment_id)
             print(f"✅ [DEBUG] PLCデータ設定保存成功: {equipment_id}")
             return jsonify({"message": "PLC configs saved (SQL fallback)"}), 200
         except Exception as e:
@@ -471,6 +595,14 @@ def register_routes(app, socketio=None):
             elif timestamp is None:
                 timestamp = datetime.utcnow()
 
+            # 変化分のみの送信（report-by-exception）は未送信項目を直前のログで補完
+            if data.get("partial"):
+                previous = Log.query.filter_by(equipment_id=equipment.id).order_by(Log.id.desc()).first()
+                if previous:
+                    for field in LOG_VALUE_FIELDS:
+                        if field not in data:
+                            data[field] = getattr(previous, field)
+
             # 簡潔なDB操作（greenlet回避）
             try:
                 log_entry = Log()
@@ -531,6 +663,123 @@ def register_routes(app, socketio=None):
             print(f"❌ PLCデータ処理エラー: {e}")
             return jsonify({"error": str(e)}), 500
 
+    @app.route("/api/logs/bulk", methods=["POST"])
+    def save_log_data_bulk():
+        """ログデータの一括保存（設備の検索1回・複数行INSERT・コミット1回）
+
+        リクエスト: /api/logs と同じ形式のログの配列（または {"logs": [...]}）
+                    Content-Type が application/x-msgpack の場合は列形式の MessagePack
+                    （telemetry_codec.encode_log_batch）
+        レスポンス: 件ごとの結果 {"index": i, "status": "ok" | "error", "error": 理由}
+        """
+        if request.mimetype == MSGPACK_CONTENT_TYPE:
+            if not msgpack_available():
+                return jsonify({"error": "MessagePack is not supported"}), 415
+            try:
+                items = decode_log_batch(request.get_data())
+            except (ValueError, KeyError, TypeError, IndexError) as e:
+                return jsonify({"error": f"Invalid MessagePack batch: {e}"}), 400
+        else:
+            data = request.get_json(silent=True)
+            items = data.get("logs") if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            return jsonify({"error": "JSON array is required"}), 400
+
+        results = [{"index": index, "status": "ok"} for index in range(len(items))]
+
+        def reject(index, reason):
+            results[index] = {"index": index, "status": "error", "error": reason}
+
+        # 形式の確認（設備IDは文字列のみ。リスト等はハッシュできず検索にも使えないため件ごとに拒否）
+        valid = {}
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                reject(index, "invalid item")
+            elif not item.get("equipment_id"):
+                reject(index, "equipment_id is required")
+            elif not isinstance(item["equipment_id"], str):
+                reject(index, "invalid equipment_id")
+            else:
+                valid[index] = item
+
+        # 設備IDの解決（1クエリ）
+        equipment_ids = {item["equipment_id"] for item in valid.values()}
+        equipments = {e.equipment_id: e for e in Equipment.query.filter(Equipment.equipment_id.in_(equipment_ids))} \
+            if equipment_ids else {}
+
+        # 変化分のみの送信を補完するため、設備ごとの直前のログ（1クエリ）
+        partial_ids = {equipments[item["equipment_id"]].id for item in valid.values()
+                       if item.get("partial") and item["equipment_id"] in equipments}
+        previous = {}
+        if partial_ids:
+            latest_ids = db.session.query(func.max(Log.id)).filter(Log.equipment_id.in_(partial_ids))\
+                                   .group_by(Log.equipment_id)
+            for log in Log.query.filter(Log.id.in_(latest_ids)):
+                previous[log.equipment_id] = {field: getattr(log, field) for field in LOG_VALUE_FIELDS}
+
+        rows = []
+        row_indexes = []
+        for index, item in valid.items():
+            equipment = equipments.get(item["equipment_id"])
+            if not equipment:
+                reject(index, "Equipment not found")
+                continue
+            try:
+                timestamp = parse_log_timestamp(item.get("timestamp"))
+            except ValueError as e:
+                reject(index, str(e))
+                continue
+
+            values = {field: item.get(field) for field in LOG_VALUE_FIELDS}
+            if item.get("partial"):
+                # 未送信項目はバッチ内の直前の値（無ければDBの直前のログ）で補完
+                base = previous.get(equipment.id, {})
+                values = {field: item[field] if field in item else base.get(field) for field in LOG_VALUE_FIELDS}
+            previous[equipment.id] = values
+            rows.append(dict(values, equipment_id=equipment.id, timestamp=timestamp))
+            row_indexes.append(index)
+
+        if rows:
+            try:
+                # 複数行INSERT（パラメータ数の上限を超えないよう分割）、コミットは1回
+                for start in range(0, len(rows), BULK_INSERT_CHUNK):
+                    db.session.execute(Log.__table__.insert().values(rows[start:start + BULK_INSERT_CHUNK]))
+                db.session.commit()
+            except Exception as db_error:
+                db.session.rollback()
+                print(f"❌ 一括DB保存エラー: {db_error}")
+                for index in row_indexes:
+                    reject(index, f"Database error: {db_error}")
+                rows = []
+
+        saved = len(rows)
+        print(f"📥 PLCデータ一括受信: {len(items)}件 / 保存 {saved}件")
+
+        # WebSocketには設備ごとの最新の1件のみ配信
+        # （保存はコミット済みのため、配信の失敗で 500 を返さない = 再送による二重登録を防ぐ）
+        if socketio and rows:
+            try:
+                names = {e.id: e.equipment_id for e in equipments.values()}
+                latest = {}
+                for row in rows:
+                    if row["equipment_id"] not in latest or row["timestamp"] >= latest[row["equipment_id"]]["timestamp"]:
+                        latest[row["equipment_id"]] = row
+                for row in latest.values():
+                    equipment_id = names[row["equipment_id"]]
+                    realtime_data = dict({field: row[field] for field in LOG_VALUE_FIELDS},
+                                         equipment_id=equipment_id, timestamp=row["timestamp"].isoformat(),
+                                         status="normal" if not row["error_code"] else "error")
+                    socketio.emit('plc_data_update', realtime_data, to='monitoring')
+                    socketio.emit('equipment_data_update', realtime_data, to=f'equipment_{equipment_id}')
+            except Exception as ws_error:
+                print(f"⚠️ WebSocket送信エラー (処理継続): {ws_error}")
+
+        return jsonify({
+            "saved": saved,
+            "rejected": len(items) - saved,
+            "results": results
+        }), 200
+
     @app.route("/api/logs/<equipment_id>/latest", methods=["GET"])
     def get_latest_data(equipment_id):
         """最新データ取得（初期表示用）"""
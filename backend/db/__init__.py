@@ -21,4 +21,29 @@ def init_db(app):
     with app.app_context():
         # テーブルを作成
         db.create_all()
-        print("✅ データベースが初期化されました") 
\ No newline at end of file
+        ensure_columns()
+        print("✅ データベースが初期化されました")
+
+# 既存テーブルに後から追加したカラム（create_all は既存テーブルを変更しないため）
+ADDED_COLUMNS = {
+    "plc_data_configs": {
+        "scan_class": "VARCHAR(20)",
+        "deadband": "FLOAT",
+        "deadband_percent": "FLOAT",
+    },
+}
+
+def ensure_columns():
+    """既存DBに不足しているカラムを追加する"""
+    from sqlalchemy import inspect, text
+    
+    inspector = inspect(db.engine)
+    for table, columns in ADDED_COLUMNS.items():
+        if not inspector.has_table(table):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table)}
+        for name, column_type in columns.items():
+            if name not in existing:
+                db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}"))
+                db.session.commit()
+                print(f"🔧 カラム追加: {table}.{name}") 
\ No newline at end of file
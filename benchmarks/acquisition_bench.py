@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+収集処理（read_from_real_plc）のベンチマーク
+
+ローカルのプロトコルシミュレータ（simulators/）に対して、接続プール・
+読み取りプラン・デコードを含む実際の読み取り処理を繰り返し実行し、
+メーカー × データ型の構成 × タグ数 ごとに以下を計測する。
+
+- スキャン/秒
+- 1スキャンの所要時間 p50 / p95 / p99
+- 1スキャンあたりの通信往復回数（シミュレータが受信した要求数）
+- 1スキャンあたりのCPU時間（計測スレッドのみ。シミュレータのスレッドは含まない）
+
+結果は JSON で保存でき、--compare で以前の結果と比較する（リリース間の
+ホットパスの性能劣化の確認用）。シミュレータは同じプロセスの別スレッドで
+動作するため、絶対値ではなく同じ環境での比較に使うこと。
+
+使い方:
+    python benchmarks/acquisition_bench.py [--vendors mitsubishi,keyence,omron,siemens]
+        [--tags 10,100,500,2000] [--mixes word,mixed,float] [--scans 100]
+        [--latency-ms 0] [--pipeline-window 0] [--output results.json] [--compare baseline.json]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import platform
+import argparse
+import subprocess
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from simulators.base import FaultInjector
+
+VENDORS = ("mitsubishi", "keyence", "omron", "siemens")
+# データ型の構成: 各タグに順に割り当てる型
+MIXES = {
+    "word": ["word"],
+    "mixed": ["word", "int16", "float32", "bit"],
+    "float": ["float32"],
+}
+DEFAULT_TAGS = (10, 100, 500, 2000)
+# 隣接タグ間のアドレス間隔（ワード）。読み取りプランの隙間許容内で適度にブロックが分かれる間隔
+TAG_STRIDE = 3
+
+def make_data_points(vendor, tag_count, mix, seed=0):
+    """メーカーのアドレス形式でデータ項目を生成（ビット項目は別エリアに配置）"""
+    rng = random.Random(seed)
+    types = MIXES[mix]
+    data_points = {}
+    word_offset = 100
+    bit_offset = 0
+    for i in range(tag_count):
+        data_type = types[i % len(types)]
+        if data_type == "bit":
+            bit = rng.randrange(16)
+            address = {
+                "mitsubishi": f"M{bit_offset * 16 + bit}",
+                "keyence": f"R{bit_offset}.{bit}",
+                "omron": f"CIO{bit_offset}.{bit:02d}",
+                "siemens": f"DB2.DBX{bit_offset * 2}.{bit % 8}",
+            }[vendor]
+            bit_offset += 1
+        else:
+            address = {
+                "mitsubishi": f"D{word_offset}",
+                "keyence": f"DM{word_offset}",
+                "omron": f"D{word_offset}",
+                "siemens": f"DB1.DB{'D' if data_type == 'float32' else 'W'}{word_offset * 2}",
+            }[vendor]
+            word_offset += TAG_STRIDE + (1 if data_type == "float32" else 0)
+        data_points[f"tag_{i}"] = {"address": address, "data_type": data_type, "scale": 10, "enabled": True}
+    return data_points
+
+def start_simulator(vendor, port, faults):
+    """メーカーに対応するシミュレータを起動: (シミュレータ, 設定)"""
+    if vendor == "mitsubishi":
+        from simulators.mc_server import MCSimulator
+        return MCSimulator(port, faults).start(), {"manufacturer": "三菱", "plc_port": port}
+    if vendor == "keyence":
+        from simulators.modbus_server import ModbusSimulator
+        return ModbusSimulator(port, faults).start(), {"manufacturer": "キーエンス", "plc_port": port, "modbus_port": port}
+    if vendor == "omron":
+        from simulators.fins_server import FinsSimulator
+        return FinsSimulator(port, faults).start(), {"manufacturer": "オムロン", "plc_port": port, "fins_transport": "tcp"}
+    from simulators.s7_server import S7Simulator
+    return S7Simulator(port, db_numbers=(1, 2), size=32768).start(), {"manufacturer": "シーメンス", "s7_port": port}
+
+def round_trips(simulator):
+    """シミュレータが受信した要求数（S7 シミュレータは計数できないため None）"""
+    stats = getattr(simulator, "stats", None)
+    return stats["frames"] if stats else None
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(p / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def run_case(agent, vendor, tag_count, mix, scans, warmup, port, faults, pipeline_window):
+    """1構成分の計測"""
+    simulator, settings = start_simulator(vendor, port, faults)
+    try:
+        data_points = make_data_points(vendor, tag_count, mix)
+        config = dict(settings, plc_ip="127.0.0.1", data_points=data_points, pipeline_window=pipeline_window)
+        port_arg = config.get("plc_port", port)
+        read = lambda: agent.read_from_real_plc(config, "127.0.0.1", port_arg, config["manufacturer"], data_points)
+
+        for _ in range(warmup):
+            read()
+
+        latencies = []
+        failures = 0
+        trips_before = round_trips(simulator)
+        cpu_before = time.thread_time()
+        started = time.perf_counter()
+        for _ in range(scans):
+            t0 = time.perf_counter()
+            values = read()
+            latencies.append(time.perf_counter() - t0)
+            if not values or len(values) < len(data_points):
+                failures += 1
+        elapsed = time.perf_counter() - started
+        cpu = time.thread_time() - cpu_before
+        trips_after = round_trips(simulator)
+    finally:
+        agent.connection_pool.close_all()
+        agent.circuit_breakers.reset()
+        simulator.stop()
+
+    latencies.sort()
+    trips = (trips_after - trips_before) / scans if trips_before is not None else None
+    if trips is None and vendor == "siemens":
+        # S7 は読み取りプランのリクエスト数（マルチ変数読み取り回数）
+        from plc_read_plan import get_read_plan, get_s7_multi_plan
+        trips = get_s7_multi_plan(get_read_plan("siemens", data_points)).request_count
+    return {
+        "vendor": vendor,
+        "mix": mix,
+        "tags": tag_count,
+        "scans": scans,
+        "failures": failures,
+        "scans_per_sec": round(scans / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "round_trips_per_scan": round(trips, 2) if trips is not None else None,
+        "cpu_ms_per_scan": round(cpu / scans * 1000, 3),
+    }
+
+def vendor_available(vendor, pipeline_window):
+    """メーカーの通信ライブラリ・シミュレータが使えるか"""
+    modules = {
+        "mitsubishi": [] if pipeline_window > 1 else ["pymcprotocol"],
+        "keyence": [] if pipeline_window > 1 else ["pymodbus"],
+        "omron": [],
+        "siemens": ["snap7"],
+    }[vendor]
+    for module in modules:
+        try:
+            __import__(module)
+        except ImportError:
+            return False
+    return True
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "numpy": numpy_version,
+    }
+
+def case_key(result):
+    return (result["vendor"], result["mix"], result["tags"])
+
+def print_results(results, baseline=None):
+    previous = {case_key(r): r for r in (baseline or {}).get("results", [])}
+    print("📊 収集処理ベンチマーク（ローカルシミュレータ）")
+    print(f"   {'メーカー':<11}{'構成':<7}{'タグ':>6}{'スキャン/秒':>12}{'p50ms':>9}{'p95ms':>9}{'p99ms':>9}"
+          f"{'往復/scan':>10}{'CPUms':>9}{'失敗':>5}" + ("   p50差" if previous else ""))
+    for r in results:
+        trips = f"{r['round_trips_per_scan']:>10}" if r["round_trips_per_scan"] is not None else f"{'-':>10}"
+        line = (f"   {r['vendor']:<11}{r['mix']:<7}{r['tags']:>6}{r['scans_per_sec']:>12}{r['p50_ms']:>9}"
+                f"{r['p95_ms']:>9}{r['p99_ms']:>9}{trips}{r['cpu_ms_per_scan']:>9}{r['failures']:>5}")
+        old = previous.get(case_key(r))
+        if old and old["p50_ms"]:
+            line += f"  {(r['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100:+6.1f}%"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="収集処理（read_from_real_plc）のベンチマーク")
+    parser.add_argument("--vendors", default=",".join(VENDORS), help="メーカー（カンマ区切り）")
+    parser.add_argument("--tags", default=",".join(str(n) for n in DEFAULT_TAGS), help="タグ数（カンマ区切り）")
+    parser.add_argument("--mixes", default=",".join(MIXES), help=f"データ型の構成（{'/'.join(MIXES)}）")
+    parser.add_argument("--scans", type=int, default=100, help="構成ごとの計測スキャン数")
+    parser.add_argument("--warmup", type=int, default=5, help="計測前のスキャン数")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="シミュレータの応答遅延（ネットワーク遅延の模擬）")
+    parser.add_argument("--pipeline-window", type=int, default=0, help="パイプライン読み取りのウィンドウ（三菱・キーエンス）")
+    parser.add_argument("--port", type=int, default=15500, help="シミュレータのポート（構成ごとに+1）")
+    parser.add_argument("--output", help="結果を保存するJSONファイル")
+    parser.add_argument("--compare", help="比較する以前の結果（JSON）")
+    args = parser.parse_args()
+
+    # 計測対象はホットパスのため、周期ごとのログ出力は抑止
+    logging.disable(logging.WARNING)
+    import plc_agent as agent
+
+    results = []
+    port = args.port
+    for vendor in [v.strip() for v in args.vendors.split(",") if v.strip()]:
+        if not vendor_available(vendor, args.pipeline_window):
+            print(f"⚠️ {vendor}: 通信ライブラリが無いためスキップ")
+            continue
+        for mix in [m.strip() for m in args.mixes.split(",") if m.strip()]:
+            for tag_count in [int(n) for n in args.tags.split(",") if n.strip()]:
+                faults = FaultInjector(latency_ms=args.latency_ms)
+                results.append(run_case(agent, vendor, tag_count, mix, args.scans, args.warmup,
+                                        port, faults, args.pipeline_window))
+                port += 1
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.output:
+        report = {
+            "environment": environment(),
+            "settings": {"scans": args.scans, "warmup": args.warmup, "latency_ms": args.latency_ms,
+                         "pipeline_window": args.pipeline_window, "tag_stride": TAG_STRIDE},
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 結果を保存しました: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@ from flask import request, jsonify
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from sqlalchemy import or_
 from backend.db import db
-from backend.db.models import Equipment, PLCDataConfig, Log
+from backend.db.models import Equipment, PLCDataConfig, Log, LOG_VALUE_FIELDS
 from datetime import datetime
 
 def register_routes(app, socketio=None):
@@ -272,7 +272,10 @@ def register_routes(app, socketio=None):
                     "enabled": config.enabled,
                     "address": config.address,
                     "scale_factor": config.scale_factor,
-                    "plc_data_type": getattr(config, "plc_data_type", "word")
+                    "plc_data_type": getattr(config, "plc_data_type", "word"),
+                    "scan_class": getattr(config, "scan_class", None),
+                    "deadband": getattr(config, "deadband", None),
+                    "deadband_percent": getattr(config, "deadband_percent", None)
                 })
             
             return jsonify(configs), 200
@@ -306,6 +309,10 @@ def register_routes(app, socketio=None):
                 # plc_data_type フィールドが存在する場合は設定
                 if hasattr(plc_config, "plc_data_type"):
                     plc_config.plc_data_type = config_data.get("plc_data_type", "word")
+                if hasattr(plc_config, "scan_class"):
+                    plc_config.scan_class = config_data.get("scan_class")
+                    plc_config.deadband = config_data.get("deadband")
+                    plc_config.deadband_percent = config_data.get("deadband_percent")
                 db.session.add(plc_config)
 
             db.session.commit()
@@ -337,6 +344,14 @@ def register_routes(app, socketio=None):
             elif timestamp is None:
                 timestamp = datetime.utcnow()
 
+            # 変化分のみの送信（report-by-exception）は未送信項目を直前のログで補完
+            if data.get("partial"):
+                previous = Log.query.filter_by(equipment_id=equipment.id).order_by(Log.id.desc()).first()
+                if previous:
+                    for field in LOG_VALUE_FIELDS:
+                        if field not in data:
+                            data[field] = getattr(previous, field)
+
             # 1. DBに保存（既存機能）
             log_entry = Log()
             log_entry.equipment_id = equipment.id
@@ -1,6 +1,10 @@
 import os
-import requests
+from http_transport import get_transport
+from telemetry_codec import encode_log_batch, msgpack_available, MSGPACK_CONTENT_TYPE, TELEMETRY_FORMAT
 import json
+import copy
+import time
+import threading
 from datetime import datetime
 from dotenv import load_dotenv
 import socket
@@ -8,6 +12,11 @@ import uuid
 
 load_dotenv()
 
+# 設定キャッシュの有効期間（秒）。期間内は中央サーバーへ問い合わせず、期間後は条件付きGET（304）で確認
+CONFIG_CACHE_SEC = float(os.getenv("CONFIG_CACHE_SEC", "10"))
+# 4xx でも時間をおけば受け付けられうる応答（タイムアウト・レート制限）は拒否ではなく未送信として扱う
+RETRYABLE_CLIENT_ERRORS = (408, 429)
+
 def get_cpu_serial_number():
     """ラズパイのCPUシリアル番号を取得（不変識別子）"""
     try:
@@ -53,14 +62,41 @@ class DatabaseAPI:
         self.central_server_ip = os.getenv("CENTRAL_SERVER_IP", "192.168.1.10")
         self.central_server_port = os.getenv("CENTRAL_SERVER_PORT", "5000")
         self.base_url = f"http://{self.central_server_ip}:{self.central_server_port}/api"
+        self.bulk_supported = True   # 中央サーバーが /api/logs/bulk に対応しているか
+        self.config_watch_supported = True   # 中央サーバーが設定変更のロングポーリングに対応しているか
+        self.telemetry_format = TELEMETRY_FORMAT if TELEMETRY_FORMAT != "msgpack" or msgpack_available() else "json"
+        # 同じ中央サーバーへの通信は keep-alive の接続プールを共有
+        self.http = get_transport(self.base_url)
+        # 条件付きGETの応答キャッシュ {パス: (ETag, 内容)}
+        self._etag_cache = {}
+        self.not_modified = 0
         
+    def _get_json_cached(self, path):
+        """ETag 付きで JSON を取得（未変更なら 304 でキャッシュを返す）
+
+        戻り値: (内容, ETag)。200/304 以外の応答は (None, None)。
+        """
+        cached = self._etag_cache.get(path)
+        headers = {"If-None-Match": cached[0]} if cached else None
+        response = self.http.get(path, headers=headers)
+        if response.status_code == 304 and cached:
+            self.not_modified += 1
+            return cached[1], cached[0]
+        if response.status_code == 200:
+            data = response.json()
+            etag = response.headers.get("ETag")
+            if etag:
+                self._etag_cache[path] = (etag, data)
+            else:
+                self._etag_cache.pop(path, None)
+            return data, etag
+        self._etag_cache.pop(path, None)
+        return None, None
+
     def get_equipment_config(self, equipment_id):
         """設備の基本設定を取得"""
         try:
-            response = requests.get(f"{self.base_url}/equipment/{equipment_id}", timeout=5)
-            if response.status_code == 200:
-                return response.json()
-            return None
+            return self._get_json_cached(f"/equipment/{equipment_id}")[0]
         except Exception as e:
             print(f"❌ 設備設定取得エラー: {e}")
             return None
@@ -76,7 +112,7 @@ class DatabaseAPI:
             if ip_address:
                 params['ip_address'] = ip_address
             
-            response = requests.get(f"{self.base_url}/equipment/search", params=params, timeout=5)
+            response = self.http.get("/equipment/search", params=params)
             if response.status_code == 200:
                 return response.json()
             return None
@@ -87,7 +123,7 @@ class DatabaseAPI:
     def check_equipment_setup_completed(self, equipment_id):
         """設備の初回セットアップが完了しているかチェック"""
         try:
-            response = requests.get(f"{self.base_url}/equipment/{equipment_id}/setup_status", timeout=5)
+            response = self.http.get(f"/equipment/{equipment_id}/setup_status")
             if response.status_code == 200:
                 result = response.json()
                 return result.get("setup_completed", False)
@@ -99,10 +135,8 @@ class DatabaseAPI:
     def get_plc_data_configs(self, equipment_id):
         """設備のPLCデータ設定を取得"""
         try:
-            response = requests.get(f"{self.base_url}/equipment/{equipment_id}/plc_configs", timeout=5)
-            if response.status_code == 200:
-                return response.json()
-            return []
+            data = self._get_json_cached(f"/equipment/{equipment_id}/plc_configs")[0]
+            return data if data is not None else []
         except Exception as e:
             print(f"❌ PLCデータ設定取得エラー: {e}")
             return []
@@ -111,8 +145,7 @@ class DatabaseAPI:
         """設備の基本設定を保存"""
         try:
             equipment_id = equipment_data.get("equipment_id")
-            response = requests.put(f"{self.base_url}/equipment/{equipment_id}", 
-                                  json=equipment_data, timeout=5)
+            response = self.http.put(f"/equipment/{equipment_id}", json=equipment_data)
             return response.status_code == 200
         except Exception as e:
             print(f"❌ 設備設定保存エラー: {e}")
@@ -121,8 +154,7 @@ class DatabaseAPI:
     def save_equipment_config_by_id(self, target_equipment_id, equipment_data):
         """指定された設備IDで設備の基本設定を保存（設備ID変更対応）"""
         try:
-            response = requests.put(f"{self.base_url}/equipment/{target_equipment_id}", 
-                                  json=equipment_data, timeout=5)
+            response = self.http.put(f"/equipment/{target_equipment_id}", json=equipment_data)
             return response.status_code == 200
         except Exception as e:
             print(f"❌ 設備設定保存エラー: {e}")
@@ -131,8 +163,7 @@ class DatabaseAPI:
     def save_plc_data_configs(self, equipment_id, plc_configs):
         """設備のPLCデータ設定を保存"""
         try:
-            response = requests.put(f"{self.base_url}/equipment/{equipment_id}/plc_configs", 
-                                  json=plc_configs, timeout=5)
+            response = self.http.put(f"/equipment/{equipment_id}/plc_configs", json=plc_configs)
             return response.status_code == 200
         except Exception as e:
             print(f"❌ PLCデータ設定保存エラー: {e}")
@@ -141,32 +172,131 @@ class DatabaseAPI:
     def mark_setup_completed(self, equipment_id):
         """設備の初回セットアップ完了をマーク"""
         try:
-            response = requests.post(f"{self.base_url}/equipment/{equipment_id}/mark_setup_completed", timeout=5)
+            response = self.http.post(f"/equipment/{equipment_id}/mark_setup_completed")
             return response.status_code == 200
         except Exception as e:
             print(f"❌ セットアップ完了マークエラー: {e}")
             return False
     
-    def send_log_data(self, equipment_id, log_data):
-        """ログデータを送信"""
+    def wait_config_version(self, equipment_id, since=None, timeout=25):
+        """設定バージョンの変更を待つ（ロングポーリング）
+
+        戻り値: 現在の設定バージョン。通信エラー時は None。
+        中央サーバーが未対応（404）の場合は config_watch_supported を False にして None を返す。
+        """
+        params = {"timeout": timeout}
+        if since is not None:
+            params["since"] = since
         try:
-            payload = {
-                "equipment_id": equipment_id,
-                "timestamp": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
-                **log_data
-            }
-            response = requests.post(f"{self.base_url}/logs", json=payload, timeout=5)
-            return response.status_code == 200
+            # 応答の保留時間に余裕を加えたタイムアウト（保留中の切断は再試行しない）
+            response = self.http.get(f"/equipment/{equipment_id}/config_version", params=params,
+                                     timeout=timeout + 10, retries=0)
+        except Exception as e:
+            print(f"⚠️ 設定変更の待機エラー: {e}")
+            return None
+        if response.status_code == 404:
+            self.config_watch_supported = False
+            return None
+        if response.status_code != 200:
+            return None
+        return response.json().get("version")
+
+    def _log_payload(self, equipment_id, log_data, partial=False, timestamp=None):
+        timestamp = timestamp or datetime.utcnow()
+        payload = {
+            "equipment_id": equipment_id,
+            "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+            **log_data
+        }
+        if partial:
+            # 中央サーバー側で未送信項目を直前の値で補完
+            payload["partial"] = True
+        return payload
+
+    def send_log_data(self, equipment_id, log_data, partial=False, timestamp=None):
+        """ログデータを送信（partial=True は変化した項目のみの送信）
+
+        timestamp を指定した場合はその時刻（UTC, 収集周期の予定時刻）で記録する。
+        戻り値は send_log_batch の記録ごとの結果と同じ（True=保存済み,
+        False=サーバーが拒否（4xx）, None=未送信（通信エラー・5xx など再送で成功しうるもの））。
+        """
+        try:
+            payload = self._log_payload(equipment_id, log_data, partial, timestamp)
+            response = self.http.post("/logs", json=payload)
         except Exception as e:
             print(f"❌ ログデータ送信エラー: {e}")
+            return None
+        if response.status_code == 200:
+            return True
+        if 400 <= response.status_code < 500 and response.status_code not in RETRYABLE_CLIENT_ERRORS:
+            print(f"⚠️ 中央サーバーがログを受け付けませんでした: HTTP {response.status_code}")
             return False
+        print(f"❌ ログデータ送信エラー: HTTP {response.status_code}")
+        return None
+
+    def send_log_batch(self, records):
+        """複数のログをまとめて送信（/api/logs/bulk）
+
+        records: equipment_id / payload / partial / timestamp 属性を持つ記録の列
+        戻り値は記録ごとの結果のリスト（True=保存済み, False=サーバーが拒否, None=未送信）。
+        一括送信に未対応の中央サーバーでは1件ずつ送信する。
+        TELEMETRY_FORMAT=msgpack の場合は列形式の MessagePack で送信し、
+        中央サーバーが未対応なら JSON に切り替える。
+        """
+        if not records:
+            return []
+        if not self.bulk_supported:
+            return self._send_log_each(records)
+        try:
+            if self.telemetry_format == "msgpack":
+                response = self.http.post("/logs/bulk", data=encode_log_batch(records),
+                                          content_type=MSGPACK_CONTENT_TYPE, timeout=10)
+                if response.status_code in (400, 415):
+                    print("⚠️ 中央サーバーが MessagePack 形式に未対応のため JSON で送信します")
+                    self.telemetry_format = "json"
+            if self.telemetry_format != "msgpack":
+                payload = [self._log_payload(r.equipment_id, r.payload, r.partial, r.timestamp) for r in records]
+                response = self.http.post("/logs/bulk", json=payload, timeout=10)
+            if response.status_code in (404, 405):
+                print("⚠️ 中央サーバーが一括送信に未対応のため1件ずつ送信します")
+                self.bulk_supported = False
+                return self._send_log_each(records)
+            if response.status_code != 200:
+                print(f"❌ ログ一括送信エラー: HTTP {response.status_code}")
+                return [None] * len(records)
+            results = [None] * len(records)
+            for item in response.json().get("results", []):
+                index = item.get("index")
+                if isinstance(index, int) and 0 <= index < len(records):
+                    results[index] = item.get("status") == "ok"
+            return results
+        except Exception as e:
+            print(f"❌ ログ一括送信エラー: {e}")
+            return [None] * len(records)
+
+    def _send_log_each(self, records):
+        # 1件ずつ送信（拒否された記録は飛ばし、未送信になった時点で以降も未送信として順序を保つ）
+        results = [None] * len(records)
+        for index, r in enumerate(records):
+            result = self.send_log_data(r.equipment_id, r.payload, partial=r.partial, timestamp=r.timestamp)
+            if result is None:
+                break
+            results[index] = result
+        return results
 
 class ConfigManager:
     """設定管理クラス（DB + JSONフォールバック）"""
     
-    def __init__(self):
+    def __init__(self, cache_sec=CONFIG_CACHE_SEC):
         self.db_api = DatabaseAPI()
         self.json_config_path = 'config/plc_config.json'
+        self.cache_sec = cache_sec
+        self.version = 0                 # 設定内容が変わるたびに増える番号
+        self._config = None
+        self._config_signature = None
+        self._config_loaded_at = 0.0
+        self._json_cache = None          # (ファイルの更新時刻とサイズ, 内容)
+        self._cache_lock = threading.Lock()
         
     def is_first_run_db(self):
         """データベースベースの初回起動判定"""
@@ -218,7 +348,36 @@ class ConfigManager:
             return True
     
     def load_plc_config(self):
-        """PLC設定を読み込み（DB優先、JSONフォールバック）"""
+        """PLC設定を読み込み（DB優先、JSONフォールバック。呼び出し元で変更できる複製を返す）"""
+        return copy.deepcopy(self.get_plc_config())
+
+    def get_plc_config(self, force=False):
+        """キャッシュ済みのPLC設定を返す（共有オブジェクトのため変更しないこと）
+
+        cache_sec 秒以内は中央サーバーにもSDカードにもアクセスしない。期間を過ぎると
+        条件付きGETで再確認し、内容が変わった場合のみ新しい設定に置き換えて version を上げる。
+        """
+        with self._cache_lock:
+            if (not force and self._config is not None
+                    and time.monotonic() - self._config_loaded_at < self.cache_sec):
+                return self._config
+            config = self._fetch_plc_config()
+            signature = json.dumps(config, sort_keys=True, ensure_ascii=False, default=str)
+            if signature != self._config_signature:
+                self._config = config
+                self._config_signature = signature
+                self.version += 1
+            self._config_loaded_at = time.monotonic()
+            return self._config
+
+    def invalidate_cache(self):
+        """設定キャッシュを破棄（次回の読み込みで再取得）"""
+        with self._cache_lock:
+            self._config_loaded_at = 0.0
+            self._json_cache = None
+
+    def _fetch_plc_config(self):
+        """ローカルJSONと中央サーバーから設定を組み立て"""
         # まずローカルJSONファイルから設備IDを取得
         local_config = self._load_json_config()
         equipment_id = local_config.get("equipment_id")
@@ -243,7 +402,9 @@ class ConfigManager:
                 "interval": equipment_config.get("interval"),
                 "central_server_ip": self.db_api.central_server_ip,
                 "central_server_port": self.db_api.central_server_port,
-                "data_points": {}
+                "data_points": {},
+                # 追加PLC（1台のRaspberry Piで複数PLCを収集）はローカル設定で定義
+                "plc_targets": local_config.get("plc_targets", [])
             }
             
             # PLCデータ設定を変換
@@ -253,7 +414,10 @@ class ConfigManager:
                     "address": plc_config.get("address"),
                     "data_type": plc_config.get("plc_data_type", "word"),  # 新しいPLCデータ型フィールド
                     "scale": plc_config.get("scale_factor", 1),
-                    "enabled": plc_config.get("enabled", False)
+                    "enabled": plc_config.get("enabled", False),
+                    "scan_class": plc_config.get("scan_class"),
+                    "deadband": plc_config.get("deadband"),
+                    "deadband_percent": plc_config.get("deadband_percent")
                 }
             
             print(f"✅ DB設定読み込み成功: {equipment_id}")
@@ -332,7 +496,10 @@ class ConfigManager:
                 "enabled": setting.get("enabled", False),
                 "address": setting.get("address", ""),
                 "scale_factor": setting.get("scale", 1),
-                "plc_data_type": setting.get("data_type", "word")  # PLCデータ型追加
+                "plc_data_type": setting.get("data_type", "word"),  # PLCデータ型追加
+                "scan_class": setting.get("scan_class"),
+                "deadband": setting.get("deadband"),
+                "deadband_percent": setting.get("deadband_percent")
             })
         
         # DB保存実行（現在の設備IDでURL生成、新しい設備IDでデータ更新）
@@ -345,6 +512,7 @@ class ConfigManager:
         if equipment_success and plc_success:
             # セットアップ完了フラグは新しい設備IDで設定
             self.db_api.mark_setup_completed(new_equipment_id)
+            self.invalidate_cache()
             print(f"✅ DB設定保存成功: {target_equipment_id} → {new_equipment_id}")
             return True
         else:
@@ -352,10 +520,15 @@ class ConfigManager:
             return False
     
     def _load_json_config(self):
-        """JSONファイルから設定を読み込み"""
+        """JSONファイルから設定を読み込み（ファイルが更新されていなければ前回の内容を複製して返す）"""
         try:
-            with open(self.json_config_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            stat = os.stat(self.json_config_path)
+            file_signature = (stat.st_mtime_ns, stat.st_size)
+            cached = self._json_cache
+            if cached is None or cached[0] != file_signature:
+                with open(self.json_config_path, 'r', encoding='utf-8') as f:
+                    cached = self._json_cache = (file_signature, json.load(f))
+            return copy.deepcopy(cached[1])
         except:
             return {
                 "plc_ip": "192.168.1.100",
@@ -380,7 +553,12 @@ class ConfigManager:
         os.makedirs('config', exist_ok=True)
         with open(self.json_config_path, 'w', encoding='utf-8') as f:
             json.dump(config_data, f, ensure_ascii=False, indent=2)
+        self.invalidate_cache()
     
+    def get_equipment_id(self):
+        """ローカル設定の設備ID（ファイルが更新されていなければ再読み込みしない）"""
+        return self._load_json_config().get("equipment_id")
+
     def save_equipment_id(self, equipment_id):
         """設備IDを設定に保存"""
         try:
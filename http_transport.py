@@ -0,0 +1,207 @@
+import os
+import gzip
+import json as json_module
+import time
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+logger = logging.getLogger(__name__)
+
+# 中央サーバーとの通信設定
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "5"))                 # 1回の通信のタイムアウト（秒）
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))                   # 接続失敗時の再試行回数
+HTTP_RETRY_BUDGET = float(os.getenv("HTTP_RETRY_BUDGET", "10"))      # 再試行を含む1呼び出しの上限時間（秒）
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.2"))   # 再試行の待ち時間（秒、回ごとに倍）
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "8"))               # 接続先あたりの保持接続数
+# この大きさ（バイト）以上のリクエスト本文を gzip 圧縮（0 で無効）
+HTTP_GZIP_MIN_BYTES = int(os.getenv("HTTP_GZIP_MIN_BYTES", "1024"))
+# gzip 未対応と判定した後、再び gzip を試すまでの時間（秒、中央サーバーの更新に追従）
+HTTP_GZIP_REPROBE_SEC = float(os.getenv("HTTP_GZIP_REPROBE_SEC", "3600"))
+# 400 応答の本文にこれらが含まれる場合は本文を解釈できなかった可能性がある（小文字で比較）
+GZIP_DECODE_ERROR_MARKERS = ("gzip", "decode", "invalid json", "could not understand")
+# 送信済みでも再送して問題ない（冪等な）メソッド。POST は未送信が確実な接続エラーのみ再試行
+IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "DELETE", "OPTIONS")
+
+class HttpTransport:
+    """中央サーバーとの共有HTTP通信（keep-alive の接続プール・gzip・再試行）
+
+    requests.Session の接続プールで TCP 接続を使い回し、大きなリクエスト本文は
+    gzip で送る。接続エラーの場合のみ retries 回まで再試行し、再試行を含めて
+    retry_budget 秒を超えない。応答待ちのタイムアウトや HTTP エラー応答は
+    二重登録を避けるため再試行しない。POST は接続確立前の失敗（接続拒否・
+    名前解決失敗・接続タイムアウト）のみ再試行し、送信後に切断された場合
+    （Connection aborted 等）は再試行しない。
+    gzip の本文に 415 が返った場合、または本文を解釈できない旨の 400 が返り
+    非圧縮で送り直すと受け付けられた場合のみ gzip 未対応と判定し、
+    gzip_reprobe_sec 秒後に再び gzip を試す。
+    """
+
+    def __init__(self, base_url, timeout=HTTP_TIMEOUT, retries=HTTP_RETRIES, retry_budget=HTTP_RETRY_BUDGET,
+                 pool_size=HTTP_POOL_SIZE, gzip_min_bytes=HTTP_GZIP_MIN_BYTES,
+                 gzip_reprobe_sec=HTTP_GZIP_REPROBE_SEC):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_budget = retry_budget
+        self.gzip_min_bytes = gzip_min_bytes
+        self.gzip_reprobe_sec = gzip_reprobe_sec
+        self.gzip_supported = True    # gzip 本文を拒否するサーバーでは無効にする
+        self.gzip_disabled_at = None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.stats = {"requests": 0, "retries": 0, "failures": 0, "gzip_requests": 0,
+                      "bytes_sent": 0, "bytes_saved": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, **deltas):
+        with self._lock:
+            for key, delta in deltas.items():
+                self.stats[key] += delta
+
+    def _encode(self, body, headers):
+        """リクエスト本文を作成（大きい場合は gzip 圧縮）"""
+        if (not self.gzip_supported and self.gzip_reprobe_sec > 0
+                and time.monotonic() - self.gzip_disabled_at >= self.gzip_reprobe_sec):
+            logger.info("🔄 gzip 圧縮の本文を再び試します")
+            self.gzip_supported = True
+        if self.gzip_supported and self.gzip_min_bytes and len(body) >= self.gzip_min_bytes:
+            compressed = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+            self._count(gzip_requests=1, bytes_saved=len(body) - len(compressed))
+            return compressed
+        headers.pop("Content-Encoding", None)
+        return body
+
+    def request(self, method, path, json=None, data=None, content_type=None, params=None, timeout=None,
+                retries=None, headers=None):
+        """リクエストを送信して requests.Response を返す（失敗時は requests の例外）
+
+        json は JSON 本文、data は content_type 形式のバイト列の本文。
+        """
+        url = f"{self.base_url}{path}"
+        timeout = self.timeout if timeout is None else timeout
+        retries = self.retries if retries is None else retries
+        deadline = time.monotonic() + self.retry_budget
+        headers = dict(headers or {})
+        if json is not None:
+            raw = json_module.dumps(json, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        else:
+            raw = data
+            if content_type:
+                headers["Content-Type"] = content_type
+        body = self._encode(raw, headers) if raw is not None else None
+        attempt = 0
+        probing = False
+        while True:
+            try:
+                self._count(requests=1, bytes_sent=len(body) if body else 0)
+                response = self.session.request(method, url, data=body, params=params, headers=headers,
+                                                timeout=timeout)
+            except requests.ConnectionError as e:
+                # 接続エラーのみ再試行（送信済みの可能性がある読み取りタイムアウトは再試行しない）
+                delay = HTTP_RETRY_BACKOFF * (2 ** attempt)
+                if (attempt >= retries or time.monotonic() + delay >= deadline
+                        or not self._can_retry(method, e)):
+                    self._count(failures=1)
+                    raise
+                attempt += 1
+                self._count(retries=1)
+                time.sleep(delay)
+                continue
+            except requests.RequestException:
+                self._count(failures=1)
+                raise
+
+            if probing and response.status_code not in (400, 415):
+                # 非圧縮なら受け付けられた → gzip 本文に未対応のサーバー
+                self._disable_gzip()
+            elif headers.get("Content-Encoding") == "gzip":
+                if response.status_code == 415:
+                    # gzip 本文に未対応のサーバー → 以降は非圧縮で送信
+                    self._disable_gzip()
+                    body = self._encode(raw, headers)
+                    continue
+                if response.status_code == 400 and self._is_decode_error(response):
+                    # 本文を解釈できなかった可能性 → 非圧縮で送り直して確かめる（入力エラーの 400 では無効にしない）
+                    probing = True
+                    headers.pop("Content-Encoding", None)
+                    body = raw
+                    continue
+            return response
+
+    @staticmethod
+    def _can_retry(method, error):
+        """接続エラーを再試行してよいか（POST はサーバーに届いていないことが確実な場合のみ）"""
+        if method.upper() in IDEMPOTENT_METHODS:
+            return True
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        # requests.ConnectionError(MaxRetryError(reason=NewConnectionError)) → 接続確立前の失敗
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return isinstance(reason, NewConnectionError)
+
+    @staticmethod
+    def _is_decode_error(response):
+        text = response.text[:500].lower()
+        return any(marker in text for marker in GZIP_DECODE_ERROR_MARKERS)
+
+    def _disable_gzip(self):
+        if self.gzip_supported:
+            logger.warning("⚠️ 中央サーバーが gzip 圧縮の本文に未対応のため非圧縮で送信します")
+        self.gzip_supported = False
+        self.gzip_disabled_at = time.monotonic()
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request("PUT", path, **kwargs)
+
+    def get_stats(self):
+        """送信統計と接続の再利用状況（新規接続数 / 接続を再利用したリクエスト数）"""
+        connections = 0
+        pooled_requests = 0
+        for adapter in set(self.session.adapters.values()):
+            for key in adapter.poolmanager.pools.keys():
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is not None:
+                    connections += pool.num_connections
+                    pooled_requests += pool.num_requests
+        with self._lock:
+            stats = dict(self.stats)
+        stats.update(
+            base_url=self.base_url,
+            connections_opened=connections,
+            connections_reused=max(0, pooled_requests - connections),
+            gzip_supported=self.gzip_supported,
+        )
+        return stats
+
+    def close(self):
+        self.session.close()
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+def get_transport(base_url):
+    """接続先ごとの共有トランスポート（同じ中央サーバーへの通信は接続プールを共有）"""
+    with _transports_lock:
+        transport = _transports.get(base_url)
+        if transport is None:
+            transport = _transports[base_url] = HttpTransport(base_url)
+        return transport
+
+def get_transport_stats():
+    with _transports_lock:
+        transports = list(_transports.values())
+    return {transport.base_url: transport.get_stats() for transport in transports}
@@ -1,5 +1,5 @@
 from flask import Flask, render_template, request, redirect, url_for, jsonify, session
-from flask_socketio import SocketIO
+from flask_socketio import SocketIO, emit, join_room
 import os
 import json
 import socket
@@ -10,7 +10,6 @@ import re
 import subprocess
 import signal
 import atexit
-import random  # 追加
 from datetime import datetime
 from dotenv import load_dotenv
 from db_utils import ConfigManager, get_cpu_serial_number
@@ -21,12 +20,24 @@ import hashlib
 # from backend.api.routes import register_routes
 # PLCエージェント関連インポート
 from plc_agent import main_loop as plc_main_loop
+from plc_agent import stop_event as plc_agent_stop_event, get_agent_status
+from plc_agent_process import AgentProcessSupervisor, PLC_AGENT_PROCESS
+from plc_shared_values import SharedValueTable, QUALITY_NAMES, PLC_SHM_MAX_TAGS
+from plc_live_push import LiveValuePusher
 
 load_dotenv()
 
 # PLCエージェントプロセス管理
 plc_agent_thread = None
-plc_agent_stop_event = threading.Event()
+plc_agent_engine = None
+# この時間（秒）以上更新されていない最新値は停止中（stale）として返す
+LATEST_STALE_SEC = float(os.getenv("LATEST_STALE_SEC", "10"))
+# エージェントの取得値・状態を受け取る共有メモリと、エージェントの子プロセスの監視（PLC_AGENT_PROCESS=true 時）
+# どちらも起動時（open_shared_values）に作成し、終了時に削除する（import しただけでは作成しない）
+shared_values = None
+plc_agent_supervisor = None
+# 共有メモリの最新値をキオスク画面へ送る（open_shared_values で作成）
+live_pusher = None
 
 # デバイス情報取得関数
 def get_mac_address():
@@ -350,7 +361,10 @@ def initial_setup():
                             "enabled": setting.get("enabled", False),
                             "address": setting.get("address", ""),
                             "scale_factor": setting.get("scale", 1),
-                            "plc_data_type": setting.get("data_type", "word")
+                            "plc_data_type": setting.get("data_type", "word"),
+                            "scan_class": setting.get("scan_class"),
+                            "deadband": setting.get("deadband"),
+                            "deadband_percent": setting.get("deadband_percent")
                         })
                     
                     plc_config_url = f"http://{plc_data['central_server_ip']}:{plc_data['central_server_port']}/api/equipment/{plc_data['equipment_id']}/plc_configs"
@@ -433,44 +447,41 @@ def api_series():
 @app.route("/api/logs")
 @require_auth
 def api_logs():
-    """現在のPLCデータを返す（ダミーまたは実データ）"""
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    """エージェントが最後に取得したPLCデータを返す
+
+    共有メモリの最新値から応答し、中央サーバーとの通信や設定ファイルの読み込みは行わない。
+    status: running（更新中）/ stale（LATEST_STALE_SEC 秒以上更新なし）/ no_data（取得値なし）
+    quality: good（PLCから読み取った値）/ last_known（通信不可のため最終取得値）/ dummy（ダミーデータ）
+    data / timestamp は1台目のターゲット（main）の値。targets に全ターゲットの値を含む。
+    """
+    samples = shared_values.latest() if shared_values else {}
+    if not samples:
+        return jsonify({"timestamp": None, "status": "no_data", "quality": None, "data": {}, "targets": {}})
     
-    # 設定ファイルを読み込み
-    current_config = config.load_plc_config()
-    data_points = current_config.get("data_points", {})
-    
-    # 有効なデータ項目のみダミーデータを生成（リアルタイム変動）
-    dummy_data = {}
-    for key, setting in data_points.items():
-        if setting.get("enabled", False):
-            if key == "production_count":
-                # 1200-1300の間で変動（生産数量は徐々に増加傾向）
-                base_count = 1200 + int(time.time()) % 100
-                dummy_data[key] = base_count + random.randint(-10, 20)
-            elif key == "current":
-                # 2.8-3.8Aの間で変動
-                dummy_data[key] = round(3.0 + random.uniform(-0.2, 0.8), 1)
-            elif key == "temperature":
-                # 24-28℃の間で変動
-                dummy_data[key] = round(25.5 + random.uniform(-1.5, 2.5), 1)
-            elif key == "pressure":
-                # 0.4-0.5MPaの間で変動
-                dummy_data[key] = round(0.45 + random.uniform(-0.05, 0.05), 2)
-            elif key == "cycle_time":
-                # 800-900msの間で変動
-                dummy_data[key] = 850 + random.randint(-50, 50)
-            elif key == "error_code":
-                # 通常は0、まれにエラーコード（1-5）
-                dummy_data[key] = 0 if random.random() > 0.05 else random.randint(1, 5)
-            else:
-                dummy_data[key] = round(random.uniform(-10, 10), 1)
-    
-    return jsonify({
-        "timestamp": now,
-        "status": "running",
-        "data": dummy_data
-    })
+    now = time.time()
+    targets = {}
+    for name, sample in samples.items():
+        age = now - sample["timestamp"]
+        targets[name] = {
+            "timestamp": datetime.fromtimestamp(sample["timestamp"]).strftime("%Y-%m-%d %H:%M:%S"),
+            "status": "stale" if age > LATEST_STALE_SEC else "running",
+            "quality": QUALITY_NAMES.get(sample["quality"], "unknown"),
+            "age_ms": max(0, round(age * 1000)),
+            "data": sample["values"],
+        }
+    primary = targets.get("main") or next(iter(targets.values()))
+    return jsonify(dict(primary, targets=targets))
+
+# キオスク画面へ最新値を送る Socket.IO のルーム
+LIVE_VALUES_ROOM = "live_values"
+
+@socketio.on("join_live_values")
+def on_join_live_values():
+    """監視画面の購読開始: 全項目を送り、以降は取得ごとに変化した項目のみを送る"""
+    if REQUIRE_AUTH and "authenticated" not in session:
+        return
+    join_room(LIVE_VALUES_ROOM)
+    emit("live_values", live_pusher.snapshot() if live_pusher else {"full": True, "targets": {}})
 
 @app.route("/test-connection", methods=["POST"])
 def test_connection():
@@ -507,11 +518,22 @@ def api_plc_agent_status():
     """PLCエージェントの状態を取得"""
     global plc_agent_thread
     
-    is_running = plc_agent_thread is not None and plc_agent_thread.is_alive()
+    if plc_agent_supervisor:
+        # 別プロセスのエージェントが共有メモリに書き込んだ状態
+        is_running = plc_agent_supervisor.is_running()
+        agent_status = (shared_values.read_status() if is_running else None) or {"targets": {}}
+        agent_status["process"] = plc_agent_supervisor.get_stats()
+    else:
+        is_running = plc_agent_thread is not None and plc_agent_thread.is_alive()
+        agent_status = get_agent_status(plc_agent_engine if is_running else None)
+        if not is_running:
+            agent_status["targets"] = {}
     
     return jsonify({
         "is_running": is_running,
-        "status": "運行中" if is_running else "停止中"
+        "status": "運行中" if is_running else "停止中",
+        **agent_status,
+        "live_push": live_pusher.get_stats() if live_pusher else None
     })
 
 @app.route("/api/plc-agent/restart", methods=["POST"])
@@ -615,7 +637,10 @@ def api_current_equipment_info():
                         "address": plc_config.get("address"),
                         "data_type": plc_config.get("plc_data_type", "word"),
                         "scale": plc_config.get("scale_factor", 1),
-                        "enabled": plc_config.get("enabled", False)
+                        "enabled": plc_config.get("enabled", False),
+                        "scan_class": plc_config.get("scan_class"),
+                        "deadband": plc_config.get("deadband"),
+                        "deadband_percent": plc_config.get("deadband_percent")
                     }
                 
                 result = {
@@ -673,6 +698,11 @@ def start_plc_agent():
     """PLCエージェントをバックグラウンドで起動"""
     global plc_agent_thread, plc_agent_stop_event
     
+    if plc_agent_supervisor:
+        # 別プロセスで起動（PLC通信・送信がUIのリクエスト処理と GIL を取り合わない）
+        plc_agent_supervisor.start()
+        return
+    
     if plc_agent_thread and plc_agent_thread.is_alive():
         print("⚠️ PLCエージェントは既に起動中です")
         return
@@ -689,6 +719,11 @@ def stop_plc_agent():
     """PLCエージェントを停止"""
     global plc_agent_thread, plc_agent_stop_event
     
+    if plc_agent_supervisor:
+        # 子プロセスの終了時にPLCセッションも切断される
+        plc_agent_supervisor.stop()
+        return
+    
     if plc_agent_thread and plc_agent_thread.is_alive():
         # 停止イベントを設定
         plc_agent_stop_event.set()
@@ -702,52 +737,60 @@ def stop_plc_agent():
             print("🛑 PLCエージェントを停止しました")
     
     plc_agent_thread = None
+    
+    # 保持しているPLCセッションを切断（設定変更後は新しい接続先で再接続）
+    from plc_agent import connection_pool, circuit_breakers
+    connection_pool.close_all()
+    circuit_breakers.reset()
 
 def plc_agent_wrapper():
     """PLCエージェントのラッパー関数（停止イベント監視付き）"""
+    global plc_agent_engine
     try:
-        # plc_agent.pyのmain_loop関数を停止イベント付きで実行
-        while not plc_agent_stop_event.is_set():
-            # 設定をDB優先で読み込み（設定変更に対応）
-            from db_utils import ConfigManager
-            config_manager = ConfigManager()
-            config = config_manager.load_plc_config()
-            equipment_id = config.get("equipment_id")
-            
-            if not equipment_id:
-                print("⚠️ 設備IDが未設定です。10秒後に再試行します。")
-                plc_agent_stop_event.wait(10)
-                continue
-            
-            # 設定に基づいてPLCからデータを取得
-            from plc_agent import read_from_plc
-            from db_utils import DatabaseAPI
-            
-            db_api = DatabaseAPI()
-            values = read_from_plc(config)
-
-            if values:
-                # DB APIを使用してログデータを送信
-                success = db_api.send_log_data(equipment_id, values)
-                
-                if success:
-                    print(f"✅ DB送信成功: {equipment_id} / {values}")
-                else:
-                    print(f"❌ DB送信エラー: {equipment_id}")
-            else:
-                print("⚠️ データ取得失敗。")
-
-            # 設定された間隔で待機（停止イベントも監視）
-            interval = config.get("interval", 5000)
-            plc_agent_stop_event.wait(interval / 1000.0)
+        # PLCターゲットごとのタスクで並行収集（停止イベント設定で終了）
+        import plc_agent
+        from plc_agent import create_acquisition_engine
+        plc_agent.shared_values = shared_values
+        plc_agent_engine = create_acquisition_engine(stop_event=plc_agent_stop_event)
+        plc_agent_engine.run()
             
     except Exception as e:
         print(f"❌ PLCエージェントエラー: {e}")
 
+def get_shared_tag_capacity():
+    """共有メモリの項目数: 設定の項目数の2倍（項目の追加・名前変更の余裕）と PLC_SHM_MAX_TAGS の大きい方"""
+    try:
+        from plc_agent import get_plc_targets
+        targets = get_plc_targets(config.load_plc_config())
+        configured = sum(len(target.get("data_points") or {}) for target in targets)
+    except Exception as e:
+        print(f"⚠️ 共有メモリの項目数を設定から決められません: {e}")
+        configured = 0
+    return max(PLC_SHM_MAX_TAGS, configured * 2)
+
+def open_shared_values():
+    """共有メモリ・エージェントの監視・最新値の送信を作成（起動時に1回）"""
+    global shared_values, plc_agent_supervisor, live_pusher
+    shared_values = SharedValueTable.create(max_tags=get_shared_tag_capacity())
+    print(f"🧮 共有メモリを作成しました: {shared_values.name} (最大 {shared_values.max_tags}項目)")
+    if PLC_AGENT_PROCESS:
+        plc_agent_supervisor = AgentProcessSupervisor(shared_values)
+    live_pusher = LiveValuePusher(
+        shared_values,
+        emit=lambda message: socketio.emit("live_values", message, to=LIVE_VALUES_ROOM),
+        on_config_changed=lambda version: socketio.emit("equipment_info_changed", {"version": version},
+                                                        to=LIVE_VALUES_ROOM),
+        sleep=socketio.sleep
+    )
+
 def cleanup_on_exit():
     """アプリケーション終了時のクリーンアップ"""
+    global shared_values
     print("🔄 アプリケーション終了処理...")
     stop_plc_agent()
+    if shared_values:
+        shared_values.close()
+        shared_values = None
 
 # 終了時のクリーンアップを登録
 atexit.register(cleanup_on_exit)
@@ -755,11 +798,18 @@ atexit.register(cleanup_on_exit)
 if __name__ == "__main__":
     print("🚀 PLC UI システム起動中...")
     
-    # PLCエージェントを自動起動
-    start_plc_agent()
+    debug = os.getenv("FLASK_DEBUG", "false").lower() == "true"
+    
+    # PLCエージェントを自動起動（FLASK_DEBUG=true のリローダーが監視用に残す親プロセスでは起動しない）
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        open_shared_values()
+        start_plc_agent()
+        # 共有メモリの最新値をキオスク画面へ送信
+        socketio.start_background_task(live_pusher.run)
     
     # Flaskアプリケーション起動（SocketIO対応）
     port = int(config.raspi_ui_port)
     print(f"🌐 WebUI起動: http://0.0.0.0:{port}")
     print("📡 WebSocket機能が有効化されました")
-    socketio.run(app, debug=True, host="0.0.0.0", port=port) 
\ No newline at end of file
+    # キオスク端末ローカルの画面用サーバーのため、デバッグモード以外でも Werkzeug で起動する
+    socketio.run(app, debug=debug, host="0.0.0.0", port=port, allow_unsafe_werkzeug=True) 
\ No newline at end of file
@@ -1,11 +1,29 @@
 import os
 import time
-import random
 import json
-from datetime import datetime
+import threading
+from datetime import datetime, timezone
 import requests
 from dotenv import load_dotenv
 from db_utils import ConfigManager, DatabaseAPI, get_cpu_serial_number, get_mac_address, get_ip_address
+from plc_connection_pool import PLCConnectionPool, normalize_manufacturer
+from plc_async_engine import AsyncAcquisitionEngine, CONFIG_RELOAD_INTERVAL
+from plc_circuit_breaker import CircuitBreakerRegistry, CircuitOpenError, CLOSED
+from plc_read_plan import (
+    READ_PLAN_GAP_TOLERANCE, ADDRESS_PARSERS, keyence_address_to_modbus, mc_device_name,
+    get_read_plan, get_mc_random_plan, scatter_block, scatter_mc_random,
+    S7_PDU_SIZE, get_s7_multi_plan, get_fins_multi_plan
+)
+from plc_fins import FinsTcpClient, FINS_TCP_PORT
+from plc_pipeline import (
+    PipelinedClient, PipelineRequestError, ModbusPipelineClient, MC4EPipelineClient, PLC_PIPELINE_WINDOW
+)
+from plc_signal import generate_signal_data
+from plc_outbox import LogOutbox, StoreAndForwardUploader, OUTBOX_ENABLED
+from plc_log_batcher import LogBatcher, LOG_BATCH_SIZE
+from plc_config_watcher import ConfigWatcher, CONFIG_WATCH_ENABLED, CONFIG_SAFETY_RELOAD_INTERVAL
+from plc_shared_values import QUALITY_LAST_KNOWN, QUALITY_DUMMY
+from http_transport import get_transport_stats
 import logging
 
 load_dotenv()
@@ -27,9 +45,13 @@ PLC_IP = os.getenv("PLC_IP", "192.168.0.10")
 PLC_PORT = int(os.getenv("PLC_PORT", "5000"))
 PLC_MANUFACTURER = os.getenv("PLC_MANUFACTURER", "Mitsubishi")
 USE_DUMMY_PLC = os.getenv("USE_DUMMY_PLC", "false").lower() == "true"
+MC_RANDOM_READ = os.getenv("MC_RANDOM_READ", "true").lower() == "true"  # 三菱ランダム読出し(0403)を使用
+OMRON_FINS_TRANSPORT = os.getenv("OMRON_FINS_TRANSPORT", "tcp").lower()  # オムロン FINS の通信方式 (tcp / udp)
 
 # エラー処理設定
 MAX_RETRY_ATTEMPTS = int(os.getenv("MAX_RETRY_ATTEMPTS", "3"))
+# 接続関数内の即時リトライ回数（継続的な再試行はサーキットブレーカーが担当）
+CONNECT_RETRY_ATTEMPTS = int(os.getenv("CONNECT_RETRY_ATTEMPTS", "1"))
 CONNECTION_TIMEOUT = int(os.getenv("CONNECTION_TIMEOUT", "5"))
 READ_TIMEOUT = int(os.getenv("READ_TIMEOUT", "3"))
 
@@ -37,12 +59,43 @@ READ_TIMEOUT = int(os.getenv("READ_TIMEOUT", "3"))
 config_manager = ConfigManager()
 db_api = DatabaseAPI()
 
+# PLC接続プール（周期ごとの接続・切断を避けてセッションを再利用）
+connection_pool = PLCConnectionPool()
+
+# 接続先ごとのサーキットブレーカー（オフラインのPLCで周期を止めない）
+circuit_breakers = CircuitBreakerRegistry()
+
+# 接続先ごとの最終取得値（PLC停止中はこの値を返す）
+last_known_values = {}
+last_known_lock = threading.Lock()
+
+# エージェント停止イベント（main.py と共有。待機中のリトライも中断する）
+stop_event = threading.Event()
+
+# 送信失敗時に送信待ちへ保存して再送するログ送信（初回のエンジン生成時に作成）
+log_uploader = None
+log_uploader_lock = threading.Lock()
+# ログを件数・時間でまとめて一括送信するバッファ（LOG_BATCH_SIZE <= 1 で無効）
+log_batcher = None
+
+# UIプロセスへ最新値を公開する共有メモリ（plc_shared_values.SharedValueTable。UIから起動された場合のみ）
+shared_values = None
+
+# 中央サーバーの設定変更を待つ監視スレッド（初回のエンジン生成時に作成）と通知先の収集エンジン
+config_watcher = None
+acquisition_engine = None
+
+# ランダム読出しを拒否した三菱PLC (ip, port)（以降は一括読出しのみ使用）
+mc_random_read_unsupported = set()
+
 # グローバルエラー統計
 error_stats = {
     "connection_errors": 0,
     "read_errors": 0,
     "last_success": None,
-    "consecutive_failures": 0
+    "consecutive_failures": 0,
+    "circuit_open_skips": 0,
+    "circuit_breakers": {}
 }
 
 def print_error_stats():
@@ -56,6 +109,10 @@ def print_error_stats():
         print(f"   最終成功: {error_stats['last_success']}")
     else:
         print("   最終成功: なし")
+    for session_key, stats in connection_pool.get_stats().items():
+        print(f"   セッション {session_key}: 再利用 {stats['reused']}回 / 再接続 {stats['reconnects']}回 / 失敗 {stats['failures']}回")
+    for name, breaker in circuit_breakers.get_stats().items():
+        print(f"   ブレーカー {name}: {breaker['state']} / 作動 {breaker['opens']}回 / 即時失敗 {breaker['rejected']}回")
 
 def reload_env_vars():
     """環境変数を強制的に再読み込み"""
@@ -78,14 +135,78 @@ def reload_env_vars():
     print(f"   PLC_MANUFACTURER = {PLC_MANUFACTURER}")
     print(f"   LOG_INTERVAL_MS = {LOG_INTERVAL_MS}")
 
+# コンパイル済み設定（設定のバージョン, 設定）。バージョンが変わった場合のみ再コンパイル
+_compiled_config = (None, None)
+_compiled_config_lock = threading.Lock()
+
 def load_plc_config():
-    """PLC設定をDB優先で読み込み（JSONフォールバック）"""
-    return config_manager.load_plc_config()
+    """PLC設定をDB優先で読み込み（JSONフォールバック）し、データ項目をコンパイル"""
+    global _compiled_config
+    with _compiled_config_lock:
+        config = config_manager.get_plc_config()
+        version, compiled = _compiled_config
+        if compiled is None or version != config_manager.version:
+            if compiled is not None and shared_values:
+                # データ項目の追加・削除・名前変更に合わせて共有メモリの項目表を作り直す
+                shared_values.reset_tags()
+            compiled = compile_plc_config(dict(config))
+            _compiled_config = (config_manager.version, compiled)
+        return compiled
+
+def compile_plc_config(config):
+    """設定読み込み時にデータ項目をPLCTagへコンパイルし、読み取りプランを設定に添付
+
+    周期処理ではアドレス文字列の解析を行わず、添付済みのプランで I/O とデコードのみ行う。
+    """
+    vendor = normalize_manufacturer(config.get("manufacturer", PLC_MANUFACTURER))
+    if vendor in ADDRESS_PARSERS:
+        try:
+            gap_tolerance = config.get("read_gap_tolerance", READ_PLAN_GAP_TOLERANCE)
+            config["_read_plan"] = get_read_plan(vendor, config.get("data_points", {}), gap_tolerance)
+        except Exception as e:
+            logger.warning(f"読み取りプランのコンパイルに失敗: {e}")
+    return config
+
+# 各ターゲットが個別に持たない場合に引き継がない設定キー
+TARGET_EXCLUDED_KEYS = ("plc_targets", "_read_plan")
+
+def get_plc_targets(config):
+    """設定からPLCターゲット一覧を生成
+
+    従来の単一PLC設定（plc_ip / manufacturer / data_points）を1台目とし、
+    plc_targets に列挙されたPLCを追加する。追加ターゲットで省略した項目
+    （equipment_id, interval, data_points など）は上位の設定を引き継ぐ。
+    """
+    base = {k: v for k, v in config.items() if k not in TARGET_EXCLUDED_KEYS}
+    targets = []
+    
+    if config.get("plc_ip"):
+        primary = dict(config)
+        primary.pop("plc_targets", None)
+        primary.setdefault("name", "main")
+        targets.append(primary)
+    
+    for index, entry in enumerate(config.get("plc_targets") or []):
+        if not entry.get("plc_ip") or entry.get("enabled") is False:
+            continue
+        target = dict(base, **entry)
+        target.setdefault("name", f"plc{index + 1}")
+        targets.append(compile_plc_config(target))
+    
+    # 名前の重複は後勝ちにならないよう接続先で区別
+    names = set()
+    for target in targets:
+        target["interval"] = target.get("interval") or INTERVAL
+        if target["name"] in names:
+            target["name"] = f"{target['name']}@{target['plc_ip']}:{target.get('plc_port')}"
+        names.add(target["name"])
+    return targets
 
 def update_error_stats(success=True, error_type=None):
     """エラー統計を更新"""
     global error_stats
     
+    error_stats["circuit_breakers"] = circuit_breakers.get_stats()
     if success:
         error_stats["last_success"] = datetime.now()
         error_stats["consecutive_failures"] = 0
@@ -96,6 +217,8 @@ def update_error_stats(success=True, error_type=None):
             error_stats["connection_errors"] += 1
         elif error_type == "read":
             error_stats["read_errors"] += 1
+        elif error_type == "circuit_open":
+            error_stats["circuit_open_skips"] += 1
         
         logger.warning(f"❌ PLC通信失敗 (連続失敗: {error_stats['consecutive_failures']}回)")
 
@@ -109,7 +232,9 @@ def retry_on_failure(func, max_retries=MAX_RETRY_ATTEMPTS, delay=1):
         except Exception as e:
             logger.warning(f"試行 {attempt + 1}/{max_retries} 失敗: {e}")
             if attempt < max_retries - 1:
-                time.sleep(delay * (attempt + 1))  # 指数バックオフ
+                # 停止要求があれば待機を中断
+                if stop_event.wait(delay * (attempt + 1)):
+                    raise
             else:
                 logger.error(f"最大リトライ回数に達しました: {e}")
                 raise
@@ -126,17 +251,22 @@ def connect_mitsubishi_plc(ip, port, timeout=CONNECTION_TIMEOUT):
         return plc
     
     try:
-        return retry_on_failure(_connect, max_retries=3, delay=1)
+        return retry_on_failure(_connect, max_retries=CONNECT_RETRY_ATTEMPTS, delay=1)
     except Exception as e:
         update_error_stats(False, "connection")
         logger.error(f"三菱PLC接続失敗: {ip}:{port} - {e}")
         return None
 
-def connect_omron_plc(ip, timeout=CONNECTION_TIMEOUT):
-    """オムロンPLC接続（タイムアウト付き）"""
-    import fins.udp
-    
+def connect_omron_plc(ip, port=FINS_TCP_PORT, transport=OMRON_FINS_TRANSPORT, timeout=CONNECTION_TIMEOUT):
+    """オムロンPLC接続（タイムアウト付き）
+
+    transport="tcp" はノードアドレスのハンドシェイク済みの FINS/TCP セッション、
+    "udp" は従来の fins ライブラリ（FINS/UDP）で接続する。
+    """
     def _connect():
+        if transport == "tcp":
+            return FinsTcpClient(ip, port, timeout=timeout).connect()
+        import fins.udp
         fins_client = fins.udp.UDPFinsConnection()
         fins_client.connect(ip)
         fins_client.dest_node_add = 1
@@ -144,13 +274,13 @@ def connect_omron_plc(ip, timeout=CONNECTION_TIMEOUT):
         return fins_client
     
     try:
-        return retry_on_failure(_connect, max_retries=3, delay=1)
+        return retry_on_failure(_connect, max_retries=CONNECT_RETRY_ATTEMPTS, delay=1)
     except Exception as e:
         update_error_stats(False, "connection")
         logger.error(f"オムロンPLC接続失敗: {ip} - {e}")
         return None
 
-def connect_siemens_plc(ip, rack=0, slot=1, timeout=CONNECTION_TIMEOUT):
+def connect_siemens_plc(ip, rack=0, slot=1, tcp_port=102, timeout=CONNECTION_TIMEOUT):
     """シーメンスPLC接続（タイムアウト付き）"""
     try:
         import snap7
@@ -161,16 +291,25 @@ def connect_siemens_plc(ip, rack=0, slot=1, timeout=CONNECTION_TIMEOUT):
     def _connect():
         plc = snap7.client.Client()
         plc.set_connection_type(3)  # OP接続
-        plc.connect(ip, rack, slot)
+        plc.connect(ip, rack, slot, tcp_port)
         return plc
     
     try:
-        return retry_on_failure(_connect, max_retries=3, delay=1)
+        return retry_on_failure(_connect, max_retries=CONNECT_RETRY_ATTEMPTS, delay=1)
     except Exception as e:
         update_error_stats(False, "connection")
         logger.error(f"シーメンスPLC接続失敗: {ip} - {e}")
         return None
 
+def connect_pipelined_plc(client, label):
+    """パイプライン読み取りクライアントで接続（Modbus/TCP・MC 4E 共通）"""
+    try:
+        return retry_on_failure(client.connect, max_retries=CONNECT_RETRY_ATTEMPTS, delay=1)
+    except Exception as e:
+        update_error_stats(False, "connection")
+        logger.error(f"{label}PLC接続失敗（パイプライン）: {client.ip}:{client.port} - {e}")
+        return None
+
 def connect_keyence_plc(ip, port=502, timeout=CONNECTION_TIMEOUT):
     """キーエンスPLC接続（Modbus/TCP）"""
     try:
@@ -187,58 +326,12 @@ def connect_keyence_plc(ip, port=502, timeout=CONNECTION_TIMEOUT):
             raise Exception("Modbus接続に失敗しました")
     
     try:
-        return retry_on_failure(_connect, max_retries=3, delay=1)
+        return retry_on_failure(_connect, max_retries=CONNECT_RETRY_ATTEMPTS, delay=1)
     except Exception as e:
         update_error_stats(False, "connection")
         logger.error(f"キーエンスPLC接続失敗: {ip}:{port} - {e}")
         return None
 
-def keyence_address_to_modbus(address, data_type="word"):
-    """キーエンスアドレスをModbusアドレスに変換"""
-    address_upper = address.upper()
-    
-    if address_upper.startswith('DM'):
-        # データメモリ → Holding Registers
-        addr_num = int(address[2:])
-        if data_type == "bit":
-            raise ValueError("DMアドレスではビット指定はできません")
-        return ("holding", addr_num)
-        
-    elif address_upper.startswith('R'):
-        # リレー → Coils
-        if '.' in address:
-            # ビット指定 (例: R100.1)
-            base_addr, bit_pos = address.split('.')
-            addr_num = int(base_addr[1:])
-            bit_pos = int(bit_pos)
-            # キーエンスでは1リレー = 16ビット
-            modbus_addr = addr_num * 16 + bit_pos
-        else:
-            addr_num = int(address[1:])
-            if data_type == "bit":
-                modbus_addr = addr_num * 16  # R100 = ビット1600
-            else:
-                modbus_addr = addr_num
-        return ("coil", modbus_addr)
-        
-    elif address_upper.startswith('MR'):
-        # 内部リレー → Coils (オフセット付き)
-        if '.' in address:
-            base_addr, bit_pos = address.split('.')
-            addr_num = int(base_addr[2:])
-            bit_pos = int(bit_pos)
-            modbus_addr = 10000 + addr_num * 16 + bit_pos  # オフセット
-        else:
-            addr_num = int(address[2:])
-            if data_type == "bit":
-                modbus_addr = 10000 + addr_num * 16
-            else:
-                modbus_addr = 10000 + addr_num
-        return ("coil", modbus_addr)
-        
-    else:
-        raise ValueError(f"不明なキーエンスアドレス形式: {address}")
-
 def read_keyence_modbus(client, address, data_type="word", scale=1):
     """キーエンスPLCからModbus経由でデータ読み取り"""
     try:
@@ -248,7 +341,7 @@ def read_keyence_modbus(client, address, data_type="word", scale=1):
         if data_type == "bit":
             # ビット読み取り
             if register_type == "coil":
-                result = client.read_coils(modbus_addr, 1)
+                result = client.read_coils(modbus_addr, count=1)
                 if not result.isError():
                     return 1 if result.bits[0] else 0
                 else:
@@ -259,7 +352,7 @@ def read_keyence_modbus(client, address, data_type="word", scale=1):
         elif data_type == "float32":
             # 32bit浮動小数点 (2レジスタ)
             if register_type == "holding":
-                result = client.read_holding_registers(modbus_addr, 2)
+                result = client.read_holding_registers(modbus_addr, count=2)
                 if not result.isError():
                     # IEEE754変換 (ビッグエンディアン)
                     import struct
@@ -274,7 +367,7 @@ def read_keyence_modbus(client, address, data_type="word", scale=1):
         elif data_type == "dword":
             # 32bit整数 (2レジスタ)
             if register_type == "holding":
-                result = client.read_holding_registers(modbus_addr, 2)
+                result = client.read_holding_registers(modbus_addr, count=2)
                 if not result.isError():
                     word1, word2 = result.registers[0], result.registers[1]
                     return (word1 << 16) | word2
@@ -286,13 +379,13 @@ def read_keyence_modbus(client, address, data_type="word", scale=1):
         else:
             # 16bit word
             if register_type == "holding":
-                result = client.read_holding_registers(modbus_addr, 1)
+                result = client.read_holding_registers(modbus_addr, count=1)
                 if not result.isError():
                     return result.registers[0]
                 else:
                     raise Exception(f"Holding Register読み取りエラー: {result}")
             elif register_type == "coil":
-                result = client.read_coils(modbus_addr, 16)  # 16ビット分
+                result = client.read_coils(modbus_addr, count=16)  # 16ビット分
                 if not result.isError():
                     # 16ビットを整数に変換
                     value = 0
@@ -318,6 +411,13 @@ def safe_plc_read(plc_func, error_msg="PLC読み取りエラー"):
         return None
 
 # === PLCから値を取得する関数 ===
+class ReadResult(dict):
+    """PLCから読み取れなかった場合の代わりの値（quality: plc_shared_values の品質フラグ）"""
+
+    def __init__(self, values, quality):
+        super().__init__(values)
+        self.quality = quality
+
 def read_from_plc(config):
     """設定ファイルに基づいて動的にPLCからデータを読み取り"""
     global USE_DUMMY_PLC
@@ -334,421 +434,400 @@ def read_from_plc(config):
     # 環境変数によるダミーモード設定
     if USE_DUMMY_PLC:
         print("⚠️ [DUMMY MODE] ダミーデータを返します。")
-        return generate_dummy_data(data_points)
+        return ReadResult(generate_dummy_data(data_points), QUALITY_DUMMY)
     
     # 実際のPLC接続を試行
     print(f"🔌 実際のPLC接続を試行中: {ip}:{port} ({manufacturer})")
+    cache_key = get_breaker_key(config, manufacturer, ip, port)
     try:
         result = read_from_real_plc(config, ip, port, manufacturer, data_points)
         if result is None:
-            print("❌ PLC接続失敗 - ダミーモードにフォールバック")
             update_error_stats(False, "connection")
-            return generate_dummy_data(data_points)
+        elif not result:
+            # 接続できたが全項目の読み取りに失敗
+            update_error_stats(False, "read")
         else:
             print("✅ PLC接続成功")
             update_error_stats(True)
+            store_last_known_values(cache_key, result)
             return result
+    except CircuitOpenError as e:
+        # 接続先が停止中 → 通信せずに即時失敗（再接続はバックグラウンドで試行）
+        print(f"⏸️ {e}")
+        update_error_stats(False, "circuit_open")
     except Exception as e:
         print(f"❌ PLC接続例外: {e}")
-        print("🔄 自動的にダミーモードに切り替えます。")
         update_error_stats(False, "connection")
-        return generate_dummy_data(data_points)
+    
+    # PLC停止中は最終取得値を返し、周期処理を継続
+    cached = get_last_known_values(cache_key, data_points)
+    if cached:
+        print("♻️ PLC通信不可 - 最終取得値を使用します")
+        return ReadResult(cached, QUALITY_LAST_KNOWN)
+    print("❌ PLC接続失敗 - ダミーモードにフォールバック")
+    return ReadResult(generate_dummy_data(data_points), QUALITY_DUMMY)
+
+def get_breaker_key(config, manufacturer, ip, port):
+    """サーキットブレーカー・最終取得値のキー（接続プールと同じ接続先単位）"""
+    vendor = normalize_manufacturer(manufacturer)
+    return (vendor, str(ip), int(get_session_port(config, vendor, port) or 0))
+
+def store_last_known_values(key, values):
+    with last_known_lock:
+        last_known_values.setdefault(key, {}).update(values)
+
+def get_last_known_values(key, data_points):
+    """有効なデータ項目の最終取得値（取得実績のある項目のみ）"""
+    with last_known_lock:
+        cached = last_known_values.get(key, {})
+        return {k: cached[k] for k, setting in data_points.items()
+                if setting.get("enabled", False) and k in cached}
 
 def generate_dummy_data(data_points):
-    """ダミーデータを生成"""
-    dummy_data = {}
+    """ダミーデータを生成（時刻から決定的に決まる疑似信号。SIGNAL_SEED で系列を切り替え）"""
+    return generate_signal_data(data_points)
+
+# ベンダー別ブロック読み取り関数（ReadBlock 1件 = 1リクエスト）
+def read_block_mitsubishi(plc, block):
+    """三菱PLC: ブロック一括読み取り"""
+    headdevice = mc_device_name(block.area, block.start)
     
-    # 有効な各データ項目に対してダミーデータを生成
-    for key, setting in data_points.items():
-        if setting.get("enabled", False):
-            data_type = setting.get("data_type", "word")  # デフォルト: word
-            
-            if key == "production_count":
-                dummy_data[key] = random.randint(1000, 9999)
-            elif key == "current":
-                dummy_data[key] = round(random.uniform(2.0, 5.0), 1)
-            elif key == "temperature":
-                dummy_data[key] = round(random.uniform(20.0, 40.0), 1)
-            elif key == "pressure":
-                dummy_data[key] = round(random.uniform(0.1, 0.8), 2)
-            elif key == "cycle_time":
-                dummy_data[key] = random.randint(800, 1200)
-            elif key == "error_code":
-                dummy_data[key] = random.choice([0, 0, 0, 1, 2])  # 大部分は正常(0)
-            elif data_type == "bit":
-                dummy_data[key] = random.choice([0, 1])  # ビット値
-            elif data_type == "float32":
-                dummy_data[key] = round(random.uniform(0.0, 1000.0), 3)  # 高精度浮動小数点
-            elif data_type == "dword":
-                dummy_data[key] = random.randint(0, 4294967295)  # 32bit整数
-            else:
-                dummy_data[key] = round(random.uniform(0.0, 100.0), 1)
-                
-    return dummy_data
+    if block.kind == "bit":
+        return plc.batchread_bitunits(headdevice=headdevice, readsize=block.count)
+    return plc.batchread_wordunits(headdevice=headdevice, readsize=block.count)
+
+def read_block_keyence(client, block):
+    """キーエンスPLC: Modbus/TCP ブロック読み取り"""
+    if block.area == "holding":
+        result = client.read_holding_registers(block.start, count=block.count)
+        if result.isError():
+            raise Exception(f"Holding Register読み取りエラー: {result}")
+        return result.registers
+    
+    result = client.read_coils(block.start, count=block.count)
+    if result.isError():
+        raise Exception(f"Coil読み取りエラー: {result}")
+    return result.bits[:block.count]
+
+def read_block_omron(fins_client, block):
+    """オムロンPLC: FINS メモリエリア読み取り（ワード単位）"""
+    if isinstance(fins_client, FinsTcpClient):
+        return fins_client.memory_area_read(block.area, block.start, block.count)
+    addr_bytes = block.start.to_bytes(2, byteorder='big') + b'\x00'
+    response = fins_client.memory_area_read(bytes([block.area]), addr_bytes, block.count)
+    
+    # レスポンス: FINSヘッダ(10) + コマンド(2) + 終了コード(2) + データ
+    data_bytes = response[14:14 + block.count * 2]
+    if len(data_bytes) < block.count * 2:
+        raise Exception(f"FINS応答データ不足: {len(data_bytes)}バイト")
+    return [int.from_bytes(data_bytes[i:i + 2], byteorder='big') for i in range(0, len(data_bytes), 2)]
+
+def _s7_area(code):
+    """エリアコードを snap7 のエリア型に変換（python-snap7 1.x/2.x と 3.x の両対応）"""
+    try:
+        from snap7.type import Area
+    except ImportError:
+        from snap7.types import Areas as Area
+    return Area(code)
+
+def read_block_siemens(client, block):
+    """シーメンスPLC: エリア（DB/M/I/Q）のバイト範囲を読み取り"""
+    code, db_number = block.area
+    return client.read_area(_s7_area(code), db_number, block.start, block.count)
+
+def s7_read_multi(client, blocks):
+    """シーメンスPLC: 複数ブロックを1回のマルチ変数読み取り（read_multi_vars）で取得
+
+    ブロックごとのバイト列を返す（読み取りに失敗した項目は None）。
+    """
+    if hasattr(client, "use_optimizer"):
+        # python-snap7 3.x: 辞書形式の指定でマルチ変数読み取り
+        items = [
+            {"area": _s7_area(block.area[0]), "db_number": block.area[1], "start": block.start, "size": block.count}
+            for block in blocks
+        ]
+        result, buffers = client.read_multi_vars(items)
+        return [bytearray(buffer) if buffer is not None else None for buffer in buffers]
+
+    # python-snap7 1.x/2.x: S7DataItem 配列で指定（libsnap7 が1リクエストで送信）
+    import ctypes
+    from snap7.types import S7DataItem, S7WLByte
+    
+    items = (S7DataItem * len(blocks))()
+    buffers = []
+    for item, block in zip(items, blocks):
+        code, db_number = block.area
+        buffer = ctypes.create_string_buffer(block.count)
+        item.Area = ctypes.c_int32(code)
+        item.WordLen = ctypes.c_int32(S7WLByte)
+        item.Result = ctypes.c_int32(0)
+        item.DBNumber = ctypes.c_int32(db_number)
+        item.Start = ctypes.c_int32(block.start)
+        item.Amount = ctypes.c_int32(block.count)
+        item.pData = ctypes.cast(ctypes.pointer(buffer), ctypes.POINTER(ctypes.c_uint8))
+        buffers.append(buffer)
+    
+    result, items = client.read_multi_vars(items)
+    return [bytearray(buffer.raw) if item.Result == 0 else None for item, buffer in zip(items, buffers)]
 
-def read_from_real_plc(config, ip, port, manufacturer, data_points):
-    """実際のPLCからデータを読み取り"""
+def get_s7_pdu_size(client):
+    """接続時にネゴシエートされたPDUサイズ（取得できない場合は既定値）"""
     try:
-        if manufacturer.lower() in ["mitsubishi", "三菱"]:
-            import struct
-            
-            # 新しい接続関数を使用
-            plc = connect_mitsubishi_plc(ip, port)
-            if not plc:
-                logger.error("三菱PLC接続に失敗しました")
-                return None
+        return int(client.get_pdu_length()) or S7_PDU_SIZE
+    except Exception:
+        return S7_PDU_SIZE
+
+BLOCK_READERS = {
+    "mitsubishi": read_block_mitsubishi,
+    "keyence": read_block_keyence,
+    "omron": read_block_omron,
+    "siemens": read_block_siemens,
+}
 
-            data = {}
-            
-            # 有効な各データ項目を設定に基づいて読み取り
-            for key, setting in data_points.items():
-                if setting.get("enabled", False):
-                    address = setting.get("address")
-                    scale = setting.get("scale", 1)
-                    data_type = setting.get("data_type", "word")  # デフォルト: word
-                    
-                    if address:
-                        def read_mitsubishi_data():
-                            """三菱PLCデータ読み取り関数（safe_plc_read用）"""
-                            raw_value = None
-                            
-                            # データ型別の処理
-                            if data_type == "bit":
-                                # ビットアドレス処理 (M100.1, X001等)
-                                if '.' in address:
-                                    # ビット指定あり (例: M100.1)
-                                    base_addr, bit_pos = address.split('.')
-                                    bit_pos = int(bit_pos)
-                                    device_type = base_addr[0]
-                                    addr_num = int(base_addr[1:])
-                                    
-                                    # ビット読み取り
-                                    bit_values = plc.batchread_bitunits(
-                                        headdevice=f"{device_type}{addr_num:04X}",
-                                        readsize=1
-                                    )
-                                    raw_value = bit_values[0] if bit_values else 0
-                                else:
-                                    # 単体ビットアドレス (例: M100, X001)
-                                    device_type = address[0]
-                                    addr_num = int(address[1:])
-                                    
-                                    bit_values = plc.batchread_bitunits(
-                                        headdevice=f"{device_type}{addr_num:04X}",
-                                        readsize=1
-                                    )
-                                    raw_value = bit_values[0] if bit_values else 0
-                                    
-                            elif data_type == "float32":
-                                # 32bit浮動小数点 (2ワード)
-                                if address.upper().startswith('D'):
-                                    addr_num = int(address[1:])
-                                elif address.upper().startswith('DM'):
-                                    addr_num = int(address[2:])
-                                else:
-                                    raise ValueError(f"不明なアドレス形式: {address}")
-                                
-                                # 2ワード読み取り (32bit)
-                                word_values = plc.batchread_wordunits(
-                                    headdevice=f"D{addr_num}", 
-                                    readsize=2
-                                )
-                                
-                                # IEEE754 float32に変換
-                                if len(word_values) >= 2:
-                                    # リトルエンディアン形式で結合
-                                    combined = (word_values[1] << 16) | word_values[0]
-                                    raw_value = struct.unpack('<f', struct.pack('<I', combined))[0]
-                                    
-                            elif data_type == "dword":
-                                # 32bit整数 (2ワード)
-                                if address.upper().startswith('D'):
-                                    addr_num = int(address[1:])
-                                elif address.upper().startswith('DM'):
-                                    addr_num = int(address[2:])
-                                else:
-                                    raise ValueError(f"不明なアドレス形式: {address}")
-                                
-                                # 2ワード読み取り
-                                word_values = plc.batchread_wordunits(
-                                    headdevice=f"D{addr_num}", 
-                                    readsize=2
-                                )
-                                
-                                if len(word_values) >= 2:
-                                    # 32bit整数に結合
-                                    raw_value = (word_values[1] << 16) | word_values[0]
-                                    
-                            else:
-                                # 従来の16bitワード読み取り
-                                if address.upper().startswith('D'):
-                                    addr_num = int(address[1:])
-                                elif address.upper().startswith('DM'):
-                                    addr_num = int(address[2:])
-                                else:
-                                    raise ValueError(f"不明なアドレス形式: {address}")
-                                
-                            # PLCからデータを読み取り
-                            raw_value = plc.batchread_wordunits(
-                                headdevice=f"D{addr_num}", 
-                                readsize=1
-                            )[0]  # リストの最初の要素を取得
-                            
-                            return raw_value
-                        
-                        # 安全な読み取り実行
-                        raw_value = safe_plc_read(read_mitsubishi_data, f"{key}({address})読み取り")
-                        
-                        # スケール適用 (ビット以外)
-                        if raw_value is not None:
-                            if data_type == "bit":
-                                data[key] = int(raw_value)  # ビットは0/1
-                            elif scale > 1:
-                                data[key] = raw_value / scale
-                            else:
-                                data[key] = raw_value
-                        else:
-                            logger.warning(f"⚠️ {key}({address})のデータ取得に失敗")
-                            
-            plc.close()
-            
-            if data:
-                update_error_stats(True)
-                logger.info(f"✅ 三菱PLC データ取得成功: {len(data)}項目")
-            
-            return data
+VENDOR_LABELS = {
+    "mitsubishi": "三菱",
+    "keyence": "キーエンス",
+    "omron": "オムロン",
+    "siemens": "シーメンス",
+}
 
-        elif manufacturer.lower() in ["keyence", "キーエンス"]:
-            # キーエンスPLC（Modbus/TCP対応）
-            modbus_port = config.get("modbus_port", 502)  # Modbusポート
-            
-            # Modbus/TCP接続
-            client = connect_keyence_plc(ip, port=modbus_port)
-            if not client:
-                logger.error("キーエンスPLC（Modbus/TCP）接続に失敗しました")
-                return None
+def get_session_port(config, vendor, port):
+    """接続プールのキーに使うポート（キーエンスはModbusポート、シーメンスはS7ポート）"""
+    if vendor == "keyence":
+        return config.get("modbus_port", 502)
+    if vendor == "siemens":
+        return config.get("s7_port", 102)
+    return port
+
+def connect_plc(config, vendor, ip, port):
+    """メーカー別の接続関数を呼び出し"""
+    window = int(config.get("pipeline_window", PLC_PIPELINE_WINDOW) or 0)
+    if window > 1 and vendor == "mitsubishi":
+        # パイプライン読み取りはシリアル番号を持つ MC 4E フレームで行う
+        return connect_pipelined_plc(MC4EPipelineClient(ip, port, CONNECTION_TIMEOUT, window), "三菱")
+    if window > 1 and vendor == "keyence":
+        client = ModbusPipelineClient(
+            ip, config.get("modbus_port", 502), CONNECTION_TIMEOUT, window, config.get("modbus_unit_id", 1)
+        )
+        return connect_pipelined_plc(client, "キーエンス")
+    
+    if vendor == "mitsubishi":
+        return connect_mitsubishi_plc(ip, port)
+    elif vendor == "keyence":
+        return connect_keyence_plc(ip, port=config.get("modbus_port", 502))
+    elif vendor == "omron":
+        return connect_omron_plc(
+            ip, port=port or FINS_TCP_PORT, transport=str(config.get("fins_transport", OMRON_FINS_TRANSPORT)).lower()
+        )
+    elif vendor == "siemens":
+        return connect_siemens_plc(
+            ip, rack=config.get("rack", 0), slot=config.get("slot", 1), tcp_port=config.get("s7_port", 102)
+        )
+    raise ValueError(f"❌ 不明なメーカー: {vendor}")
 
-            data = {}
-            
-            # 有効な各データ項目を設定に基づいて読み取り
-            for key, setting in data_points.items():
-                if setting.get("enabled", False):
-                    address = setting.get("address")
-                    scale = setting.get("scale", 1)
-                    data_type = setting.get("data_type", "word")
-                    
-                    if address:
-                        def read_keyence_data():
-                            """キーエンスPLCデータ読み取り関数（safe_plc_read用）"""
-                            return read_keyence_modbus(client, address, data_type, scale)
-                        
-                        # 安全な読み取り実行
-                        raw_value = safe_plc_read(read_keyence_data, f"{key}({address})読み取り")
-                        
-                        # スケール適用
-                        if raw_value is not None:
-                            if data_type == "bit":
-                                data[key] = int(raw_value)  # ビットは0/1
-                            elif scale > 1:
-                                data[key] = raw_value / scale
-                            else:
-                                data[key] = raw_value
-                        else:
-                            logger.warning(f"⚠️ {key}({address})のデータ取得に失敗")
-                            
-            # Modbus接続を閉じる
-            try:
-                client.close()
-            except:
-                pass
-            
-            if data:
-                update_error_stats(True)
-                logger.info(f"✅ キーエンスPLC データ取得成功: {len(data)}項目")
-            
-            return data
+def execute_read_plan(plan, conn):
+    """読み取りプランを実行し、結果を各データ項目キーに振り分け"""
+    reader = BLOCK_READERS[plan.manufacturer]
+    data = {}
+    
+    for key, error in plan.errors.items():
+        logger.warning(f"⚠️ {key}のアドレス解析に失敗: {error}")
+    
+    for block in plan.blocks:
+        values = safe_plc_read(lambda: reader(conn, block), f"{block}読み取り")
+        if values is None or len(values) < block.count:
+            for tag, _ in block.tags:
+                logger.warning(f"⚠️ {tag.key}({tag.address})のデータ取得に失敗")
+            continue
+        scatter_block(block, values, data)
+    
+    return data
 
-        elif manufacturer.lower() in ["omron", "オムロン"]:
-            import struct
-            
-            # 新しい接続関数を使用
-            fins_client = connect_omron_plc(ip)
-            if not fins_client:
-                logger.error("オムロンPLC接続に失敗しました")
-                return None
+def execute_mc_random_plan(random_plan, plc, ip, port):
+    """三菱PLC: ランダム読出し(0403)で不連続デバイスを一括取得
 
-            data = {}
-            
-            # 有効な各データ項目を設定に基づいて読み取り
-            for key, setting in data_points.items():
-                if setting.get("enabled", False):
-                    address = setting.get("address")
-                    scale = setting.get("scale", 1)
-                    data_type = setting.get("data_type", "word")  # デフォルト: word
-                    
-                    if address:
-                        def read_omron_data():
-                            """オムロンPLCデータ読み取り関数（safe_plc_read用）"""
-                            raw_value = None
-                            
-                            # データ型別の処理
-                            if data_type == "bit":
-                                # ビットアドレス処理 (CIO100.01等)
-                                if '.' in address:
-                                    # ビット指定あり (例: CIO100.01)
-                                    base_addr, bit_pos = address.split('.')
-                                    bit_pos = int(bit_pos)
-                                    
-                                    if base_addr.upper().startswith('CIO'):
-                                        addr_num = int(base_addr[3:])
-                                        # CIOエリア (0x30)
-                                        addr_bytes = addr_num.to_bytes(2, byteorder='big') + bit_pos.to_bytes(1, byteorder='big')
-                                        mem_area = fins_client.memory_area_read(b'\x30', addr_bytes, 1)
-                                        raw_value = mem_area[0] if mem_area else 0
-                                    elif base_addr.upper().startswith('WR'):
-                                        addr_num = int(base_addr[2:])
-                                        # WRエリア (0x31)
-                                        addr_bytes = addr_num.to_bytes(2, byteorder='big') + bit_pos.to_bytes(1, byteorder='big')
-                                        mem_area = fins_client.memory_area_read(b'\x31', addr_bytes, 1)
-                                        raw_value = mem_area[0] if mem_area else 0
-                                else:
-                                    raise ValueError(f"オムロンビットアドレスには.XX指定が必要: {address}")
-                                    
-                            elif data_type == "float32":
-                                # 32bit浮動小数点 (2ワード)
-                                if address.upper().startswith('DM'):
-                                    addr_num = int(address[2:])
-                                elif address.upper().startswith('D'):
-                                    addr_num = int(address[1:])
-                                else:
-                                    raise ValueError(f"不明なアドレス形式: {address}")
-                                
-                                # 2ワード読み取り
-                                addr_bytes = b'\x00' + addr_num.to_bytes(2, byteorder='big')
-                                mem_area = fins_client.memory_area_read(b'\x82', addr_bytes, 2)
-                                
-                                if mem_area and len(mem_area) >= 4:
-                                    # IEEE754 float32に変換 (ビッグエンディアン)
-                                    word1 = int.from_bytes(mem_area[0:2], byteorder='big')
-                                    word2 = int.from_bytes(mem_area[2:4], byteorder='big')
-                                    combined = (word1 << 16) | word2
-                                    raw_value = struct.unpack('>f', struct.pack('>I', combined))[0]
-                                    
-                            elif data_type == "dword":
-                                # 32bit整数 (2ワード)
-                                if address.upper().startswith('DM'):
-                                    addr_num = int(address[2:])
-                                elif address.upper().startswith('D'):
-                                    addr_num = int(address[1:])
-                                else:
-                                    raise ValueError(f"不明なアドレス形式: {address}")
-                                
-                                # 2ワード読み取り
-                                addr_bytes = b'\x00' + addr_num.to_bytes(2, byteorder='big')
-                                mem_area = fins_client.memory_area_read(b'\x82', addr_bytes, 2)
-                                
-                                if mem_area and len(mem_area) >= 4:
-                                    # 32bit整数に結合
-                                    word1 = int.from_bytes(mem_area[0:2], byteorder='big')
-                                    word2 = int.from_bytes(mem_area[2:4], byteorder='big')
-                                    raw_value = (word1 << 16) | word2
-                                    
-                            else:
-                                # 従来の16bitワード読み取り
-                                if address.upper().startswith('DM') or address.upper().startswith('D'):
-                                    # DM エリア用のメモリエリアコード（0x82）
-                                    if address.upper().startswith('DM'):
-                                        addr_num = int(address[2:])
-                                    else:
-                                        addr_num = int(address[1:])
-                                    
-                                # アドレスをバイト形式に変換
-                                addr_bytes = b'\x00' + addr_num.to_bytes(2, byteorder='big')
-                                
-                                # PLCからデータを読み取り（DM エリア: 0x82）
-                                mem_area = fins_client.memory_area_read(b'\x82', addr_bytes, 1)
-                                
-                                if mem_area and len(mem_area) >= 2:
-                                    raw_value = int.from_bytes(mem_area[0:2], byteorder='big')
-                                else:
-                                    raise ValueError(f"不明なアドレス形式: {address}")
-                            
-                            return raw_value
-                        
-                        # 安全な読み取り実行
-                        raw_value = safe_plc_read(read_omron_data, f"{key}({address})読み取り")
-                        
-                        # スケール適用 (ビット以外)
-                        if raw_value is not None:
-                            if data_type == "bit":
-                                data[key] = int(raw_value)  # ビットは0/1
-                            elif scale > 1:
-                                data[key] = raw_value / scale
-                            else:
-                                data[key] = raw_value
-                        else:
-                            logger.warning(f"⚠️ {key}({address})のデータ取得に失敗")
-                            
-            # 接続は自動でクローズされるため明示的な切断処理は不要
-            
-            if data:
-                update_error_stats(True)
-                logger.info(f"✅ オムロンPLC データ取得成功: {len(data)}項目")
-            
-            return data
+    PLCがコマンドを拒否した場合（MCプロトコルのエラー応答）は None を返し、
+    以降そのPLCでは一括読出しのみ使用する。
+    """
+    from pymcprotocol.mcprotocolerror import MCProtocolError
+    
+    data = {}
+    for key, error in random_plan.errors.items():
+        logger.warning(f"⚠️ {key}のアドレス解析に失敗: {error}")
+    
+    for request in random_plan.requests:
+        try:
+            word_values, dword_values = plc.randomread(
+                word_devices=request.word_devices,
+                dword_devices=request.dword_devices
+            )
+        except MCProtocolError as e:
+            logger.warning(f"⚠️ ランダム読出し非対応のため一括読出しに切り替えます ({ip}:{port}): {e}")
+            mc_random_read_unsupported.add((ip, port))
+            return None
+        except Exception as e:
+            update_error_stats(False, "read")
+            logger.error(f"{request}読み取り: {e}")
+            for tag, *_ in request.word_tags + request.dword_tags:
+                logger.warning(f"⚠️ {tag.key}({tag.address})のデータ取得に失敗")
+            continue
+        scatter_mc_random(request, word_values, dword_values, data)
+    
+    # 大きな連続ブロックは一括読出し
+    for block in random_plan.batch_blocks:
+        values = safe_plc_read(lambda: read_block_mitsubishi(plc, block), f"{block}読み取り")
+        if values is None or len(values) < block.count:
+            for tag, _ in block.tags:
+                logger.warning(f"⚠️ {tag.key}({tag.address})のデータ取得に失敗")
+            continue
+        scatter_block(block, values, data)
+    
+    return data
 
-        elif manufacturer.lower() in ["siemens", "シーメンス"]:
-            import struct
-            
-            # 新しい接続関数を使用
-            plc = connect_siemens_plc(ip)
-            if not plc:
-                logger.error("シーメンスPLC接続に失敗しました")
-                return None
+def execute_s7_multi_plan(multi_plan, client):
+    """シーメンスPLC: PDUサイズ単位のマルチ変数読み取りを実行し、結果を各データ項目キーに振り分け"""
+    data = {}
+    for key, error in multi_plan.errors.items():
+        logger.warning(f"⚠️ {key}のアドレス解析に失敗: {error}")
+    
+    for request in multi_plan.requests:
+        buffers = safe_plc_read(lambda: s7_read_multi(client, request.blocks), f"{request}読み取り")
+        if buffers is None:
+            buffers = [None] * len(request.blocks)
+        for block, buffer in zip(request.blocks, buffers):
+            if buffer is None or len(buffer) < block.count:
+                for tag, _ in block.tags:
+                    logger.warning(f"⚠️ {tag.key}({tag.address})のデータ取得に失敗")
+                continue
+            scatter_block(block, buffer, data)
+    
+    return data
 
-            data = {}
-            
-            # 有効な各データ項目を設定に基づいて読み取り
-            for key, setting in data_points.items():
-                if setting.get("enabled", False):
-                    address = setting.get("address")
-                    scale = setting.get("scale", 1)
-                    data_type = setting.get("data_type", "word")  # デフォルト: word
-                    
-                    if address:
-                        def read_siemens_data():
-                            """シーメンスPLCデータ読み取り関数（safe_plc_read用）"""
-                            # シーメンスPLCは現在未実装（snap7 APIの複雑さのため）
-                            logger.warning(f"シーメンスPLCの読み取りは現在未実装です: {address}")
-                            return None
-                        
-                        # 安全な読み取り実行
-                        raw_value = safe_plc_read(read_siemens_data, f"{key}({address})読み取り")
-                        
-                        # スケール適用 (ビット以外)
-                        if raw_value is not None:
-                            if data_type == "bit":
-                                data[key] = int(raw_value)  # ビットは0/1
-                            elif scale > 1:
-                                data[key] = raw_value / scale
-                            else:
-                                data[key] = raw_value
-                        else:
-                            logger.warning(f"⚠️ {key}({address})のデータ取得に失敗")
-                             
-            plc.disconnect()
-            
-            if data:
-                update_error_stats(True)
-                logger.info(f"✅ シーメンスPLC データ取得成功: {len(data)}項目")
-                            
-            return data
+def execute_pipelined_plan(plan, client):
+    """読み取りプランの全ブロックをパイプラインで送信し、応答をIDで照合して振り分け"""
+    data = {}
+    for key, error in plan.errors.items():
+        logger.warning(f"⚠️ {key}のアドレス解析に失敗: {error}")
+    
+    results = safe_plc_read(lambda: client.read_blocks(plan.blocks), f"{client.label}パイプライン読み取り")
+    if results is None:
+        return data
+    for block, values in zip(plan.blocks, results):
+        if isinstance(values, PipelineRequestError) or values is None or len(values) < block.count:
+            if isinstance(values, PipelineRequestError):
+                logger.error(f"{block}読み取り: {values}")
+            for tag, _ in block.tags:
+                logger.warning(f"⚠️ {tag.key}({tag.address})のデータ取得に失敗")
+            continue
+        scatter_block(block, values, data)
+    
+    return data
 
-        else:
-            raise ValueError(f"❌ 不明なメーカー: {manufacturer}")
+def execute_fins_multi_plan(multi_plan, fins_client):
+    """オムロンPLC: 複数メモリエリア読出し(0104)で DM/CIO/WR 等の小ブロックを1フレームで取得"""
+    data = {}
+    for key, error in multi_plan.errors.items():
+        logger.warning(f"⚠️ {key}のアドレス解析に失敗: {error}")
+    
+    for request in multi_plan.requests:
+        values = safe_plc_read(lambda: fins_client.multiple_memory_area_read(request.items), f"{request}読み取り")
+        if values is None or len(values) < len(request.items):
+            for block in request.blocks:
+                for tag, _ in block.tags:
+                    logger.warning(f"⚠️ {tag.key}({tag.address})のデータ取得に失敗")
+            continue
+        for block, block_values in request.split(values):
+            scatter_block(block, block_values, data)
+    
+    # 大きな連続ブロックはメモリエリア読出し
+    for block in multi_plan.batch_blocks:
+        values = safe_plc_read(lambda: read_block_omron(fins_client, block), f"{block}読み取り")
+        if values is None or len(values) < block.count:
+            for tag, _ in block.tags:
+                logger.warning(f"⚠️ {tag.key}({tag.address})のデータ取得に失敗")
+            continue
+        scatter_block(block, values, data)
+    
+    return data
 
+def read_from_real_plc(config, ip, port, manufacturer, data_points):
+    """実際のPLCからデータを読み取り（読み取りプランによるブロック読み取り）"""
+    vendor = normalize_manufacturer(manufacturer)
+    session_port = get_session_port(config, vendor, port)
+    breaker_key = get_breaker_key(config, vendor, ip, port)
+    breaker = circuit_breakers.get(breaker_key)
+    connect = lambda: connect_plc(config, vendor, ip, port)
+    
+    if breaker.state != CLOSED:
+        # オープン中は通信せず即時失敗。再試行時刻になったら別スレッドで再接続を試みる
+        circuit_breakers.probe_in_background(
+            breaker_key, lambda: connection_pool.acquire(vendor, ip, session_port, connect) is not None
+        )
+        raise CircuitOpenError(f"サーキットブレーカー作動中のため通信をスキップ: {breaker.name}")
+    
+    try:
+        if vendor not in VENDOR_LABELS:
+            raise ValueError(f"❌ 不明なメーカー: {manufacturer}")
+        label = VENDOR_LABELS[vendor]
+        
+        # 接続プールから既存セッションを取得（無い場合のみ接続）
+        conn = connection_pool.acquire(vendor, ip, session_port, connect)
+        if not conn:
+            logger.error(f"{label}PLC接続に失敗しました")
+            breaker.record_failure()
+            return None
+        
+        # 設定読み込み時にコンパイル済みのプランを使用（未コンパイルの場合のみ生成）
+        plan = config.get("_read_plan")
+        if plan is None:
+            gap_tolerance = config.get("read_gap_tolerance", READ_PLAN_GAP_TOLERANCE)
+            plan = get_read_plan(vendor, data_points, gap_tolerance)
+        
+        data = None
+        request_count = len(plan.blocks)
+        if vendor == "siemens":
+            # DB/エリアごとのブロックをPDUサイズ単位のマルチ変数読み取りにまとめる
+            multi_plan = get_s7_multi_plan(plan, get_s7_pdu_size(conn))
+            data = execute_s7_multi_plan(multi_plan, conn)
+            request_count = multi_plan.request_count
+        
+        if vendor == "omron" and isinstance(conn, FinsTcpClient):
+            # エリアをまたぐ小ブロックを複数メモリエリア読出し(0104)にまとめる
+            multi_plan = get_fins_multi_plan(plan)
+            data = execute_fins_multi_plan(multi_plan, conn)
+            request_count = multi_plan.request_count
+        
+        if isinstance(conn, PipelinedClient):
+            # 全ブロックを応答待ちなしで送信（RTTをブロック数分待たない）
+            data = execute_pipelined_plan(plan, conn)
+        
+        use_random_read = config.get("mc_random_read", MC_RANDOM_READ) and (ip, port) not in mc_random_read_unsupported
+        if vendor == "mitsubishi" and use_random_read and data is None:
+            random_plan = get_mc_random_plan(plan)
+            if random_plan.request_count < len(plan.blocks):
+                data = execute_mc_random_plan(random_plan, conn, ip, port)
+                request_count = random_plan.request_count
+        
+        if data is None:
+            data = execute_read_plan(plan, conn)
+            request_count = len(plan.blocks)
+        
+        if data:
+            breaker.record_success()
+            update_error_stats(True)
+            logger.info(f"✅ {label}PLC データ取得成功: {len(data)}項目 ({request_count}リクエスト)")
+        else:
+            # 全項目失敗時はセッション異常とみなし、次周期で再接続
+            breaker.record_failure()
+            connection_pool.invalidate(vendor, ip, session_port)
+        
+        return data
+    
     except Exception as e:
         print(f"❌ PLC読取エラー: {e}")
+        # 例外発生時はセッションを破棄して次周期で再接続
+        breaker.record_failure()
+        connection_pool.invalidate(vendor, ip, session_port)
         return None
 
 def auto_identify_equipment():
@@ -793,6 +872,126 @@ def auto_identify_equipment():
         print(f"❌ 設備自動識別エラー: {e}")
         return None
 
+def get_log_uploader(stop_event=stop_event):
+    """送信待ち付きのログ送信（OUTBOX_ENABLED=false または作成失敗時は None）"""
+    global log_uploader
+    if not OUTBOX_ENABLED:
+        return None
+    with log_uploader_lock:
+        if log_uploader is None:
+            try:
+                log_uploader = StoreAndForwardUploader(
+                    db_api.send_log_data, LogOutbox(), stop_event=stop_event, send_batch_func=db_api.send_log_batch
+                )
+            except Exception as e:
+                logger.error(f"❌ 送信待ちログを開けません（送信失敗時のログは破棄されます）: {e}")
+                return None
+        return log_uploader
+
+def get_outbox_stats():
+    """送信待ちログの統計（未使用時は None）"""
+    return log_uploader.get_stats() if log_uploader else None
+
+def send_log_batch_without_outbox(records):
+    """送信待ちを使わない場合のまとめ送信（送信できなかったログは破棄。ログごとの結果を返す）"""
+    results = db_api.send_log_batch(records)
+    failed = len(results) - results.count(True)
+    if failed:
+        print(f"❌ DB送信エラー: {failed}/{len(records)}件")
+    return results
+
+def get_log_batcher(uploader, stop_event=stop_event):
+    """ログのまとめ送信バッファ（LOG_BATCH_SIZE <= 1 の場合は None）"""
+    global log_batcher
+    if LOG_BATCH_SIZE <= 1:
+        return None
+    if log_batcher is None:
+        deliver = uploader.send_many if uploader else send_log_batch_without_outbox
+        log_batcher = LogBatcher(deliver, stop_event=stop_event)
+    return log_batcher
+
+def get_log_batch_stats():
+    """ログのまとめ送信の統計（未使用時は None）"""
+    return log_batcher.get_stats() if log_batcher else None
+
+def on_config_changed(version):
+    """設定変更の通知 → キャッシュを破棄して収集エンジンに再読み込みを依頼"""
+    print(f"🔔 設定変更を受信 (バージョン {version}) → 設定を再読み込み")
+    config_manager.invalidate_cache()
+    if acquisition_engine:
+        acquisition_engine.request_reload()
+
+def on_config_watch_status(connected):
+    """通知を受信できる間は定期的な再読み込みを安全のための間隔まで間引く"""
+    if acquisition_engine:
+        acquisition_engine.reload_interval = CONFIG_SAFETY_RELOAD_INTERVAL if connected else CONFIG_RELOAD_INTERVAL
+        if not connected:
+            # 次の再読み込みが間引いた間隔のまま先になっているため、すぐに読み込んで通常の間隔に戻す
+            acquisition_engine.request_reload()
+
+def get_config_watcher(stop_event=stop_event):
+    """設定変更の監視（CONFIG_WATCH_ENABLED=false の場合は None）"""
+    global config_watcher
+    if not CONFIG_WATCH_ENABLED:
+        return None
+    if config_watcher is None:
+        config_watcher = ConfigWatcher(
+            db_api, config_manager.get_equipment_id, on_config_changed, on_config_watch_status, stop_event=stop_event
+        )
+    return config_watcher
+
+def get_config_watch_stats():
+    """設定変更の監視の統計（未使用時は None）"""
+    return config_watcher.get_stats() if config_watcher else None
+
+def publish_latest_values(name, values, timestamp, quality=0):
+    """ターゲットの最新値を共有メモリに書き込む（timestamp は UTC の naive datetime）"""
+    if shared_values:
+        shared_values.publish(name, values, timestamp.replace(tzinfo=timezone.utc).timestamp(), quality)
+
+def get_agent_status(engine=None):
+    """エージェントの状態（/api/plc-agent/status の内容。別プロセス実行時は共有メモリ経由でUIに渡す）"""
+    engine = engine or acquisition_engine
+    return {
+        "targets": engine.get_stats() if engine else {},
+        "circuit_breakers": circuit_breakers.get_stats(),
+        "outbox": get_outbox_stats(),
+        "log_batch": get_log_batch_stats(),
+        "config_watch": get_config_watch_stats(),
+        "http_transport": get_transport_stats(),
+        "shared_values": shared_values.get_stats() if shared_values else None,
+    }
+
+def create_acquisition_engine(stop_event=stop_event):
+    """PLCターゲットごとに並行収集する非同期エンジンを生成"""
+    global acquisition_engine
+    uploader = get_log_uploader(stop_event)
+    batcher = get_log_batcher(uploader, stop_event)
+    # 停止後の再起動でも再送・まとめ送信のスレッドを起動し直す
+    if uploader:
+        uploader.start()
+    if shared_values:
+        # 前回の起動で登録した項目は引き継がない（項目表は今回の設定の項目のみ）
+        shared_values.reset_tags()
+    if batcher:
+        batcher.start()
+        send_func = batcher.send
+    else:
+        send_func = uploader.send if uploader else db_api.send_log_data
+    watcher = get_config_watcher(stop_event)
+    acquisition_engine = AsyncAcquisitionEngine(
+        load_config=load_plc_config,
+        get_targets=get_plc_targets,
+        read_func=read_from_plc,
+        send_func=send_func,
+        stop_event=stop_event,
+        reload_interval=CONFIG_SAFETY_RELOAD_INTERVAL if watcher and watcher.connected else CONFIG_RELOAD_INTERVAL,
+        publish_func=publish_latest_values if shared_values else None
+    )
+    if watcher:
+        watcher.start()
+    return acquisition_engine
+
 # === メインループ ===
 def main_loop():
     # 初回起動時に環境変数を再読み込み
@@ -802,39 +1001,20 @@ def main_loop():
     while True:
         # 設定をDB優先で読み込み（設定変更に対応）
         config = load_plc_config()
-        equipment_id = config.get("equipment_id")
+        if config.get("equipment_id"):
+            break
         
-        if not equipment_id:
-            print("⚠️ 設備IDが未設定です。自動識別を試行します...")
-            
-            # CPUシリアル番号による自動識別を実行
-            equipment_id = auto_identify_equipment()
-            
-            if not equipment_id:
-                print("⚠️ 設備自動識別に失敗しました。10秒後に再試行します。")
-                time.sleep(10)
-                continue
-            
-            # 設定を再読み込み（識別結果を反映）
-            config = load_plc_config()
+        print("⚠️ 設備IDが未設定です。自動識別を試行します...")
         
-        # 設定に基づいてPLCからデータを取得
-        values = read_from_plc(config)
-
-        if values:
-            # DB APIを使用してログデータを送信
-            success = db_api.send_log_data(equipment_id, values)
-            
-            if success:
-                print(f"✅ DB送信成功: {equipment_id} / {values}")
-            else:
-                print(f"❌ DB送信エラー: {equipment_id}")
-        else:
-            print("⚠️ データ取得失敗。")
-
-        # 設定された間隔で待機
-        interval = config.get("interval", INTERVAL)
-        time.sleep(interval / 1000.0)
+        # CPUシリアル番号による自動識別を実行
+        if auto_identify_equipment():
+            break
+        
+        print("⚠️ 設備自動識別に失敗しました。10秒後に再試行します。")
+        time.sleep(10)
+    
+    # PLCターゲットごとのタスクで収集（周期・タイムアウトはターゲット単位）
+    create_acquisition_engine().run()
 
 if __name__ == "__main__":
     main_loop()
@@ -0,0 +1,173 @@
+import os
+import sys
+import time
+import signal
+import logging
+import argparse
+import threading
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+# PLCエージェントをUI（Flask）とは別のプロセスで実行するか（false で従来どおりUIプロセス内のスレッド）
+PLC_AGENT_PROCESS = os.getenv("PLC_AGENT_PROCESS", "true").lower() == "true"
+# 異常終了したエージェントを再起動するまでの待ち時間（秒、連続で異常終了するたびに倍、上限あり）
+AGENT_RESTART_DELAY = float(os.getenv("AGENT_RESTART_DELAY", "2"))
+AGENT_RESTART_MAX_DELAY = float(os.getenv("AGENT_RESTART_MAX_DELAY", "60"))
+# この時間（秒）生存時刻が更新されなければ応答なしとして再起動
+AGENT_HEARTBEAT_TIMEOUT = float(os.getenv("AGENT_HEARTBEAT_TIMEOUT", "30"))
+# 停止要求（SIGTERM）から強制終了までの待ち時間（秒）
+AGENT_STOP_TIMEOUT = float(os.getenv("AGENT_STOP_TIMEOUT", "10"))
+# エージェントが状態と生存時刻を共有メモリに書き込む間隔（秒）
+AGENT_STATUS_INTERVAL = 1.0
+# この時間（秒）以上動作した後の異常終了は、再起動の待ち時間を初期値に戻す
+AGENT_STABLE_SEC = 60
+
+AGENT_SCRIPT = os.path.abspath(__file__)
+
+class AgentProcessSupervisor:
+    """PLCエージェントの子プロセスを起動・監視するスーパーバイザ（UIプロセス側）
+
+    子プロセスは共有メモリ（SharedValueTable）に取得値・状態・生存時刻を書き込む。
+    子プロセスが異常終了した場合や、生存時刻が AGENT_HEARTBEAT_TIMEOUT 秒
+    更新されない場合は、待ち時間を倍にしながら再起動する。
+    """
+
+    def __init__(self, shared_values, restart_delay=AGENT_RESTART_DELAY, max_delay=AGENT_RESTART_MAX_DELAY,
+                 heartbeat_timeout=AGENT_HEARTBEAT_TIMEOUT, stop_timeout=AGENT_STOP_TIMEOUT):
+        self.shared_values = shared_values
+        self.restart_delay = restart_delay
+        self.max_delay = max_delay
+        self.heartbeat_timeout = heartbeat_timeout
+        self.stop_timeout = stop_timeout
+        self.process = None
+        self.started_at = None
+        self.restarts = 0
+        self.last_exit_code = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._monitor = None
+
+    def _spawn(self):
+        self.process = subprocess.Popen([sys.executable, AGENT_SCRIPT, "--shm", self.shared_values.name])
+        self.started_at = time.monotonic()
+        print(f"🚀 PLCエージェントのプロセスを起動しました (PID {self.process.pid})")
+
+    def is_running(self):
+        process = self.process
+        return process is not None and process.poll() is None
+
+    def start(self):
+        """子プロセスを起動して監視を開始（起動済みなら何もしない）"""
+        with self._lock:
+            if self.is_running():
+                print("⚠️ PLCエージェントは既に起動中です")
+                return
+            self._stopping.clear()
+            self._spawn()
+            if self._monitor is None or not self._monitor.is_alive():
+                self._monitor = threading.Thread(target=self._run, daemon=True, name="agent-supervisor")
+                self._monitor.start()
+
+    def stop(self):
+        """子プロセスに停止を要求し、終了しなければ強制終了"""
+        with self._lock:
+            self._stopping.set()
+            process = self.process
+            if process is None or process.poll() is not None:
+                return
+            process.terminate()
+            try:
+                process.wait(self.stop_timeout)
+                print("🛑 PLCエージェントを停止しました")
+            except subprocess.TimeoutExpired:
+                print("⚠️ PLCエージェントが停止しないため強制終了します")
+                process.kill()
+                process.wait()
+            self.last_exit_code = process.returncode
+
+    def _heartbeat_age(self):
+        pid, heartbeat = self.shared_values.writer_info()
+        if pid != self.process.pid:
+            # 起動直後（まだ書き込んでいない）は起動時刻から数える
+            return time.monotonic() - self.started_at
+        return time.time() - heartbeat
+
+    def _run(self):
+        delay = self.restart_delay
+        while not self._stopping.wait(AGENT_STATUS_INTERVAL):
+            with self._lock:
+                if self._stopping.is_set():
+                    break
+                process = self.process
+                code = process.poll()
+                if code is None:
+                    if self._heartbeat_age() <= self.heartbeat_timeout:
+                        continue
+                    logger.error(f"❌ PLCエージェントが {self.heartbeat_timeout:.0f}秒 応答しないため再起動します")
+                    process.kill()
+                    code = process.wait()
+                self.last_exit_code = code
+                if time.monotonic() - self.started_at >= AGENT_STABLE_SEC:
+                    delay = self.restart_delay
+                print(f"❌ PLCエージェントが終了しました (終了コード {code}) → {delay:.0f}秒後に再起動")
+            if self._stopping.wait(delay):
+                break
+            with self._lock:
+                if self._stopping.is_set():
+                    break
+                self.restarts += 1
+                self._spawn()
+            delay = min(delay * 2, self.max_delay)
+
+    def get_stats(self):
+        process = self.process
+        return {
+            "pid": process.pid if process else None,
+            "restarts": self.restarts,
+            "last_exit_code": self.last_exit_code,
+            "uptime_sec": round(time.monotonic() - self.started_at, 1) if self.is_running() else None,
+        }
+
+def run_agent(shm_name):
+    """子プロセスでの実行: 共有メモリを開いてエージェントを起動し、SIGTERM で停止"""
+    from plc_shared_values import SharedValueTable
+    import plc_agent
+
+    table = SharedValueTable.attach(shm_name)
+    plc_agent.shared_values = table
+
+    def request_stop(signum, frame):
+        plc_agent.stop_event.set()
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    def report_status():
+        # 状態と生存時刻を書き込む（UIの状態表示とスーパーバイザの応答確認に使用）
+        while True:
+            try:
+                table.write_status(plc_agent.get_agent_status())
+                table.heartbeat()
+            except Exception as e:
+                logger.error(f"❌ エージェント状態の書き込みエラー: {e}")
+            if plc_agent.stop_event.wait(AGENT_STATUS_INTERVAL):
+                break
+
+    table.heartbeat()
+    status_thread = threading.Thread(target=report_status, daemon=True, name="agent-status")
+    status_thread.start()
+    try:
+        plc_agent.create_acquisition_engine().run()
+    finally:
+        plc_agent.stop_event.set()
+        # まとめ送信の残りを送信（または送信待ちに保存）してから終了
+        if plc_agent.log_batcher:
+            plc_agent.log_batcher.join(AGENT_STOP_TIMEOUT / 2)
+        status_thread.join(AGENT_STATUS_INTERVAL * 2)
+        plc_agent.shared_values = None
+        table.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PLCエージェント（UIから別プロセスとして起動）")
+    parser.add_argument("--shm", required=True, help="最新値を書き込む共有メモリの名前")
+    run_agent(parser.parse_args().shm)
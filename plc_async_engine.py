@@ -0,0 +1,349 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from plc_read_plan import READ_PLAN_GAP_TOLERANCE
+from plc_scheduler import MultiRateScheduler, scheduler_signature
+from plc_report_filter import ReportByExceptionFilter, REPORT_BY_EXCEPTION, REPORT_HEARTBEAT_SEC
+from plc_timer import FixedRateTimer, OVERRUN_POLICY
+
+logger = logging.getLogger(__name__)
+
+# ブロッキングなベンダーライブラリを実行するスレッド数の上限
+PLC_EXECUTOR_WORKERS = int(os.getenv("PLC_EXECUTOR_WORKERS", "4"))
+# 1ターゲットの読み取り1回あたりのタイムアウト（秒）
+TARGET_READ_TIMEOUT = float(os.getenv("TARGET_READ_TIMEOUT", "10"))
+# 設定（ターゲット一覧）の再読み込み間隔（秒）
+CONFIG_RELOAD_INTERVAL = float(os.getenv("CONFIG_RELOAD_INTERVAL", "30"))
+# 停止イベントの確認間隔（秒）
+STOP_CHECK_INTERVAL = 0.5
+
+class TargetState:
+    """ターゲット（PLC1台）ごとの実行状態と統計"""
+
+    def __init__(self, name, target):
+        self.name = name
+        self.target = target
+        self.task = None
+        self.inflight = None          # 実行中の読み取り（タイムアウト後も完了まで保持）
+        self.scheduler = None
+        self.scheduler_signature = None
+        self.timer = None             # スキャンティックを刻む固定レートタイマー
+        self.next_upload_tick = 0     # 次に全項目を送信するティック（周期境界を飛ばしても次のティックで送信）
+        self.report_filter = None     # 変化分のみ送信するフィルタ（データ項目変更時に再構築）
+        self.snapshot = {}            # スキャンクラスごとに更新される最新値
+        self.uploaded = {}            # 最後に送信できた値（送信結果の確定後に更新）
+        self.sent = {}                # 最後に送信した値（結果が未確定のものを含む）
+        self.fresh = False            # 前回送信以降に読み取りに成功したか
+        self.quality = 0              # 最後の読み取り値の品質（0 = PLCから読み取った値）
+        self.cycles = 0
+        self.successes = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.skipped = 0
+        self.uploads = 0
+        self.last_duration = None
+        self.last_success = None
+
+    def to_dict(self):
+        return {
+            "manufacturer": self.target.get("manufacturer"),
+            "plc_ip": self.target.get("plc_ip"),
+            "plc_port": self.target.get("plc_port"),
+            "interval": self.target.get("interval"),
+            "cycles": self.cycles,
+            "successes": self.successes,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "skipped": self.skipped,
+            "overruns": self.timer.overruns if self.timer else 0,
+            "uploads": self.uploads,
+            "quality": self.quality,
+            "scan_tick_ms": self.scheduler.tick_ms if self.scheduler else None,
+            "timing": self.timer.to_dict() if self.timer else None,
+            "scan_classes": self.scheduler.describe() if self.scheduler else {},
+            "report_by_exception": dict(self.report_filter.stats) if self.report_filter else None,
+            "last_duration_ms": round(self.last_duration * 1000, 1) if self.last_duration is not None else None,
+            "last_success": self.last_success,
+        }
+
+class AsyncAcquisitionEngine:
+    """asyncio による複数PLCの並行収集エンジン
+
+    PLCターゲットごとに1つのタスクを持ち、各タスクが自分の周期・タイムアウトで
+    読み取り → 送信を繰り返す。ブロッキングなベンダーライブラリは上限付きの
+    スレッドプールで実行するため、応答の遅いPLCが他のPLCの周期を止めない。
+    """
+
+    def __init__(self, load_config, get_targets, read_func, send_func,
+                 stop_event=None, max_workers=PLC_EXECUTOR_WORKERS,
+                 reload_interval=CONFIG_RELOAD_INTERVAL, publish_func=None):
+        self.load_config = load_config
+        self.get_targets = get_targets
+        self.read_func = read_func
+        self.send_func = send_func
+        # 読み取りごとに最新値を渡す先（UIプロセスとの共有メモリなど）。publish_func(name, values, timestamp, quality)
+        self.publish_func = publish_func
+        self.stop_event = stop_event or threading.Event()
+        self.max_workers = max_workers
+        self.reload_interval = reload_interval
+        self.executor = None
+        self._reload_requested = threading.Event()
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def run(self):
+        """エンジンを起動し、停止イベントが設定されるまでブロック"""
+        asyncio.run(self._main())
+
+    def request_reload(self):
+        """次の停止確認のタイミング（最大 STOP_CHECK_INTERVAL 秒後）で設定を再読み込み（別スレッドから呼び出し可）"""
+        self._reload_requested.set()
+
+    def get_stats(self):
+        """ターゲットごとの収集統計を返す（別スレッドから呼び出し可）"""
+        with self._lock:
+            return {name: state.to_dict() for name, state in self._states.items()}
+
+    async def _main(self):
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="plc-io")
+        loop = asyncio.get_running_loop()
+        logger.info(f"🚀 非同期収集エンジン起動 (ワーカー上限 {self.max_workers})")
+        try:
+            next_reload = 0
+            while not self.stop_event.is_set():
+                if loop.time() >= next_reload or self._reload_requested.is_set():
+                    self._reload_requested.clear()
+                    await self._reload_targets(loop)
+                    next_reload = loop.time() + self.reload_interval
+                await asyncio.sleep(STOP_CHECK_INTERVAL)
+        finally:
+            await self._cancel_all()
+            # 応答待ちのまま残ったスレッドは待たずに終了（接続は接続プール側で破棄）
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            logger.info("🛑 非同期収集エンジン停止")
+
+    async def _reload_targets(self, loop):
+        """設定を再読み込みし、ターゲットタスクを追加・更新・停止"""
+        try:
+            config = await loop.run_in_executor(self.executor, self.load_config)
+        except Exception as e:
+            logger.error(f"❌ 設定読み込みエラー: {e}")
+            return
+
+        if not config.get("equipment_id"):
+            print("⚠️ 設備IDが未設定です。設定の再読み込みを待機します。")
+            targets = []
+        else:
+            targets = self.get_targets(config)
+
+        names = set()
+        for target in targets:
+            name = target["name"]
+            names.add(name)
+            with self._lock:
+                state = self._states.get(name)
+                if state is None:
+                    state = TargetState(name, target)
+                    self._states[name] = state
+                else:
+                    # 周期・データ項目の変更は次周期から反映
+                    state.target = target
+            if state.task is None or state.task.done():
+                state.task = asyncio.create_task(self._run_target(state), name=f"plc:{name}")
+                print(f"▶️ 収集開始: {name} ({target.get('manufacturer')} {target.get('plc_ip')}:{target.get('plc_port')})")
+
+        for name in list(self._states):
+            if name not in names:
+                with self._lock:
+                    state = self._states.pop(name)
+                if state.task:
+                    state.task.cancel()
+                print(f"⏹️ 収集停止: {name}（設定から削除）")
+
+    async def _cancel_all(self):
+        tasks = [state.task for state in self._states.values() if state.task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _get_scheduler(self, state, target):
+        """データ項目・周期が変わった場合のみスケジューラを再構築"""
+        signature = scheduler_signature(target)
+        if state.scheduler is None or state.scheduler_signature != signature:
+            state.scheduler = MultiRateScheduler(
+                target.get("manufacturer"),
+                target.get("data_points", {}),
+                target.get("interval"),
+                target.get("read_gap_tolerance", READ_PLAN_GAP_TOLERANCE)
+            )
+            state.scheduler_signature = signature
+            # ティック番号はスケジューラと共通のため、タイマーもティック0から刻み直す
+            state.timer = FixedRateTimer(
+                state.scheduler.tick_ms / 1000.0, target.get("overrun_policy", OVERRUN_POLICY)
+            )
+            state.next_upload_tick = 0
+            state.report_filter = ReportByExceptionFilter(target.get("data_points", {}))
+            # 設定から外れた項目は最新値からも除外
+            state.snapshot = {k: v for k, v in state.snapshot.items() if k in state.scheduler.rates}
+            logger.info(f"🗓️ {state.name}: スキャンクラス {state.scheduler.describe()} (ティック {state.scheduler.tick_ms}ms)")
+        return state.scheduler
+
+    async def _run_target(self, state):
+        """1ターゲットの収集ループ（ティックごとに到来したスキャンクラスを読み取り → 送信）"""
+        loop = asyncio.get_running_loop()
+        while True:
+            target = state.target
+            scheduler = self._get_scheduler(state, target)
+            timer = state.timer
+            tick = timer.fired()
+            due, data_points, plan = scheduler.next_cycle(tick)
+
+            values = None
+            if data_points:
+                cycle_target = dict(target, data_points=data_points)
+                if plan is not None:
+                    cycle_target["_read_plan"] = plan
+                else:
+                    cycle_target.pop("_read_plan", None)
+                values = await self._poll_once(state, cycle_target)
+                if values:
+                    state.snapshot.update(values)
+                    state.fresh = True
+                    # 読み取り関数が品質を付けた場合（最終取得値・ダミーデータ）はそれを保持
+                    state.quality = getattr(values, "quality", 0)
+                    if self.publish_func:
+                        self._publish(state, timer.scheduled_time(tick))
+
+            # 設備の interval ごとに全項目を送信。interval より速い項目は値が変化した時点で送信
+            interval = target.get("interval") or 5000
+            upload_every = max(1, round(interval / scheduler.tick_ms))
+            # 周期超過で境界のティックを飛ばした場合も、予定時刻を過ぎていれば次に処理するティックで送信
+            upload_due = tick >= state.next_upload_tick
+            if upload_due:
+                state.next_upload_tick = (tick // upload_every + 1) * upload_every
+            upload = upload_due and state.fresh
+            if not upload and values:
+                fast_keys = scheduler.faster_than(interval)
+                upload = any(key in fast_keys and state.sent.get(key) != value
+                             for key, value in values.items())
+            if upload and state.snapshot:
+                # タイムスタンプはティックの予定時刻（処理時間によらず等間隔）
+                await self._upload(loop, state, target, dict(state.snapshot), timer.scheduled_time(tick))
+            elif upload_due and not state.fresh:
+                print(f"⚠️ {state.name}: データ取得失敗。")
+
+            # 絶対時刻上の次ティックまで待機（超過時はタイマーの動作に従い飛ばす／追いかける）
+            missed = timer.missed_ticks
+            delay = timer.advance()
+            if timer.missed_ticks > missed:
+                logger.warning(f"⏩ {state.name}: 周期超過のため {timer.missed_ticks - missed} ティックをスキップ")
+            await asyncio.sleep(delay)
+
+    def _publish(self, state, timestamp):
+        try:
+            self.publish_func(state.name, state.snapshot, timestamp, state.quality)
+        except Exception as e:
+            logger.error(f"❌ {state.name}: 最新値の公開エラー: {e}")
+
+    async def _poll_once(self, state, target):
+        """ブロッキングな読み取りをスレッドプールで実行（タイムアウト付き）"""
+        name = state.name
+        state.cycles += 1
+
+        # 前回の読み取りがタイムアウト後もスレッドで実行中なら、同じ接続に重ねて読まない
+        if state.inflight is not None and not state.inflight.done():
+            state.skipped += 1
+            logger.warning(f"⏭️ {name}: 前回の読み取りが未完了のためスキップ")
+            return None
+
+        timeout = target.get("timeout", TARGET_READ_TIMEOUT)
+        started = time.monotonic()
+        state.inflight = self.executor.submit(self.read_func, target)
+        try:
+            values = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(state.inflight)), timeout)
+        except asyncio.TimeoutError:
+            state.timeouts += 1
+            state.failures += 1
+            logger.error(f"⏱️ {name}: 読み取りタイムアウト ({timeout}秒)")
+            return None
+        except Exception as e:
+            state.failures += 1
+            logger.error(f"❌ {name}: 読み取りエラー: {e}")
+            return None
+        finally:
+            state.last_duration = time.monotonic() - started
+
+        if not values:
+            state.failures += 1
+            return None
+
+        state.successes += 1
+        state.last_success = time.time()
+        return values
+
+    async def _upload(self, loop, state, target, values, timestamp=None):
+        """最新値を中央サーバーへ送信（report-by-exception 有効時は変化分のみ）
+
+        send_func は送信結果（True/False）か、結果が後で確定する場合（まとめ送信）は
+        その Future を返す。送信済みとしての記録（state.uploaded・フィルタの前回送信値）は
+        結果が確定してから行い、送信に失敗した値は次の周期で再送する。
+        """
+        name = state.name
+        equipment_id = target.get("equipment_id")
+        payload, full = values, True
+        report_filter = None
+        if target.get("report_by_exception", REPORT_BY_EXCEPTION) and state.report_filter:
+            report_filter = state.report_filter
+            report_filter.heartbeat = float(target.get("heartbeat_sec", REPORT_HEARTBEAT_SEC))
+            payload, full = report_filter.filter(values)
+            if payload is None:
+                # デッドバンド内の変化のみ → 送信しない
+                state.uploaded = values
+                state.sent = values
+                state.fresh = False
+                return
+
+        # 結果の確定までは送信中として扱い、同じ値を重ねて送らない
+        token = report_filter.mark_pending(payload, full) if report_filter else None
+        state.sent = values
+        state.fresh = False
+        try:
+            result = await loop.run_in_executor(
+                self.executor, partial(self.send_func, equipment_id, payload, partial=not full, timestamp=timestamp)
+            )
+        except Exception as e:
+            result = False
+            logger.error(f"❌ {name}: 送信エラー: {e}")
+
+        if isinstance(result, Future):
+            def on_done(future):
+                try:
+                    loop.call_soon_threadsafe(self._upload_done, state, equipment_id, values, payload, full,
+                                              report_filter, token, future.result())
+                except RuntimeError:
+                    # エンジン停止後に確定した結果（イベントループ終了済み）
+                    pass
+            result.add_done_callback(on_done)
+        else:
+            self._upload_done(state, equipment_id, values, payload, full, report_filter, token, result)
+
+    def _upload_done(self, state, equipment_id, values, payload, full, report_filter, token, success):
+        """送信結果の確定（イベントループのスレッドで実行）"""
+        name = state.name
+        if success:
+            state.uploads += 1
+            state.uploaded = values
+            if report_filter:
+                report_filter.commit(payload, full, token=token)
+            print(f"✅ DB送信成功: {equipment_id} [{name}] / {payload}")
+        else:
+            # 送信済みとして記録せず、次の周期で再送する
+            if report_filter:
+                report_filter.discard(token)
+            state.sent = dict(state.uploaded)
+            state.fresh = True
+            print(f"❌ DB送信エラー: {equipment_id} [{name}]")
@@ -0,0 +1,155 @@
+import os
+import time
+import random
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# サーキットブレーカー設定
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "3"))   # 連続失敗でオープン
+BREAKER_BASE_DELAY = float(os.getenv("BREAKER_BASE_DELAY", "2"))               # 最初の再試行待ち（秒）
+BREAKER_MAX_DELAY = float(os.getenv("BREAKER_MAX_DELAY", "60"))                # 再試行待ちの上限（秒）
+BREAKER_JITTER = float(os.getenv("BREAKER_JITTER", "0.2"))                     # 待ち時間のゆらぎ（±割合）
+
+class CircuitOpenError(Exception):
+    """サーキットブレーカーがオープン中のため通信を行わなかったことを示す例外"""
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """PLC接続先ごとのサーキットブレーカー
+
+    連続失敗が閾値に達するとオープンになり、待ち時間（指数バックオフ +
+    ジッタ）が過ぎるまで通信を試みず即座に失敗を返す。待ち時間経過後は
+    1回だけ試行（ハーフオープン）し、成功すればクローズ、失敗すれば
+    待ち時間を倍にして再びオープンにする。
+    """
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                 base_delay=BREAKER_BASE_DELAY, max_delay=BREAKER_MAX_DELAY, jitter=BREAKER_JITTER):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.state = CLOSED
+        self.failures = 0             # 連続失敗回数
+        self.open_count = 0           # 連続オープン回数（バックオフの指数）
+        self.retry_at = 0.0           # 次の試行を許可する時刻（monotonic）
+        self.probing = False          # ハーフオープンの試行中
+        self.total_opens = 0
+        self.rejected = 0             # オープン中に即時失敗させた回数
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def _backoff(self):
+        delay = min(self.max_delay, self.base_delay * (2 ** self.open_count))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def allow(self):
+        """通信を試行してよいか（オープン中は False を即時返す）"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() >= self.retry_at:
+                self.state = HALF_OPEN
+                self.probing = False
+            if self.state == HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"🟢 サーキットブレーカー復帰: {self.name}")
+            self.state = CLOSED
+            self.failures = 0
+            self.open_count = 0
+            self.probing = False
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                delay = self._backoff()
+                if self.state != OPEN:
+                    self.total_opens += 1
+                if self.opened_at is None:
+                    self.opened_at = time.time()
+                self.state = OPEN
+                self.open_count += 1
+                self.probing = False
+                self.retry_at = time.monotonic() + delay
+                logger.warning(f"🔴 サーキットブレーカー作動: {self.name} ({self.failures}回連続失敗, {delay:.1f}秒後に再試行)")
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "opens": self.total_opens,
+                "rejected": self.rejected,
+                "opened_at": self.opened_at,
+                "retry_in": round(max(0.0, self.retry_at - time.monotonic()), 1) if self.state == OPEN else 0,
+            }
+
+class CircuitBreakerRegistry:
+    """接続先（メーカー, IP, ポート）ごとのブレーカーを管理し、バックグラウンドで再接続を試行"""
+
+    def __init__(self):
+        self._breakers = {}
+        self._probes = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                vendor, ip, port = key
+                breaker = CircuitBreaker(f"{vendor}@{ip}:{port}")
+                self._breakers[key] = breaker
+            return breaker
+
+    def probe_in_background(self, key, probe_func):
+        """ハーフオープンの試行を別スレッドで実行（周期処理は待たせない）
+
+        probe_func() が真値を返せば成功として記録する。
+        """
+        breaker = self.get(key)
+        with self._lock:
+            running = self._probes.get(key)
+            if running is not None and running.is_alive():
+                return False
+            if not breaker.allow():
+                return False
+
+            def _probe():
+                try:
+                    ok = probe_func()
+                except Exception as e:
+                    logger.warning(f"再接続試行エラー ({breaker.name}): {e}")
+                    ok = False
+                if ok:
+                    breaker.record_success()
+                else:
+                    breaker.record_failure()
+
+            thread = threading.Thread(target=_probe, daemon=True, name=f"breaker-probe:{breaker.name}")
+            self._probes[key] = thread
+            thread.start()
+            return True
+
+    def reset(self):
+        with self._lock:
+            self._breakers.clear()
+
+    def get_stats(self):
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {breaker.name: breaker.to_dict() for breaker in breakers.values()}
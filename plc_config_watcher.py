@@ -0,0 +1,115 @@
+import os
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 中央サーバーからの設定変更通知（ロングポーリング）を使うか
+CONFIG_WATCH_ENABLED = os.getenv("CONFIG_WATCH_ENABLED", "true").lower() == "true"
+# 1回のロングポーリングでサーバーに応答を保留させる時間（秒）
+CONFIG_WATCH_TIMEOUT = float(os.getenv("CONFIG_WATCH_TIMEOUT", "25"))
+# 通信エラー後に待機を再開するまでの待ち時間（秒）
+CONFIG_WATCH_RETRY_SEC = float(os.getenv("CONFIG_WATCH_RETRY_SEC", "5"))
+# 変更通知を受信できている間の設定の定期再読み込み間隔（秒、通知の取りこぼし対策）
+CONFIG_SAFETY_RELOAD_INTERVAL = float(os.getenv("CONFIG_SAFETY_RELOAD_INTERVAL", "300"))
+
+class ConfigWatcher:
+    """中央サーバーの設定バージョンをロングポーリングで監視し、変更時に on_change を呼ぶ
+
+    on_change(version) は設定が変更された時と、通信エラーから復旧した時
+    （待機していない間の変更を取りこぼした可能性があるため）に呼ばれる。
+    on_status(connected) は通知を受信できる状態が変わった時に呼ばれ、
+    呼び出し側は受信できている間だけ定期的な再読み込みを間引く。
+    中央サーバーが未対応の場合は監視を終了し、定期的な再読み込みのみとなる。
+    """
+
+    def __init__(self, db_api, get_equipment_id, on_change, on_status=None, stop_event=None,
+                 timeout=CONFIG_WATCH_TIMEOUT, retry_sec=CONFIG_WATCH_RETRY_SEC):
+        self.db_api = db_api
+        self.get_equipment_id = get_equipment_id
+        self.on_change = on_change
+        self.on_status = on_status
+        self.stop_event = stop_event or threading.Event()
+        self.timeout = timeout
+        self.retry_sec = retry_sec
+        self.equipment_id = None
+        self.version = None
+        self.connected = False
+        self.changes = 0
+        self.failures = 0
+        self._thread = None
+
+    def _set_connected(self, connected):
+        if connected == self.connected:
+            return
+        self.connected = connected
+        if connected:
+            logger.info(f"🔔 設定変更の通知を待機中: {self.equipment_id}")
+        else:
+            logger.warning("⚠️ 設定変更の通知を受信できないため定期的な再読み込みに戻します")
+        if self.on_status:
+            self.on_status(connected)
+
+    def _notify(self, version):
+        self.changes += 1
+        try:
+            self.on_change(version)
+        except Exception as e:
+            logger.error(f"❌ 設定変更の反映エラー: {e}")
+
+    def poll_once(self):
+        """1回待機する（バージョンを取得できたら True）"""
+        equipment_id = self.get_equipment_id()
+        if equipment_id != self.equipment_id:
+            # 設備IDが変わったら前回のバージョンは引き継がない
+            self.equipment_id = equipment_id
+            self.version = None
+        if not equipment_id:
+            return False
+
+        # 未接続の間は待機せず現在のバージョンを取得（復旧直後に取りこぼしを確認するため）
+        since = self.version if self.connected else None
+        version = self.db_api.wait_config_version(equipment_id, since=since, timeout=self.timeout)
+        if version is None:
+            self.failures += 1
+            self._set_connected(False)
+            return False
+
+        recovered = not self.connected and self.version is not None
+        self._set_connected(True)
+        if self.version is not None and (version != self.version or recovered):
+            self._notify(version)
+        self.version = version
+        return True
+
+    def _run(self):
+        logger.info("🔔 設定変更の監視スレッド起動")
+        while not self.stop_event.is_set():
+            try:
+                ok = self.poll_once()
+            except Exception as e:
+                ok = False
+                logger.error(f"❌ 設定変更の監視エラー: {e}")
+            if not self.db_api.config_watch_supported:
+                logger.warning("⚠️ 中央サーバーが設定変更の通知に未対応のため監視を終了します")
+                self._set_connected(False)
+                break
+            if not ok:
+                self.stop_event.wait(self.retry_sec)
+        logger.info("🛑 設定変更の監視スレッド停止")
+
+    def start(self):
+        """監視スレッドを起動（起動済みなら何もしない）"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True, name="config-watcher")
+            self._thread.start()
+        return self
+
+    def get_stats(self):
+        return {
+            "equipment_id": self.equipment_id,
+            "version": self.version,
+            "connected": self.connected,
+            "changes": self.changes,
+            "failures": self.failures,
+        }
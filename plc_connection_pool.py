@@ -0,0 +1,163 @@
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# メーカー名の正規化テーブル（日本語表記・英語表記の両方に対応）
+MANUFACTURER_ALIASES = {
+    "mitsubishi": "mitsubishi",
+    "三菱": "mitsubishi",
+    "keyence": "keyence",
+    "キーエンス": "keyence",
+    "omron": "omron",
+    "オムロン": "omron",
+    "siemens": "siemens",
+    "シーメンス": "siemens",
+}
+
+def normalize_manufacturer(manufacturer):
+    """メーカー名を内部キー（mitsubishi/keyence/omron/siemens）に正規化"""
+    if not manufacturer:
+        return ""
+    name = str(manufacturer).strip()
+    return MANUFACTURER_ALIASES.get(name.lower(), MANUFACTURER_ALIASES.get(name, name.lower()))
+
+def is_session_alive(manufacturer, conn):
+    """接続オブジェクトが生きているかをメーカー別に判定（通信は発生させない）"""
+    if conn is None:
+        return False
+    try:
+        vendor = normalize_manufacturer(manufacturer)
+        if vendor == "mitsubishi":
+            # pymcprotocol.Type3E は接続状態を _is_connected で保持
+            # パイプライン読み取り（MC 4E）クライアントは connected で保持
+            return bool(getattr(conn, "_is_connected", getattr(conn, "connected", True)))
+        elif vendor == "keyence":
+            # pymodbus 3.x は connected プロパティ、2.x は is_socket_open()
+            if hasattr(conn, "connected"):
+                return bool(conn.connected)
+            if hasattr(conn, "is_socket_open"):
+                return bool(conn.is_socket_open())
+            return True
+        elif vendor == "siemens":
+            return bool(conn.get_connected())
+        # FINS/TCP は接続状態を connected で保持、FINS/UDP はコネクションレスのため常に有効とみなす
+        return bool(getattr(conn, "connected", True))
+    except Exception as e:
+        logger.warning(f"接続状態確認エラー({manufacturer}): {e}")
+        return False
+
+def close_session(manufacturer, conn):
+    """メーカー別の切断処理（例外は握りつぶす）"""
+    if conn is None:
+        return
+    try:
+        vendor = normalize_manufacturer(manufacturer)
+        if vendor == "siemens":
+            conn.disconnect()
+        elif hasattr(conn, "close"):
+            conn.close()
+    except Exception:
+        pass
+
+class PLCConnectionPool:
+    """PLC接続プール
+
+    (メーカー, IP, ポート) ごとに1つのセッションを保持し、ポーリング周期を
+    またいで再利用する。切断は通信失敗時（invalidate）のみ行い、次回の
+    acquire で再接続する。
+    """
+
+    def __init__(self):
+        self._sessions = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def _key(self, manufacturer, ip, port):
+        return (normalize_manufacturer(manufacturer), str(ip), int(port or 0))
+
+    def _get_stats(self, key):
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = {
+                "reused": 0,
+                "connects": 0,
+                "reconnects": 0,
+                "failures": 0,
+                "connected_at": None,
+                "last_used": None
+            }
+            self._stats[key] = stats
+        return stats
+
+    def _key_lock(self, key):
+        # 接続処理はキー単位でロック（遅いPLCが他のPLCの接続を妨げないように）
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = threading.Lock()
+                self._key_locks[key] = lock
+            return lock
+
+    def acquire(self, manufacturer, ip, port, connect_func):
+        """有効なセッションを返す。無い場合のみ connect_func() で接続する"""
+        key = self._key(manufacturer, ip, port)
+        with self._key_lock(key):
+            with self._lock:
+                stats = self._get_stats(key)
+                conn = self._sessions.get(key)
+
+            if conn is not None:
+                if is_session_alive(manufacturer, conn):
+                    with self._lock:
+                        stats["reused"] += 1
+                        stats["last_used"] = time.time()
+                    return conn
+                # ヘルスチェック失敗 → 破棄して再接続
+                logger.warning(f"♻️ セッション切断を検知、再接続します: {key}")
+                close_session(manufacturer, conn)
+                with self._lock:
+                    self._sessions.pop(key, None)
+
+            conn = connect_func()
+
+            with self._lock:
+                if conn is None:
+                    stats["failures"] += 1
+                    return None
+
+                if stats["connects"] > 0:
+                    stats["reconnects"] += 1
+                stats["connects"] += 1
+                stats["connected_at"] = time.time()
+                stats["last_used"] = stats["connected_at"]
+                self._sessions[key] = conn
+            logger.info(f"🔗 PLCセッション確立: {key} (再接続 {stats['reconnects']}回)")
+            return conn
+
+    def invalidate(self, manufacturer, ip, port):
+        """通信失敗したセッションを破棄（次回acquire時に再接続）"""
+        key = self._key(manufacturer, ip, port)
+        with self._lock:
+            conn = self._sessions.pop(key, None)
+            if conn is not None:
+                self._get_stats(key)["failures"] += 1
+                close_session(manufacturer, conn)
+                logger.warning(f"🔌 PLCセッションを破棄しました: {key}")
+
+    def close_all(self):
+        """全セッションを切断（エージェント停止時）"""
+        with self._lock:
+            for (vendor, ip, port), conn in self._sessions.items():
+                close_session(vendor, conn)
+            self._sessions.clear()
+
+    def get_stats(self):
+        """セッションごとの再利用・再接続回数を返す"""
+        with self._lock:
+            return {
+                f"{vendor}@{ip}:{port}": dict(stats, active=(vendor, ip, port) in self._sessions)
+                for (vendor, ip, port), stats in self._stats.items()
+            }
@@ -44,19 +44,26 @@ class PLCDataConfig(db.Model):
     address = db.Column(db.String(20), nullable=False)    # D100, D101など
     scale_factor = db.Column(db.Integer, default=1)       # 倍率
     plc_data_type = db.Column(db.String(20), default='word')  # bit, word, dword, float32
+    scan_class = db.Column(db.String(20), nullable=True)      # fast, normal, slow または周期(ms)。未設定は設備の interval
+    deadband = db.Column(db.Float, nullable=True)             # 絶対値デッドバンド（変化分のみ送信時）
+    deadband_percent = db.Column(db.Float, nullable=True)     # 変化率デッドバンド（%）
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # ユニーク制約: 同じ設備の同じデータ型は1つまで
     __table_args__ = (db.UniqueConstraint('equipment_id', 'data_type', name='uq_equipment_data_type'),)
     
-    def __init__(self, equipment_id, data_type, enabled=True, address="", scale_factor=1, plc_data_type="word"):
+    def __init__(self, equipment_id, data_type, enabled=True, address="", scale_factor=1, plc_data_type="word", scan_class=None,
+                 deadband=None, deadband_percent=None):
         self.equipment_id = equipment_id
         self.data_type = data_type
         self.enabled = enabled
         self.address = address
         self.scale_factor = scale_factor
         self.plc_data_type = plc_data_type
+        self.scan_class = scan_class
+        self.deadband = deadband
+        self.deadband_percent = deadband_percent
 
 class Log(db.Model):
     """ログテーブル（全データ項目対応版）"""
@@ -113,10 +120,17 @@ class PLCDataTypes:
     WORD = "word"
     DWORD = "dword"
     FLOAT32 = "float32"
+    INT16 = "int16"
+    UINT32 = "uint32"
+    INT32 = "int32"
+    FLOAT64 = "float64"
+    BCD = "bcd"
+    BCD32 = "bcd32"
     
     @classmethod
     def get_all(cls):
-        return [cls.BIT, cls.WORD, cls.DWORD, cls.FLOAT32]
+        return [cls.BIT, cls.WORD, cls.DWORD, cls.FLOAT32,
+                cls.INT16, cls.UINT32, cls.INT32, cls.FLOAT64, cls.BCD, cls.BCD32]
     
     @classmethod
     def get_display_names(cls):
@@ -124,7 +138,13 @@ class PLCDataTypes:
             cls.BIT: "Bit",
             cls.WORD: "Word (16bit)",
             cls.DWORD: "DWord (32bit)",
-            cls.FLOAT32: "Float32"
+            cls.FLOAT32: "Float32",
+            cls.INT16: "Int16 (符号付き16bit)",
+            cls.UINT32: "UInt32 (32bit)",
+            cls.INT32: "Int32 (符号付き32bit)",
+            cls.FLOAT64: "Float64",
+            cls.BCD: "BCD (16bit)",
+            cls.BCD32: "BCD (32bit)"
         }
 
 # デフォルト設定を作成するヘルパー関数
@@ -0,0 +1,261 @@
+import struct
+
+try:
+    import numpy as np
+except ImportError:  # NumPy が無い環境では純Python実装で処理
+    np = None
+
+# スケール除算をNumPyでまとめて行う最小項目数（少数ではPython演算の方が速い）
+NUMPY_MIN_TAGS = 16
+
+# データ型ごとの占有ワード数
+DATA_TYPE_WORDS = {
+    "bit": 1,
+    "word": 1,
+    "int16": 1,
+    "bcd": 1,
+    "dword": 2,
+    "uint32": 2,
+    "int32": 2,
+    "float32": 2,
+    "bcd32": 2,
+    "float64": 4,
+}
+
+# データ型ごとの struct フォーマット文字
+DATA_TYPE_FORMATS = {
+    "word": "H",
+    "int16": "h",
+    "bcd": "H",
+    "dword": "I",
+    "uint32": "I",
+    "int32": "i",
+    "float32": "f",
+    "bcd32": "I",
+    "float64": "d",
+}
+
+BCD_TYPES = ("bcd", "bcd32")
+
+# ダブルワード以上のワード順: 下位ワードが先のメーカー（それ以外は上位ワードが先）
+LOW_WORD_FIRST_VENDORS = ("mitsubishi",)
+# data_type "word" を符号付き16bitとして返すメーカー（pymcprotocol の batchread_wordunits と同じ。
+# それ以外のメーカーは符号なし16bit）。ブロック読み取り・ランダム読出し・パイプラインで共通
+SIGNED_WORD_VENDORS = ("mitsubishi",)
+
+def word_byte_order(vendor):
+    """ワード列をバイト列に並べる際のバイト順（struct の先頭文字）"""
+    # 下位ワードが先 → 各ワードをリトルエンディアンで並べると32/64bit値もリトルエンディアンになる
+    return "<" if vendor in LOW_WORD_FIRST_VENDORS else ">"
+
+def word_format(vendor):
+    """data_type "word" の struct フォーマット文字（符号付き h / 符号なし H）"""
+    return "h" if vendor in SIGNED_WORD_VENDORS else "H"
+
+def bcd_to_int(value):
+    """BCD値を整数に変換（例: 0x1234 → 1234）"""
+    result = 0
+    multiplier = 1
+    while value:
+        result += (value & 0xF) * multiplier
+        multiplier *= 10
+        value >>= 4
+    return result
+
+# === スカラーデコーダ（ビット単位ブロック・ランダム読出し用） ===
+def _decode_word(tag, values, rel):
+    return values[rel]
+
+def _decode_bit(tag, values, rel):
+    return 1 if values[rel] else 0
+
+def _decode_bit_in_word(tag, values, rel):
+    return (values[rel] >> tag.bit) & 1
+
+def _decode_coil_word(tag, values, rel):
+    # コイル16点 → 16bit整数
+    value = 0
+    for i in range(16):
+        if values[rel + i]:
+            value |= (1 << i)
+    return value
+
+def _make_multiword_decoder(vendor, data_type):
+    """複数ワード型（およびint16/BCD）のスカラーデコーダを生成"""
+    order = word_byte_order(vendor)
+    fmt = DATA_TYPE_FORMATS[data_type]
+    words = DATA_TYPE_WORDS[data_type]
+    packer = struct.Struct(f"{order}{words}H")
+    unpacker = struct.Struct(f"{order}{fmt}")
+    is_bcd = data_type in BCD_TYPES
+
+    def decode(tag, values, rel):
+        raw = unpacker.unpack(packer.pack(*[v & 0xFFFF for v in values[rel:rel + words]]))[0]
+        return bcd_to_int(raw) if is_bcd else raw
+    return decode
+
+_multiword_decoders = {}
+
+def select_decoder(vendor, kind, data_type, width, bit):
+    """データ型・読み取り単位・ワード順からスカラーデコーダを選択"""
+    if bit is not None:
+        return _decode_bit_in_word
+    if data_type == "bit":
+        return _decode_bit
+    if kind == "bit" and width == 16:
+        return _decode_coil_word
+    if data_type == "word" or data_type not in DATA_TYPE_FORMATS:
+        return _decode_word
+    key = (word_byte_order(vendor), data_type)
+    decoder = _multiword_decoders.get(key)
+    if decoder is None:
+        decoder = _make_multiword_decoder(vendor, data_type)
+        _multiword_decoders[key] = decoder
+    return decoder
+
+# === ランダム読出し（1点ずつ返る値）の変換 ===
+_INT32_LE = struct.Struct("<i")
+_UINT32_LE = struct.Struct("<I")
+_FLOAT32_LE = struct.Struct("<f")
+
+def convert_word_point(tag, value, bit=None, vendor=None):
+    """1ワード点の値を型変換（ライブラリが符号付きで返す場合にも対応）
+
+    data_type "word" はブロック読み取りと同じく SIGNED_WORD_VENDORS のメーカーでは
+    符号付き、それ以外は符号なしで返す。
+    """
+    if bit is not None:
+        return (value >> bit) & 1
+    if tag.data_type == "bcd":
+        return bcd_to_int(value & 0xFFFF)
+    value &= 0xFFFF
+    if tag.data_type == "int16" or (tag.data_type == "word" and vendor in SIGNED_WORD_VENDORS):
+        return value - 0x10000 if value & 0x8000 else value
+    return value
+
+def convert_dword_point(tag, value):
+    """1ダブルワード点の値を型変換"""
+    if tag.data_type == "float32":
+        return _FLOAT32_LE.unpack(_UINT32_LE.pack(value & 0xFFFFFFFF))[0]
+    if tag.data_type == "int32":
+        return _INT32_LE.unpack(_UINT32_LE.pack(value & 0xFFFFFFFF))[0]
+    if tag.data_type == "bcd32":
+        return bcd_to_int(value & 0xFFFFFFFF)
+    return value & 0xFFFFFFFF
+
+def apply_scale(values, scaled_index, divisors, divisor_array=None):
+    """スケール対象の項目をまとめて除算（NumPyがあれば1回の配列演算）"""
+    if not scaled_index:
+        return values
+    if np is not None and len(scaled_index) >= NUMPY_MIN_TAGS:
+        if divisor_array is None:
+            divisor_array = np.asarray(divisors, dtype=np.float64)
+        raw = np.fromiter((values[i] for i in scaled_index), dtype=np.float64, count=len(scaled_index))
+        for i, value in zip(scaled_index, (raw / divisor_array).tolist()):
+            values[i] = value
+    else:
+        for i, divisor in zip(scaled_index, divisors):
+            values[i] = values[i] / divisor
+    return values
+
+class BlockDecoder:
+    """ブロック読み取り結果を全項目まとめてデコード
+
+    ブロック内の項目配置から struct フォーマット（隙間は 'x' で読み飛ばし）を
+    事前に組み立て、1回の unpack_from でブロック全体を取り出す。
+    アドレスが重なる項目は別レイヤーのフォーマットに分ける。
+    """
+
+    def __init__(self, vendor, block, unit_bytes=2, byte_order=None):
+        self.vendor = vendor
+        self.count = block.count
+        self.unit_bytes = unit_bytes           # 1アドレスあたりのバイト数（ワード=2, S7バイト=1）
+        self.order = byte_order or word_byte_order(vendor)
+        self.packer = struct.Struct(f"{self.order}{block.count}H") if unit_bytes == 2 else None
+
+        # (バイトオフセット, フォーマット) → フィールド番号
+        fields = {}
+        field_list = []
+        tag_fields = []
+        for tag, rel in block.tags:
+            if tag.bit is not None:
+                fmt = "H"
+            elif tag.data_type == "word" or tag.data_type not in DATA_TYPE_FORMATS:
+                fmt = word_format(vendor)
+            else:
+                fmt = DATA_TYPE_FORMATS[tag.data_type]
+            if unit_bytes == 1 and (tag.bit is not None or tag.width == 1):
+                fmt = "B"
+            key = (rel * unit_bytes, fmt)
+            if key not in fields:
+                fields[key] = len(field_list)
+                field_list.append(key)
+            tag_fields.append((tag, fields[key]))
+
+        # 重ならないフィールドごとにレイヤー（struct）を構成
+        layers = []
+        for index, (offset, fmt) in sorted(enumerate(field_list), key=lambda f: f[1][0]):
+            size = struct.calcsize(f"{self.order}{fmt}")
+            for layer in layers:
+                if layer["end"] <= offset:
+                    layer["items"].append((index, offset, fmt))
+                    layer["end"] = offset + size
+                    break
+            else:
+                layers.append({"items": [(index, offset, fmt)], "end": offset + size})
+
+        self.layers = []
+        for layer in layers:
+            fmt = self.order
+            position = 0
+            indexes = []
+            for index, offset, field_fmt in layer["items"]:
+                if offset > position:
+                    fmt += f"{offset - position}x"
+                fmt += field_fmt
+                position = offset + struct.calcsize(f"{self.order}{field_fmt}")
+                indexes.append(index)
+            self.layers.append((struct.Struct(fmt), indexes))
+
+        self.field_count = len(field_list)
+        self.keys = [tag.key for tag, _ in tag_fields]
+        self.field_index = [field for _, field in tag_fields]
+
+        # 項目ごとの後処理（ビット抽出・BCD変換）
+        self.bit_items = [(i, tag.bit) for i, (tag, _) in enumerate(tag_fields) if tag.bit is not None]
+        self.bcd_items = [i for i, (tag, _) in enumerate(tag_fields)
+                          if tag.bit is None and tag.data_type in BCD_TYPES]
+        self.scaled_index = [i for i, (tag, _) in enumerate(tag_fields) if tag.divisor]
+        self.divisors = [tag.divisor for tag, _ in tag_fields if tag.divisor]
+        self.divisor_array = None
+        if np is not None and len(self.divisors) >= NUMPY_MIN_TAGS:
+            self.divisor_array = np.asarray(self.divisors, dtype=np.float64)
+
+    def to_buffer(self, words):
+        """ワード列（符号付き/符号なし混在可）をバイト列に変換"""
+        if np is not None and len(words) >= NUMPY_MIN_TAGS:
+            dtype = "<u2" if self.order == "<" else ">u2"
+            return np.asarray(words, dtype=np.int64).astype(dtype).tobytes()
+        return self.packer.pack(*[w & 0xFFFF for w in words])
+
+    def decode_buffer(self, buffer, data):
+        """バイト列から全項目をデコードし data に格納"""
+        view = memoryview(buffer)
+        fields = [None] * self.field_count
+        for unpacker, indexes in self.layers:
+            for index, value in zip(indexes, unpacker.unpack_from(view)):
+                fields[index] = value
+
+        values = [fields[i] for i in self.field_index]
+        for i, bit in self.bit_items:
+            values[i] = (values[i] >> bit) & 1
+        for i in self.bcd_items:
+            values[i] = bcd_to_int(values[i])
+        apply_scale(values, self.scaled_index, self.divisors, self.divisor_array)
+
+        data.update(zip(self.keys, values))
+        return data
+
+    def decode_words(self, words, data):
+        """ワード列から全項目をデコードし data に格納"""
+        return self.decode_buffer(self.to_buffer(words[:self.count]), data)
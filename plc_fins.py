@@ -0,0 +1,153 @@
+import socket
+import struct
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# FINS/TCP 設定
+FINS_TCP_PORT = 9600
+FINS_TCP_MAGIC = b"FINS"
+FINS_TCP_NODE_ADDRESS_REQUEST = 0    # クライアント→サーバー: ノードアドレス通知
+FINS_TCP_NODE_ADDRESS_RESPONSE = 1   # サーバー→クライアント: ノードアドレス確定
+FINS_TCP_FRAME_SEND = 2              # FINSフレーム送信
+FINS_TCP_HEADER = struct.Struct(">4sIII")   # マジック, 長さ, コマンド, エラーコード
+
+# FINSコマンド（MRC, SRC）
+FINS_MEMORY_AREA_READ = (0x01, 0x01)
+FINS_MULTIPLE_MEMORY_AREA_READ = (0x01, 0x04)
+
+# 送信元SIDと一致しない応答（タイムアウトした過去の要求への応答）を読み捨てる上限
+FINS_MAX_STALE_RESPONSES = 8
+
+class FinsError(Exception):
+    """FINSの異常応答（終了コード・FINS/TCPエラーコード）"""
+
+class FinsTcpClient:
+    """オムロン FINS/TCP クライアント
+
+    接続時にノードアドレスのハンドシェイクを行い、以降は同じTCPセッションで
+    コマンドを送受信する。要求ごとにSID（サービスID）を採番し、応答のSIDが
+    一致しないもの（タイムアウト後に遅れて届いた応答）は読み捨てるため、
+    タイムアウト後もセッションを安全に再利用できる。
+    """
+
+    def __init__(self, ip, port=FINS_TCP_PORT, timeout=5.0, client_node=0, dest_net=0, dest_unit=0):
+        self.ip = ip
+        self.port = port
+        self.timeout = timeout
+        self.client_node = client_node    # 0 = サーバーに自動割り当てを要求
+        self.server_node = None
+        self.dest_net = dest_net
+        self.dest_unit = dest_unit
+        self.connected = False
+        self.stale_responses = 0
+        self._sock = None
+        self._sid = 0
+        self._lock = threading.Lock()
+
+    def connect(self):
+        """TCP接続とノードアドレスのハンドシェイク"""
+        self._sock = socket.create_connection((self.ip, self.port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            self._send_tcp(FINS_TCP_NODE_ADDRESS_REQUEST, struct.pack(">I", self.client_node))
+            command, data = self._recv_tcp()
+            if command != FINS_TCP_NODE_ADDRESS_RESPONSE or len(data) < 8:
+                raise FinsError(f"ノードアドレス応答が不正: コマンド{command}")
+            self.client_node, self.server_node = struct.unpack(">II", data[:8])
+        except Exception:
+            self.close()
+            raise
+        self.connected = True
+        logger.info(f"🔗 FINS/TCP接続: {self.ip}:{self.port} (ノード {self.client_node} → {self.server_node})")
+        return self
+
+    def close(self):
+        self.connected = False
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def _send_tcp(self, command, data):
+        self._sock.sendall(FINS_TCP_HEADER.pack(FINS_TCP_MAGIC, 8 + len(data), command, 0) + data)
+
+    def _recv_exact(self, size):
+        chunks = bytearray()
+        while len(chunks) < size:
+            chunk = self._sock.recv(size - len(chunks))
+            if not chunk:
+                raise ConnectionError("FINS/TCP接続が切断されました")
+            chunks += chunk
+        return bytes(chunks)
+
+    def _recv_tcp(self):
+        magic, length, command, error = FINS_TCP_HEADER.unpack(self._recv_exact(FINS_TCP_HEADER.size))
+        if magic != FINS_TCP_MAGIC:
+            # ストリームの同期が崩れているため切断扱い
+            raise ConnectionError(f"FINS/TCPヘッダが不正: {magic!r}")
+        data = self._recv_exact(length - 8)
+        if error:
+            raise FinsError(f"FINS/TCPエラーコード 0x{error:08X}")
+        return command, data
+
+    def execute(self, command, body=b""):
+        """FINSコマンドを送信し、SIDが一致する応答のデータ部（終了コードの後）を返す"""
+        with self._lock:
+            if not self.connected:
+                raise ConnectionError("FINS/TCP未接続")
+            self._sid = (self._sid + 1) & 0xFF
+            sid = self._sid
+            header = bytes([
+                0x80, 0x00, 0x02,                                   # ICF(応答要), RSV, GCT
+                self.dest_net, self.server_node & 0xFF, self.dest_unit,
+                0x00, self.client_node & 0xFF, 0x00,                # 送信元 ネットワーク, ノード, ユニット
+                sid,
+            ])
+            try:
+                self._send_tcp(FINS_TCP_FRAME_SEND, header + bytes(command) + body)
+                for _ in range(FINS_MAX_STALE_RESPONSES + 1):
+                    tcp_command, frame = self._recv_tcp()
+                    if tcp_command != FINS_TCP_FRAME_SEND or len(frame) < 14:
+                        raise FinsError(f"FINS応答が不正: コマンド{tcp_command} / {len(frame)}バイト")
+                    if frame[9] != sid or tuple(frame[10:12]) != tuple(command):
+                        # 過去の要求への遅延応答は読み捨てる
+                        self.stale_responses += 1
+                        continue
+                    main_code, sub_code = frame[12] & 0x7F, frame[13] & 0x3F
+                    if main_code or sub_code:
+                        raise FinsError(f"FINS終了コード {main_code:02X}{sub_code:02X}")
+                    return frame[14:]
+                raise FinsError(f"SID {sid} の応答が得られません")
+            except (OSError, ConnectionError) as e:
+                # タイムアウト・切断時はセッションを無効化（接続プールが再接続）
+                self.close()
+                raise ConnectionError(f"FINS/TCP通信エラー: {e}") from e
+
+    def memory_area_read(self, area, address, count, bit=0):
+        """メモリエリア読出し (0101): 連続したワードを読み取る"""
+        data = self.execute(FINS_MEMORY_AREA_READ, struct.pack(">BHBH", area, address, bit, count))
+        if len(data) < count * 2:
+            raise FinsError(f"FINS応答データ不足: {len(data)}バイト")
+        return list(struct.unpack(f">{count}H", data[:count * 2]))
+
+    def multiple_memory_area_read(self, items):
+        """複数メモリエリア読出し (0104): エリアの異なる不連続ワードを1フレームで読み取る
+
+        items: [(エリアコード, ワードアドレス), ...]（ワード指定のエリアのみ）
+        """
+        body = b"".join(struct.pack(">BHB", area, address, 0) for area, address in items)
+        data = self.execute(FINS_MULTIPLE_MEMORY_AREA_READ, body)
+        if len(data) < len(items) * 3:
+            raise FinsError(f"FINS応答データ不足: {len(data)}バイト")
+        values = []
+        for index, (area, _) in enumerate(items):
+            # 各項目は エリアコード(1) + データ(2)
+            code, value = struct.unpack_from(">BH", data, index * 3)
+            if code != area:
+                raise FinsError(f"FINS応答のエリアコード不一致: 0x{code:02X} != 0x{area:02X}")
+            values.append(value)
+        return values
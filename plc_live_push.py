@@ -0,0 +1,134 @@
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+
+from plc_shared_values import QUALITY_NAMES
+
+logger = logging.getLogger(__name__)
+
+# 共有メモリの新しいサンプルを確認してキオスク画面へ送る間隔（秒）
+LIVE_PUSH_INTERVAL = float(os.getenv("LIVE_PUSH_INTERVAL", "0.05"))
+# エージェントの状態（設定バージョン）を確認する間隔（秒）
+LIVE_STATUS_INTERVAL = 1.0
+
+class LiveValuePusher:
+    """共有メモリに公開された取得値を Socket.IO でキオスク画面へ送る
+
+    LIVE_PUSH_INTERVAL 秒ごとに共有メモリの新しいサンプルを読み、ターゲットごとに
+    前回送信から変化した項目のみを emit(message) で送る。接続直後のクライアントには
+    snapshot() で全項目を送り、以降は変化分を重ねて表示する。
+    メッセージ: {"full": bool, "targets": {ターゲット名: {"ts": epoch ミリ秒, "timestamp": 表示用時刻,
+               "quality": 品質, "data": 全項目（full）または変化した項目}}}
+    エージェントの設定バージョンが変わった場合は on_config_changed() を呼ぶ。
+    共有メモリの項目表が作り直された場合（設定変更・エージェント再起動）は全項目を送り直す。
+    """
+
+    def __init__(self, shared_values, emit, on_config_changed=None, interval=LIVE_PUSH_INTERVAL,
+                 sleep=time.sleep):
+        self.shared_values = shared_values
+        self.emit = emit
+        self.on_config_changed = on_config_changed
+        self.interval = interval
+        self.sleep = sleep
+        self.next_seq = None
+        self.pushes = 0
+        self.samples = 0
+        self._state = {}                 # 最後に送信したターゲットごとの値
+        self._generation = None          # 送信済みの値の項目表の世代
+        self._config_version = None
+        self._status_checked = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _header(sample):
+        return {
+            "ts": round(sample["timestamp"] * 1000),
+            "timestamp": datetime.fromtimestamp(sample["timestamp"]).strftime("%Y-%m-%d %H:%M:%S"),
+            "quality": QUALITY_NAMES.get(sample["quality"], "unknown"),
+        }
+
+    def snapshot(self):
+        """接続直後のクライアントに送る全項目"""
+        with self._lock:
+            return self._full_message()
+
+    def _full_message(self):
+        return {"full": True, "targets": {name: dict(state, data=dict(state["data"]))
+                                         for name, state in self._state.items()}}
+
+    def _load_latest(self):
+        """各ターゲットの最新値から送信状態を作り直す"""
+        # 番号を先に取得（最新値の読み取り中に公開されたサンプルは次の step() で送る）
+        self.next_seq = self.shared_values.write_seq
+        self._generation = self.shared_values.tag_generation
+        self._state = {name: dict(self._header(sample), data=dict(sample["values"]))
+                       for name, sample in self.shared_values.latest().items()}
+
+    def step(self):
+        """新しいサンプルを読み、変化があれば送信（送信したメッセージを返す）"""
+        with self._lock:
+            if self.next_seq is None:
+                # 起動時は各ターゲットの最新値から始める
+                self._load_latest()
+                return None
+            if self.shared_values.tag_generation != self._generation:
+                # 項目表が作り直された → 削除された項目を残さないよう全項目を送り直す
+                self._load_latest()
+                message = self._full_message()
+            else:
+                message = None
+        if message is not None:
+            self.emit(message)
+            self.pushes += 1
+            return message
+
+        with self._lock:
+            samples, self.next_seq = self.shared_values.read_since(self.next_seq)
+            if not samples:
+                return None
+            self.samples += len(samples)
+            targets = {}
+            for sample in samples:
+                name = sample["target"]
+                state = self._state.setdefault(name, {"data": {}})
+                changed = {key: value for key, value in sample["values"].items()
+                           if state["data"].get(key) != value}
+                state["data"].update(changed)
+                state.update(self._header(sample))
+                # 同じ周期内の複数サンプルは1つのメッセージにまとめる
+                update = targets.setdefault(name, {"data": {}})
+                update.update(self._header(sample))
+                update["data"].update(changed)
+            message = {"full": False, "targets": targets}
+        self.emit(message)
+        self.pushes += 1
+        return message
+
+    def _check_config_version(self):
+        """エージェントの設定バージョン（設定変更の監視）が変わったら通知"""
+        now = time.monotonic()
+        if self.on_config_changed is None or now - self._status_checked < LIVE_STATUS_INTERVAL:
+            return
+        self._status_checked = now
+        status = self.shared_values.read_status() or {}
+        version = (status.get("config_watch") or {}).get("version")
+        if version is not None and self._config_version is not None and version != self._config_version:
+            self.on_config_changed(version)
+        if version is not None:
+            self._config_version = version
+
+    def run(self):
+        """送信ループ（Socket.IO のバックグラウンドタスクとして実行）"""
+        logger.info(f"📡 最新値の送信を開始 ({self.interval * 1000:.0f}ms ごとに確認)")
+        while True:
+            try:
+                self.step()
+                self._check_config_version()
+            except Exception as e:
+                logger.error(f"❌ 最新値の送信エラー: {e}")
+            self.sleep(self.interval)
+
+    def get_stats(self):
+        return {"pushes": self.pushes, "samples": self.samples, "next_seq": self.next_seq}
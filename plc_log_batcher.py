@@ -0,0 +1,124 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+
+from plc_outbox import OutboxRecord
+
+logger = logging.getLogger(__name__)
+
+# ログをまとめて送信する件数（1 以下で無効: 1件ずつ送信）
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "100"))
+# 最初のログを受け取ってから送信するまでの最大待ち時間（ミリ秒）
+LOG_BATCH_DELAY_MS = int(os.getenv("LOG_BATCH_DELAY_MS", "1000"))
+
+class LogBatcher:
+    """ログを件数または時間でまとめて送信するバッファ
+
+    send() は send_log_data と同じ引数で呼び出せ、ログをバッファに追加して
+    送信結果（True/False）の Future をすぐに返す。送信スレッドがバッファの件数が
+    max_size に達した時点、または最初のログから max_delay 秒経過した時点で
+    まとめて deliver に渡す。deliver(records) は OutboxRecord のリストを受け取り、
+    送信できなかったログの扱い（送信待ちへの保存など）も受け持つ。戻り値は
+    ログごとの結果のリスト、または全件共通の結果（True = 送信済み・送信待ちに保存済み）。
+    """
+
+    def __init__(self, deliver, max_size=LOG_BATCH_SIZE, max_delay=LOG_BATCH_DELAY_MS / 1000.0,
+                 stop_event=None):
+        self.deliver = deliver
+        self.max_size = max(1, max_size)
+        self.max_delay = max_delay
+        self.stop_event = stop_event or threading.Event()
+        self.batches = 0
+        self.records = 0
+        self.last_batch_size = 0
+        self._buffer = []
+        self._first_at = None
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def send(self, equipment_id, log_data, partial=False, timestamp=None):
+        """ログをバッファに追加し、送信結果の Future を返す（送信は送信スレッドで行う）"""
+        record = OutboxRecord(None, equipment_id, timestamp or datetime.utcnow(), partial, log_data)
+        result = Future()
+        with self._cond:
+            if not self._buffer:
+                self._first_at = time.monotonic()
+            self._buffer.append((record, result))
+            if len(self._buffer) >= self.max_size:
+                self._cond.notify()
+        return result
+
+    def _take(self):
+        """送信するバッチを取り出す（条件を満たすまで待機。停止時は残りを返す）"""
+        with self._cond:
+            while not self.stop_event.is_set():
+                if len(self._buffer) >= self.max_size:
+                    break
+                if self._buffer:
+                    remaining = self._first_at + self.max_delay - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(min(remaining, 0.5))
+                else:
+                    self._cond.wait(0.5)
+            batch, self._buffer = self._buffer[:self.max_size], self._buffer[self.max_size:]
+            self._first_at = time.monotonic() if self._buffer else None
+            return batch
+
+    def flush(self):
+        """バッファの残りを送信（停止時）"""
+        with self._cond:
+            batch, self._buffer, self._first_at = self._buffer, [], None
+        if batch:
+            self._deliver(batch)
+
+    def _deliver(self, batch):
+        records = [record for record, _ in batch]
+        try:
+            results = self.deliver(records)
+        except Exception as e:
+            results = False
+            logger.error(f"❌ ログのまとめ送信エラー ({len(batch)}件): {e}")
+        if not isinstance(results, (list, tuple)):
+            results = [bool(results)] * len(batch)
+        for (_, result), ok in zip(batch, results):
+            result.set_result(ok is True)
+        self.batches += 1
+        self.records += len(batch)
+        self.last_batch_size = len(batch)
+
+    def _run(self):
+        logger.info(f"📨 ログのまとめ送信を開始 (最大 {self.max_size}件 / {self.max_delay * 1000:.0f}ms)")
+        while not self.stop_event.is_set():
+            batch = self._take()
+            if batch:
+                self._deliver(batch)
+        self.flush()
+        logger.info("🛑 ログのまとめ送信を停止")
+
+    def start(self):
+        """送信スレッドを起動（起動済みなら何もしない）"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True, name="log-batcher")
+            self._thread.start()
+        return self
+
+    def join(self, timeout=None):
+        """停止後、送信スレッドが残りを送り終えるまで待機"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def get_stats(self):
+        with self._cond:
+            buffered = len(self._buffer)
+        return {
+            "batch_size": self.max_size,
+            "batch_delay_ms": round(self.max_delay * 1000),
+            "buffered": buffered,
+            "batches": self.batches,
+            "records": self.records,
+            "last_batch_size": self.last_batch_size,
+        }
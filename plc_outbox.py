@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# 送信待ちログ（中央サーバー停止中に保存し、復旧後に再送）
+OUTBOX_ENABLED = os.getenv("OUTBOX_ENABLED", "true").lower() == "true"
+OUTBOX_PATH = os.getenv("OUTBOX_PATH", "outbox/plc_outbox.db")
+# ディスク使用量の上限（バイト）。超えた場合は古い順に破棄
+OUTBOX_MAX_BYTES = int(os.getenv("OUTBOX_MAX_BYTES", str(64 * 1024 * 1024)))
+# 再送1回あたりの件数と、再送全体の上限（件/秒。復旧直後の中央サーバーに負荷をかけすぎない）
+OUTBOX_DRAIN_BATCH = int(os.getenv("OUTBOX_DRAIN_BATCH", "200"))
+OUTBOX_DRAIN_RATE = float(os.getenv("OUTBOX_DRAIN_RATE", "100"))
+# 再送失敗後に次の再送を試みるまでの待ち時間（秒）
+OUTBOX_RETRY_SEC = float(os.getenv("OUTBOX_RETRY_SEC", "5"))
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+OutboxRecord = namedtuple("OutboxRecord", "id equipment_id timestamp partial payload")
+
+class LogOutbox:
+    """SQLite（WALモード）による送信待ちログのキュー
+
+    1件 = 1行で、追加順（id 順）に取り出す。コミット済みの行はプロセスの
+    異常終了後も残り、再起動後に再送される。使用量が max_bytes を超えた
+    場合は古い行から破棄する。
+    """
+
+    def __init__(self, path=OUTBOX_PATH, max_bytes=OUTBOX_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: コミットごとの fsync を省略（プロセス異常終了では失われない）
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " equipment_id TEXT NOT NULL,"
+            " timestamp TEXT NOT NULL,"
+            " partial INTEGER NOT NULL DEFAULT 0,"
+            " payload TEXT NOT NULL)"
+        )
+        self.page_size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+        self.pending = self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+        self.stats = {"queued": 0, "sent": 0, "dropped": 0}
+        if self.pending:
+            logger.info(f"📦 送信待ちログ {self.pending}件 を引き継ぎます: {path}")
+
+    def __len__(self):
+        return self.pending
+
+    def put(self, equipment_id, log_data, partial=False, timestamp=None):
+        """ログを1件追加（コミット済みで返る）"""
+        self.put_many([OutboxRecord(None, equipment_id, timestamp or datetime.utcnow(), partial, log_data)])
+
+    def put_many(self, records):
+        """複数のログを1トランザクションで追加"""
+        rows = [(r.equipment_id, r.timestamp.strftime(TIMESTAMP_FORMAT), 1 if r.partial else 0,
+                 json.dumps(r.payload, ensure_ascii=False, separators=(",", ":"))) for r in records]
+        if not rows:
+            return
+        with self._lock:
+            self._transaction(
+                "INSERT INTO outbox (equipment_id, timestamp, partial, payload) VALUES (?, ?, ?, ?)", rows
+            )
+            self.pending += len(rows)
+            self.stats["queued"] += len(rows)
+            self._enforce_limit()
+
+    def peek(self, limit):
+        """古い順に最大 limit 件（取り出しても削除しない）"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, equipment_id, timestamp, partial, payload FROM outbox ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+        return [OutboxRecord(row[0], row[1], datetime.strptime(row[2], TIMESTAMP_FORMAT), bool(row[3]),
+                             json.loads(row[4])) for row in rows]
+
+    def remove(self, ids):
+        """送信済みの行を削除"""
+        if not ids:
+            return
+        with self._lock:
+            self._transaction("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+            self.pending = max(0, self.pending - len(ids))
+            self.stats["sent"] += len(ids)
+            if not self.pending:
+                # 空になったら WAL を切り詰めてディスクを解放
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def _transaction(self, sql, rows):
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany(sql, rows)
+        except sqlite3.Error:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def used_bytes(self):
+        page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (page_count - free_pages) * self.page_size
+
+    def _enforce_limit(self):
+        # 上限超過時は古い順に約1割を破棄（1件ずつ消すと追加のたびに削除が走るため）
+        if self.used_bytes() <= self.max_bytes:
+            return
+        count = max(1, self.pending // 10)
+        self._conn.execute("DELETE FROM outbox WHERE id IN (SELECT id FROM outbox ORDER BY id LIMIT ?)", (count,))
+        self.pending = max(0, self.pending - count)
+        self.stats["dropped"] += count
+        logger.warning(f"⚠️ 送信待ちログが上限 {self.max_bytes} バイトを超えたため古い {count}件 を破棄")
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, pending=self.pending, bytes=self.used_bytes(), path=self.path)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class StoreAndForwardUploader:
+    """送信失敗時に送信待ちへ保存し、復旧後にまとめて再送するログ送信
+
+    send() / send_many() は送信できなかったログを送信待ちに保存する。送信待ちが
+    残っている間は時系列の順序を保つため新しいログも送信待ちに追加し、再送
+    スレッドが古い順に OUTBOX_DRAIN_BATCH 件ずつ、OUTBOX_DRAIN_RATE 件/秒 以下で送る。
+    send_batch_func（一括送信）を指定した場合は再送も一括で行う。
+    send_func / send_batch_func の結果は True=保存済み, False=サーバーが拒否（破棄）,
+    None=未送信（送信待ちに残して再送）。
+    """
+
+    def __init__(self, send_func, outbox, stop_event=None, drain_batch=OUTBOX_DRAIN_BATCH,
+                 drain_rate=OUTBOX_DRAIN_RATE, retry_sec=OUTBOX_RETRY_SEC, send_batch_func=None):
+        self.send_func = send_func
+        self.send_batch_func = send_batch_func
+        self.outbox = outbox
+        self.stop_event = stop_event or threading.Event()
+        self.drain_batch = drain_batch
+        self.drain_rate = drain_rate
+        self.retry_sec = retry_sec
+        self.direct_sends = 0
+        self.rejected = 0
+        self.drain_failures = 0
+        self.last_drain_error = None
+        self._wake = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def send(self, equipment_id, log_data, partial=False, timestamp=None):
+        """ログを送信（送信できない場合は送信待ちに保存し True を返す）"""
+        timestamp = timestamp or datetime.utcnow()
+        return self.send_many([OutboxRecord(None, equipment_id, timestamp, partial, log_data)])
+
+    def send_many(self, records):
+        """複数のログを送信し、送信できなかったログを送信待ちに保存（保存失敗時のみ False）"""
+        if len(self.outbox):
+            pending = records
+        else:
+            results = self.send_records(records)
+            self.direct_sends += results.count(True)
+            pending = [record for record, result in zip(records, results) if result is None]
+            if pending:
+                print(f"📦 送信できないため送信待ちに保存: {len(pending)}件")
+        try:
+            self.outbox.put_many(pending)
+        except sqlite3.Error as e:
+            logger.error(f"❌ 送信待ちへの保存に失敗: {e}")
+            return False
+        if pending:
+            self._wake.set()
+        return True
+
+    def send_records(self, records):
+        """記録を送信し、記録ごとの結果を返す（True=保存済み, False=サーバーが拒否, None=未送信）"""
+        if self.send_batch_func:
+            results = list(self.send_batch_func(records))
+        else:
+            # 1件ずつ送信（send_func も True/False/None を返す。拒否された記録は飛ばし、
+            # 未送信になった時点で以降も未送信として順序を保つ）
+            results = [None] * len(records)
+            for index, record in enumerate(records):
+                result = self.send_func(record.equipment_id, record.payload, partial=record.partial,
+                                        timestamp=record.timestamp)
+                if result is None:
+                    break
+                results[index] = result
+        rejected = results.count(False)
+        if rejected:
+            # 設備未登録などサーバーが受け付けないログは再送しても成功しないため破棄
+            self.rejected += rejected
+            logger.warning(f"⚠️ 中央サーバーが受け付けなかったログ {rejected}件 を破棄")
+        return results
+
+    def drain_once(self):
+        """送信待ちを1バッチ再送（全件送信できたら True）"""
+        records = self.outbox.peek(self.drain_batch)
+        if not records:
+            return True
+        started = time.monotonic()
+        results = self.send_records(records)
+        self.outbox.remove([record.id for record, result in zip(records, results) if result is not None])
+        if None in results:
+            return False
+        # 件数に応じて待ち、再送レートを上限以下に抑える
+        if self.drain_rate > 0:
+            self.stop_event.wait(max(0.0, len(records) / self.drain_rate - (time.monotonic() - started)))
+        return True
+
+    def _run(self):
+        logger.info("📦 送信待ちログの再送スレッド起動")
+        while not self.stop_event.is_set():
+            if not len(self.outbox):
+                self._wake.wait(1.0)
+                self._wake.clear()
+                continue
+            try:
+                ok = self.drain_once()
+            except Exception as e:
+                ok = False
+                logger.error(f"❌ 送信待ちログの再送エラー: {e}")
+            if not ok:
+                self.drain_failures += 1
+                self.last_drain_error = time.time()
+                self.stop_event.wait(self.retry_sec)
+            elif not len(self.outbox):
+                print("✅ 送信待ちログの再送が完了しました")
+        logger.info("🛑 送信待ちログの再送スレッド停止")
+
+    def start(self):
+        """再送スレッドを起動（起動済みなら何もしない）"""
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name="outbox-drain")
+                self._thread.start()
+        return self
+
+    def get_stats(self):
+        return dict(self.outbox.get_stats(), direct_sends=self.direct_sends, rejected=self.rejected,
+                    drain_failures=self.drain_failures, last_drain_error=self.last_drain_error)
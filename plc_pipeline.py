@@ -0,0 +1,184 @@
+import os
+import socket
+import struct
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# パイプライン読み取り: 1接続あたりの同時送信（応答待ち）リクエスト数。0/1 で無効（従来の逐次読み取り）
+PLC_PIPELINE_WINDOW = int(os.getenv("PLC_PIPELINE_WINDOW", "0"))
+
+# 三菱 MC 4E バイナリ: デバイスコード（Q/L シリーズ互換の一括読出し 0401）
+MC_DEVICE_CODES = {
+    "SM": 0x91, "SD": 0xA9, "X": 0x9C, "Y": 0x9D, "M": 0x90, "L": 0x92, "F": 0x93,
+    "B": 0xA0, "D": 0xA8, "W": 0xB4, "SB": 0xA1, "SW": 0xB5, "DX": 0xA2, "DY": 0xA3,
+    "R": 0xAF, "ZR": 0xB0,
+}
+MC_4E_RESPONSE_HEADER = struct.Struct("<2sH2sBBHBH")   # サブヘッダ, シリアル, 予備, NW, PC, I/O, 局, データ長
+MC_MONITORING_TIMER = 4                                # 監視タイマー（250ms単位）
+
+class PipelineRequestError(Exception):
+    """1リクエスト分の異常応答（Modbus例外応答・MC終了コード）。他のリクエストは継続"""
+
+class PipelinedClient:
+    """リクエストIDで応答を照合するパイプライン読み取りクライアントの基底クラス
+
+    ウィンドウ数までのリクエストを応答を待たずに送信し、応答が届くたびに
+    次のリクエストを送る。応答はIDで照合するため順不同でもよく、送信した
+    覚えのないID（タイムアウトした過去の要求への遅延応答）は読み捨てる。
+    PLCとの往復遅延（RTT）がリクエスト数分積み重ならない。
+    """
+
+    label = "PLC"
+
+    def __init__(self, ip, port, timeout=5.0, window=4):
+        self.ip = ip
+        self.port = port
+        self.timeout = timeout
+        self.window = max(1, int(window))
+        self.connected = False
+        self.stale_responses = 0
+        self.max_outstanding = 0
+        self._sock = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def connect(self):
+        self._sock = socket.create_connection((self.ip, self.port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connected = True
+        logger.info(f"🔗 {self.label}パイプライン接続: {self.ip}:{self.port} (ウィンドウ {self.window})")
+        return self
+
+    def close(self):
+        self.connected = False
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def _recv_exact(self, size):
+        chunks = bytearray()
+        while len(chunks) < size:
+            chunk = self._sock.recv(size - len(chunks))
+            if not chunk:
+                raise ConnectionError(f"{self.label}接続が切断されました")
+            chunks += chunk
+        return bytes(chunks)
+
+    def _allocate_id(self):
+        self._next_id = (self._next_id + 1) & 0xFFFF
+        return self._next_id
+
+    def _encode(self, request_id, block):
+        raise NotImplementedError
+
+    def _read_response(self):
+        """応答を1件受信: (リクエストID, 応答データ)"""
+        raise NotImplementedError
+
+    def _decode(self, block, payload):
+        raise NotImplementedError
+
+    def read_blocks(self, blocks):
+        """ブロックをパイプラインで読み取り、ブロック順の結果を返す
+
+        異常応答のブロックは PipelineRequestError を結果に格納する。
+        通信エラー時は接続を無効化して ConnectionError を送出する。
+        """
+        with self._lock:
+            if not self.connected:
+                raise ConnectionError(f"{self.label}未接続")
+            results = [None] * len(blocks)
+            pending = {}       # リクエストID → ブロック番号
+            next_index = 0
+            try:
+                while next_index < len(blocks) or pending:
+                    # ウィンドウが空いた分をまとめて送信
+                    frames = []
+                    while next_index < len(blocks) and len(pending) < self.window:
+                        request_id = self._allocate_id()
+                        frames.append(self._encode(request_id, blocks[next_index]))
+                        pending[request_id] = next_index
+                        next_index += 1
+                    if frames:
+                        self._sock.sendall(b"".join(frames))
+                        self.max_outstanding = max(self.max_outstanding, len(pending))
+
+                    request_id, payload = self._read_response()
+                    index = pending.pop(request_id, None)
+                    if index is None:
+                        self.stale_responses += 1
+                        continue
+                    try:
+                        results[index] = self._decode(blocks[index], payload)
+                    except PipelineRequestError as e:
+                        results[index] = e
+            except (OSError, ConnectionError, struct.error) as e:
+                # 応答の途中で失敗した場合はストリームの同期が取れないため切断
+                self.close()
+                raise ConnectionError(f"{self.label}パイプライン通信エラー: {e}") from e
+            return results
+
+class ModbusPipelineClient(PipelinedClient):
+    """Modbus/TCP パイプライン読み取り（トランザクションIDで照合, FC03 / FC01）"""
+
+    label = "Modbus"
+
+    def __init__(self, ip, port=502, timeout=5.0, window=4, unit_id=1):
+        super().__init__(ip, port, timeout, window)
+        self.unit_id = unit_id
+
+    def _encode(self, request_id, block):
+        function = 0x03 if block.area == "holding" else 0x01
+        return struct.pack(">HHHBBHH", request_id, 0, 6, self.unit_id, function, block.start, block.count)
+
+    def _read_response(self):
+        request_id, _, length, _ = struct.unpack(">HHHB", self._recv_exact(7))
+        return request_id, self._recv_exact(length - 1)
+
+    def _decode(self, block, pdu):
+        function = pdu[0]
+        if function & 0x80:
+            raise PipelineRequestError(f"Modbus例外応答: FC{function & 0x7F:02d} コード{pdu[1]}")
+        data = pdu[2:2 + pdu[1]]
+        if function == 0x03:
+            return list(struct.unpack(f">{block.count}H", data[:block.count * 2]))
+        return [bool(data[i // 8] >> (i % 8) & 1) for i in range(block.count)]
+
+class MC4EPipelineClient(PipelinedClient):
+    """三菱 MC 4E フレーム（バイナリ）パイプライン読み取り（シリアル番号で照合, 一括読出し 0401）"""
+
+    label = "MC4E"
+
+    def __init__(self, ip, port, timeout=5.0, window=4, network=0, pc=0xFF, io=0x03FF, station=0):
+        super().__init__(ip, port, timeout, window)
+        self.route = struct.pack("<BBHB", network, pc, io, station)
+
+    def _encode(self, request_id, block):
+        subcommand = 0x0001 if block.kind == "bit" else 0x0000
+        device = block.start.to_bytes(3, "little") + bytes([MC_DEVICE_CODES[block.area]])
+        body = struct.pack("<HHH", MC_MONITORING_TIMER, 0x0401, subcommand) + device + struct.pack("<H", block.count)
+        return b"\x54\x00" + struct.pack("<H", request_id) + b"\x00\x00" + self.route + struct.pack("<H", len(body)) + body
+
+    def _read_response(self):
+        subheader, serial, _, _, _, _, _, length = MC_4E_RESPONSE_HEADER.unpack(
+            self._recv_exact(MC_4E_RESPONSE_HEADER.size)
+        )
+        if subheader != b"\xd4\x00":
+            raise ConnectionError(f"MC4E応答のサブヘッダが不正: {subheader.hex()}")
+        return serial, self._recv_exact(length)
+
+    def _decode(self, block, payload):
+        end_code = struct.unpack_from("<H", payload)[0]
+        if end_code:
+            raise PipelineRequestError(f"MC終了コード 0x{end_code:04X}")
+        data = payload[2:]
+        if block.kind == "bit":
+            # 1バイトに2点（上位4bitが先頭の点）
+            return [(data[i // 2] >> (0 if i % 2 else 4)) & 1 for i in range(block.count)]
+        # pymcprotocol と同じく符号付き16bitで返す
+        return list(struct.unpack(f"<{block.count}h", data[:block.count * 2]))
@@ -0,0 +1,621 @@
+import os
+import re
+import json
+import threading
+from plc_connection_pool import normalize_manufacturer
+from plc_decoder import (
+    DATA_TYPE_WORDS, BlockDecoder, select_decoder, convert_word_point, convert_dword_point
+)
+
+# 読み取りプラン設定
+# 隣接アドレス間の隙間がこのワード（ビット）数以下なら1ブロックにまとめる
+READ_PLAN_GAP_TOLERANCE = int(os.getenv("READ_PLAN_GAP_TOLERANCE", "8"))
+
+# プロトコルごとの1リクエストあたり最大読み取り点数
+PROTOCOL_MAX_READ_POINTS = {
+    "mitsubishi": {"word": 960, "bit": 7168},   # MC 3E バイナリ 一括読出し
+    "keyence": {"word": 125, "bit": 2000},      # Modbus/TCP FC03 / FC01
+    "omron": {"word": 999, "bit": 999},         # FINS メモリエリア読出し (0101)
+}
+
+# オムロン: 複数メモリエリア読出し (FINS 0104) の1コマンドあたり最大項目数（1項目 = 1ワード）
+FINS_MULTI_READ_MAX_ITEMS = int(os.getenv("FINS_MULTI_READ_MAX_ITEMS", "167"))
+# これより大きい連続ブロックは複数エリア読出しではなくメモリエリア読出し (0101) で取得
+FINS_MULTI_READ_BATCH_THRESHOLD = int(os.getenv("FINS_MULTI_READ_BATCH_THRESHOLD", "16"))
+
+# シーメンス S7: マルチ変数読み取り (read_multi_vars) の制約
+S7_PDU_SIZE = int(os.getenv("S7_PDU_SIZE", "240"))   # ブロック分割に使うPDUサイズ（S7-300/1200の既定値）
+S7_MAX_VARS = 20                                       # 1リクエストあたりの最大項目数（snap7 MaxVars）
+S7_REQUEST_HEADER = 12       # ヘッダ10 + パラメータ（ファンクション・項目数）2
+S7_REQUEST_ITEM = 12         # 項目ごとのアドレス指定
+S7_RESPONSE_HEADER = 14      # ヘッダ12 + パラメータ2
+S7_RESPONSE_ITEM = 4         # 項目ごとの戻りコード・長さ（データは偶数バイトに詰める）
+
+def s7_max_item_bytes(pdu_size=S7_PDU_SIZE):
+    """1項目（1ブロック）で読み取れる最大バイト数"""
+    return pdu_size - S7_RESPONSE_HEADER - S7_RESPONSE_ITEM
+
+PROTOCOL_MAX_READ_POINTS["siemens"] = {"byte": s7_max_item_bytes()}
+
+# 三菱: 16進数でアドレス指定するデバイス
+MITSUBISHI_HEX_DEVICES = ("X", "Y", "B", "W", "SB", "SW", "DX", "DY")
+# 三菱: ワードデバイス / ビットデバイス
+MITSUBISHI_WORD_DEVICES = ("ZR", "SD", "SW", "D", "W", "R")
+MITSUBISHI_BIT_DEVICES = ("SM", "SB", "DX", "DY", "M", "X", "Y", "B", "L", "F")
+
+# 三菱: ランダム読出し (MC 3E コマンド0403) の1リクエストあたり最大点数（ワード点数 + ダブルワード点数）
+MC_RANDOM_READ_MAX_POINTS = 192
+# これより大きい連続ブロックはランダム読出しではなく一括読出しの方が効率的
+MC_RANDOM_READ_BATCH_THRESHOLD = int(os.getenv("MC_RANDOM_READ_BATCH_THRESHOLD", "32"))
+
+# オムロン: メモリエリアコード（ワード指定）
+OMRON_WORD_AREAS = {
+    "DM": 0x82,
+    "D": 0x82,
+    "CIO": 0xB0,
+    "WR": 0xB1,
+    "W": 0xB1,
+    "HR": 0xB2,
+    "H": 0xB2,
+}
+
+# シーメンス: エリアコード（snap7 Areas）
+S7_AREAS = {
+    "DB": 0x84,
+    "M": 0x83,
+    "I": 0x81,
+    "E": 0x81,   # ドイツ語表記（Eingang）
+    "Q": 0x82,
+    "A": 0x82,   # ドイツ語表記（Ausgang）
+}
+S7_AREA_LABELS = {0x84: "DB", 0x83: "M", 0x81: "I", 0x82: "Q"}
+
+class PLCTag:
+    """コンパイル済みデータ項目（data_points の1項目）
+
+    アドレス解析・デコーダ選択・スケール判定は設定読み込み時に一度だけ行い、
+    周期処理では I/O とデコードのみを行う。
+    """
+    __slots__ = ("key", "address", "data_type", "scale", "area", "offset", "width", "bit", "decode", "divisor")
+
+    def __init__(self, key, address, data_type, scale, area, offset, width, bit, decode):
+        self.key = key
+        self.address = address
+        self.data_type = data_type
+        self.scale = scale
+        self.area = area            # デバイス/メモリエリア
+        self.offset = offset        # エリア内アドレス
+        self.width = width          # 占有点数（ワード or ビット）
+        self.bit = bit              # ワード内ビット位置（ワード読み取り後に抽出する場合）
+        self.decode = decode        # デコーダ関数 (tag, values, rel) -> 生値
+        # スケール適用（ビット以外で scale > 1 の場合のみ除算）
+        self.divisor = scale if data_type != "bit" and scale and scale > 1 else None
+
+    def convert(self, values, rel):
+        """ブロック読み取り結果から工学値を取り出す"""
+        raw_value = self.decode(self, values, rel)
+        if self.divisor:
+            return raw_value / self.divisor
+        return raw_value
+
+    def __repr__(self):
+        return f"PLCTag({self.key}={self.address} {self.data_type})"
+
+class ReadBlock:
+    """1回のブロック読み取り（同一エリアの連続範囲）"""
+
+    def __init__(self, area, kind, start, count):
+        self.area = area          # デバイス/メモリエリア (例: "D", "holding", 0x82)
+        self.kind = kind          # "word" / "bit" / "byte"（読み取り単位）
+        self.start = start        # 先頭アドレス
+        self.count = count        # 読み取り点数
+        self.tags = []            # (PLCTag, ブロック内オフセット)
+        self.decoder = None       # ワード単位ブロックの一括デコーダ（プラン生成時に設定）
+
+    def __repr__(self):
+        if isinstance(self.area, tuple):
+            code, db_number = self.area
+            area = f"DB{db_number}." if code == S7_AREAS["DB"] else S7_AREA_LABELS.get(code, f"0x{code:02X}:")
+        else:
+            area = f"0x{self.area:02X}:" if isinstance(self.area, int) else self.area
+        return f"ReadBlock({area}{self.start}+{self.count} {self.kind}, {len(self.tags)}項目)"
+
+class ReadPlan:
+    """設定から一度だけ生成する読み取りプラン"""
+
+    def __init__(self, manufacturer, blocks, errors):
+        self.manufacturer = manufacturer
+        self.blocks = blocks
+        self.errors = errors      # {key: エラーメッセージ}（アドレス解析失敗など）
+        self.mc_random_plan = None
+        self.s7_multi_plans = {}  # PDUサイズ → S7MultiReadPlan
+        self.fins_multi_plan = None
+
+    @property
+    def tag_count(self):
+        return sum(len(block.tags) for block in self.blocks)
+
+    def __repr__(self):
+        return f"ReadPlan({self.manufacturer}, {len(self.blocks)}ブロック / {self.tag_count}項目)"
+
+def keyence_address_to_modbus(address, data_type="word"):
+    """キーエンスアドレスをModbusアドレスに変換"""
+    address_upper = address.upper()
+
+    if address_upper.startswith('DM'):
+        # データメモリ → Holding Registers
+        addr_num = int(address[2:])
+        if data_type == "bit":
+            raise ValueError("DMアドレスではビット指定はできません")
+        return ("holding", addr_num)
+
+    elif address_upper.startswith('R'):
+        # リレー → Coils
+        if '.' in address:
+            # ビット指定 (例: R100.1)
+            base_addr, bit_pos = address.split('.')
+            addr_num = int(base_addr[1:])
+            bit_pos = int(bit_pos)
+            # キーエンスでは1リレー = 16ビット
+            modbus_addr = addr_num * 16 + bit_pos
+        else:
+            addr_num = int(address[1:])
+            if data_type == "bit":
+                modbus_addr = addr_num * 16  # R100 = ビット1600
+            else:
+                modbus_addr = addr_num
+        return ("coil", modbus_addr)
+
+    elif address_upper.startswith('MR'):
+        # 内部リレー → Coils (オフセット付き)
+        if '.' in address:
+            base_addr, bit_pos = address.split('.')
+            addr_num = int(base_addr[2:])
+            bit_pos = int(bit_pos)
+            modbus_addr = 10000 + addr_num * 16 + bit_pos  # オフセット
+        else:
+            addr_num = int(address[2:])
+            if data_type == "bit":
+                modbus_addr = 10000 + addr_num * 16
+            else:
+                modbus_addr = 10000 + addr_num
+        return ("coil", modbus_addr)
+
+    else:
+        raise ValueError(f"不明なキーエンスアドレス形式: {address}")
+
+def _split_device(address, prefixes):
+    """アドレス文字列をデバイス名と番号部分に分割（長いプレフィックス優先）"""
+    address_upper = address.upper()
+    for prefix in sorted(prefixes, key=len, reverse=True):
+        if address_upper.startswith(prefix) and len(address_upper) > len(prefix):
+            return prefix, address_upper[len(prefix):]
+    return None, None
+
+def _parse_mitsubishi(address, data_type):
+    """三菱アドレスを (エリア, 単位, オフセット, 幅, ビット位置) に変換"""
+    base_addr, bit_pos = address, None
+    if '.' in address:
+        base_addr, bit_text = address.split('.')
+        bit_pos = int(bit_text, 16)
+
+    if data_type == "bit":
+        device, number = _split_device(base_addr, MITSUBISHI_BIT_DEVICES)
+        if device:
+            # ビットデバイス（M100, X1F等）はビット単位で読み取り
+            offset = int(number, 16 if device in MITSUBISHI_HEX_DEVICES else 10)
+            return device, "bit", offset, 1, None
+        # ワードデバイスのビット指定（D100.3等）はワード読み取り後にビット抽出
+        device, number = _split_device(base_addr, MITSUBISHI_WORD_DEVICES)
+        if device and bit_pos is not None:
+            offset = int(number, 16 if device in MITSUBISHI_HEX_DEVICES else 10)
+            return device, "word", offset, 1, bit_pos
+        raise ValueError(f"不明なビットアドレス形式: {address}")
+
+    device, number = _split_device(base_addr, MITSUBISHI_WORD_DEVICES)
+    if not device:
+        raise ValueError(f"不明なアドレス形式: {address}")
+    offset = int(number, 16 if device in MITSUBISHI_HEX_DEVICES else 10)
+    return device, "word", offset, DATA_TYPE_WORDS.get(data_type, 1), None
+
+def mc_device_name(device, number):
+    """三菱デバイス名を生成（X/Y/B/W等は16進数表記）"""
+    if device in MITSUBISHI_HEX_DEVICES:
+        return f"{device}{number:X}"
+    return f"{device}{number}"
+
+def _parse_keyence(address, data_type):
+    """キーエンスアドレスを (エリア, 単位, オフセット, 幅, ビット位置) に変換"""
+    register_type, modbus_addr = keyence_address_to_modbus(address, data_type)
+    if register_type == "holding":
+        return "holding", "word", modbus_addr, DATA_TYPE_WORDS.get(data_type, 1), None
+    if data_type == "bit":
+        return "coil", "bit", modbus_addr, 1, None
+    if DATA_TYPE_WORDS.get(data_type, 1) > 1:
+        raise ValueError(f"{data_type}はHolding Registerのみ対応: {address}")
+    # リレーのワード読み取りは16コイル分
+    return "coil", "bit", modbus_addr, 16, None
+
+def _parse_omron(address, data_type):
+    """オムロンアドレスを (エリア, 単位, オフセット, 幅, ビット位置) に変換"""
+    base_addr, bit_pos = address, None
+    if '.' in address:
+        base_addr, bit_text = address.split('.')
+        bit_pos = int(bit_text)
+
+    area_name, number = _split_device(base_addr, OMRON_WORD_AREAS.keys())
+    if not area_name:
+        raise ValueError(f"不明なアドレス形式: {address}")
+
+    if data_type == "bit":
+        if bit_pos is None:
+            raise ValueError(f"オムロンビットアドレスには.XX指定が必要: {address}")
+        # ビットは該当ワードを読み取ってから抽出（同一ワードの他項目とまとめて読める）
+        return OMRON_WORD_AREAS[area_name], "word", int(number), 1, bit_pos
+    return OMRON_WORD_AREAS[area_name], "word", int(number), DATA_TYPE_WORDS.get(data_type, 1), None
+
+_S7_DB_PATTERN = re.compile(r"^DB(\d+)\.DB([XBWD])(\d+)(?:\.([0-7]))?$")
+_S7_AREA_PATTERN = re.compile(r"^([MIQEA])([XBWD]?)(\d+)(?:\.([0-7]))?$")
+
+def _parse_siemens(address, data_type):
+    """シーメンスアドレス（DB1.DBW10, DB1.DBX3.2, MD20, I0.1 等）を
+    (エリア, 単位, バイトオフセット, バイト幅, ビット位置) に変換"""
+    text = address.upper().replace(" ", "")
+    match = _S7_DB_PATTERN.match(text)
+    if match:
+        db_number, size, byte_text, bit_text = match.groups()
+        area = (S7_AREAS["DB"], int(db_number))
+    else:
+        match = _S7_AREA_PATTERN.match(text)
+        if not match:
+            raise ValueError(f"不明なアドレス形式: {address}")
+        area_name, size, byte_text, bit_text = match.groups()
+        area = (S7_AREAS[area_name], 0)
+
+    offset = int(byte_text)
+    if data_type == "bit" or size == "X":
+        if bit_text is None:
+            raise ValueError(f"シーメンスビットアドレスには.X指定が必要: {address}")
+        return area, "byte", offset, 1, int(bit_text)
+    if bit_text is not None:
+        raise ValueError(f"ビット指定はbit型のみ対応: {address}")
+
+    width = DATA_TYPE_WORDS.get(data_type, 1) * 2
+    if size == "B" and width == 2:
+        # バイトアクセス（MB5, DB1.DBB4）は符号なし8bit
+        width = 1
+    return area, "byte", offset, width, None
+
+ADDRESS_PARSERS = {
+    "mitsubishi": _parse_mitsubishi,
+    "keyence": _parse_keyence,
+    "omron": _parse_omron,
+    "siemens": _parse_siemens,
+}
+
+def compile_tags(manufacturer, data_points):
+    """有効なデータ項目をPLCTagにコンパイル（アドレス解析はここで一度だけ行う）"""
+    vendor = normalize_manufacturer(manufacturer)
+    parser = ADDRESS_PARSERS.get(vendor)
+    if parser is None:
+        raise ValueError(f"読み取りプラン未対応のメーカー: {manufacturer}")
+
+    tags = []
+    errors = {}
+    for key, setting in data_points.items():
+        if not setting.get("enabled", False):
+            continue
+        address = setting.get("address")
+        if not address:
+            continue
+        data_type = setting.get("data_type", "word")
+        try:
+            area, kind, offset, width, bit = parser(address.strip(), data_type)
+        except (ValueError, IndexError) as e:
+            errors[key] = str(e)
+            continue
+        decode = select_decoder(vendor, kind, data_type, width, bit)
+        tags.append((kind, PLCTag(key, address, data_type, setting.get("scale", 1), area, offset, width, bit, decode)))
+    return tags, errors
+
+def build_read_plan(manufacturer, data_points, gap_tolerance=READ_PLAN_GAP_TOLERANCE, max_points=None):
+    """データ項目をエリアごとにソートし、近接アドレスを最少のブロック読み取りにまとめる"""
+    vendor = normalize_manufacturer(manufacturer)
+    limits = dict(PROTOCOL_MAX_READ_POINTS.get(vendor, {"word": 64, "bit": 256}))
+    if max_points:
+        limits.update(max_points)
+
+    tags, errors = compile_tags(vendor, data_points)
+
+    # エリア（と読み取り単位）ごとに分類
+    groups = {}
+    for kind, tag in tags:
+        groups.setdefault((tag.area, kind), []).append(tag)
+
+    blocks = []
+    for (area, kind), area_tags in groups.items():
+        area_tags.sort(key=lambda t: (t.offset, -t.width))
+        limit = limits[kind]
+        # 許容隙間はワード単位（バイト単位のエリアは2倍）
+        gap = gap_tolerance * 2 if kind == "byte" else gap_tolerance
+        block = None
+        for tag in area_tags:
+            tag_end = tag.offset + tag.width
+            if block is not None:
+                block_end = block.start + block.count
+                new_end = max(block_end, tag_end)
+                if tag.offset - block_end <= gap and new_end - block.start <= limit:
+                    block.count = new_end - block.start
+                    block.tags.append((tag, tag.offset - block.start))
+                    continue
+            block = ReadBlock(area, kind, tag.offset, tag.width)
+            block.tags.append((tag, 0))
+            blocks.append(block)
+
+    # ワード・バイト単位ブロックは全項目を一括デコードする（S7はビッグエンディアン）
+    for block in blocks:
+        if block.kind == "word":
+            block.decoder = BlockDecoder(vendor, block)
+        elif block.kind == "byte":
+            block.decoder = BlockDecoder(vendor, block, unit_bytes=1, byte_order=">")
+
+    return ReadPlan(vendor, blocks, errors)
+
+# 設定内容ごとのプランキャッシュ（設定が変わらない限り再生成しない）
+_plan_cache = {}
+_plan_cache_lock = threading.Lock()
+_PLAN_CACHE_MAX = 32
+
+def get_read_plan(manufacturer, data_points, gap_tolerance=READ_PLAN_GAP_TOLERANCE):
+    """キャッシュ済みの読み取りプランを返す（設定変更時のみ再生成）"""
+    vendor = normalize_manufacturer(manufacturer)
+    cache_key = (vendor, gap_tolerance, json.dumps(data_points, sort_keys=True, ensure_ascii=False))
+    with _plan_cache_lock:
+        plan = _plan_cache.get(cache_key)
+        if plan is not None:
+            return plan
+
+    plan = build_read_plan(vendor, data_points, gap_tolerance)
+
+    with _plan_cache_lock:
+        if len(_plan_cache) >= _PLAN_CACHE_MAX:
+            _plan_cache.clear()
+        _plan_cache[cache_key] = plan
+    return plan
+
+def scatter_block(block, values, data):
+    """ブロック読み取り結果を各データ項目キーに振り分け（スケール適用）"""
+    if block.kind == "byte":
+        return block.decoder.decode_buffer(values, data)
+    if block.decoder is not None:
+        return block.decoder.decode_words(values, data)
+    for tag, rel in block.tags:
+        data[tag.key] = tag.convert(values, rel)
+    return data
+
+class MCRandomReadRequest:
+    """三菱ランダム読出し1回分（ワード/ダブルワードデバイスの不連続指定）"""
+
+    def __init__(self):
+        self.word_devices = []    # ["D100", "M96", ...]
+        self.dword_devices = []   # ["D200", ...]
+        self.word_tags = []       # (PLCTag, word_devices内インデックス, ビット位置)
+        self.dword_tags = []      # (PLCTag, dword_devices内インデックス)
+
+    @property
+    def points(self):
+        return len(self.word_devices) + len(self.dword_devices)
+
+    def __repr__(self):
+        return f"MCRandomReadRequest(ワード{len(self.word_devices)}点 / ダブルワード{len(self.dword_devices)}点)"
+
+class MCRandomReadPlan:
+    """三菱向け: ランダム読出し + 一括読出し（大きな連続ブロックのみ）の組み合わせ"""
+
+    def __init__(self, requests, batch_blocks, errors):
+        self.manufacturer = "mitsubishi"
+        self.requests = requests
+        self.batch_blocks = batch_blocks
+        self.errors = errors
+
+    @property
+    def request_count(self):
+        return len(self.requests) + len(self.batch_blocks)
+
+    def __repr__(self):
+        return f"MCRandomReadPlan(ランダム{len(self.requests)}回 + 一括{len(self.batch_blocks)}回)"
+
+def build_mc_random_plan(plan, batch_threshold=MC_RANDOM_READ_BATCH_THRESHOLD, max_points=MC_RANDOM_READ_MAX_POINTS):
+    """三菱の読み取りプランをランダム読出し中心のプランに変換
+
+    ワード・ビット・ダブルワードの不連続デバイスを1回の0403コマンドで取得する。
+    ビットデバイスは16点単位のワードとして読み、ビットを抽出する。
+    """
+    batch_blocks = []
+    word_entries = {}     # デバイス名 → [(PLCTag, ビット位置)]
+    dword_entries = {}    # デバイス名 → [PLCTag]
+
+    for block in plan.blocks:
+        if block.count > batch_threshold or any(tag.width > 2 for tag, _ in block.tags):
+            # 密な大ブロック・3ワード以上の型（float64等）は一括読出しのまま
+            batch_blocks.append(block)
+            continue
+        for tag, _ in block.tags:
+            if block.kind == "bit":
+                # ビットデバイスは16点単位のワードアクセスに変換
+                base = tag.offset - (tag.offset % 16)
+                device = mc_device_name(tag.area, base)
+                word_entries.setdefault(device, []).append((tag, tag.offset - base))
+            elif tag.width == 2:
+                dword_entries.setdefault(mc_device_name(tag.area, tag.offset), []).append(tag)
+            else:
+                word_entries.setdefault(mc_device_name(tag.area, tag.offset), []).append((tag, tag.bit))
+
+    requests = []
+    request = None
+    entries = [("word", device, items) for device, items in word_entries.items()]
+    entries += [("dword", device, items) for device, items in dword_entries.items()]
+    for unit, device, items in entries:
+        if request is None or request.points >= max_points:
+            request = MCRandomReadRequest()
+            requests.append(request)
+        if unit == "word":
+            index = len(request.word_devices)
+            request.word_devices.append(device)
+            for tag, bit in items:
+                request.word_tags.append((tag, index, bit))
+        else:
+            index = len(request.dword_devices)
+            request.dword_devices.append(device)
+            for tag in items:
+                request.dword_tags.append((tag, index))
+
+    return MCRandomReadPlan(requests, batch_blocks, plan.errors)
+
+def get_mc_random_plan(plan):
+    """ReadPlanに対応するランダム読出しプランを返す（初回のみ生成）"""
+    if plan.mc_random_plan is None:
+        plan.mc_random_plan = build_mc_random_plan(plan)
+    return plan.mc_random_plan
+
+def scatter_mc_random(request, word_values, dword_values, data):
+    """ランダム読出し結果を各データ項目キーに振り分け（スケール適用）"""
+    for tag, index, bit in request.word_tags:
+        # ランダム読出しは三菱のみ（data_type "word" はブロック読み取りと同じく符号付き）
+        value = convert_word_point(tag, word_values[index], bit, vendor="mitsubishi")
+        data[tag.key] = value / tag.divisor if tag.divisor else value
+
+    for tag, index in request.dword_tags:
+        value = convert_dword_point(tag, dword_values[index])
+        data[tag.key] = value / tag.divisor if tag.divisor else value
+    return data
+
+class S7MultiReadRequest:
+    """シーメンス マルチ変数読み取り1回分（1PDUに収まるブロックの集合）"""
+
+    def __init__(self):
+        self.blocks = []
+
+    @property
+    def request_bytes(self):
+        return S7_REQUEST_HEADER + S7_REQUEST_ITEM * len(self.blocks)
+
+    @property
+    def response_bytes(self):
+        return S7_RESPONSE_HEADER + sum(S7_RESPONSE_ITEM + block.count + block.count % 2 for block in self.blocks)
+
+    def fits(self, block, pdu_size, max_vars):
+        """ブロックを追加しても要求・応答とも1PDUに収まるか"""
+        if len(self.blocks) >= max_vars:
+            return False
+        if self.request_bytes + S7_REQUEST_ITEM > pdu_size:
+            return False
+        return self.response_bytes + S7_RESPONSE_ITEM + block.count + block.count % 2 <= pdu_size
+
+    def __repr__(self):
+        return f"S7MultiReadRequest({len(self.blocks)}項目 / 応答{self.response_bytes}バイト)"
+
+class S7MultiReadPlan:
+    """シーメンス向け: ブロックをPDUサイズ単位のマルチ変数読み取りにまとめたプラン"""
+
+    def __init__(self, requests, errors, pdu_size):
+        self.manufacturer = "siemens"
+        self.requests = requests
+        self.errors = errors
+        self.pdu_size = pdu_size
+
+    @property
+    def request_count(self):
+        return len(self.requests)
+
+    def __repr__(self):
+        return f"S7MultiReadPlan({len(self.requests)}リクエスト, PDU {self.pdu_size})"
+
+def build_s7_multi_plan(plan, pdu_size=S7_PDU_SIZE, max_vars=S7_MAX_VARS):
+    """読み取りプランのブロックを、DB/エリア順にPDUサイズ内のマルチ変数読み取りへ詰める"""
+    requests = []
+    request = None
+    for block in sorted(plan.blocks, key=lambda b: (b.area, b.start)):
+        if request is None or not request.fits(block, pdu_size, max_vars):
+            request = S7MultiReadRequest()
+            requests.append(request)
+        request.blocks.append(block)
+    return S7MultiReadPlan(requests, plan.errors, pdu_size)
+
+def get_s7_multi_plan(plan, pdu_size=S7_PDU_SIZE):
+    """ReadPlanに対応するマルチ変数読み取りプランを返す（PDUサイズごとに初回のみ生成）"""
+    multi_plan = plan.s7_multi_plans.get(pdu_size)
+    if multi_plan is None:
+        multi_plan = build_s7_multi_plan(plan, pdu_size)
+        plan.s7_multi_plans[pdu_size] = multi_plan
+    return multi_plan
+
+class FinsMultiReadRequest:
+    """オムロン 複数メモリエリア読出し (0104) 1回分（DM/CIO/WR 等の小ブロックの集合）"""
+
+    def __init__(self):
+        self.blocks = []
+        self.items = []           # (エリアコード, ワードアドレス)
+
+    def fits(self, block, max_items):
+        return len(self.items) + block.count <= max_items
+
+    def add(self, block):
+        self.blocks.append(block)
+        self.items.extend((block.area, block.start + i) for i in range(block.count))
+
+    def split(self, values):
+        """読み取ったワード列をブロックごとに分割"""
+        index = 0
+        for block in self.blocks:
+            yield block, values[index:index + block.count]
+            index += block.count
+
+    def __repr__(self):
+        return f"FinsMultiReadRequest({len(self.blocks)}ブロック / {len(self.items)}ワード)"
+
+class FinsMultiReadPlan:
+    """オムロン向け: 複数エリア読出し + メモリエリア読出し（大きな連続ブロックのみ）の組み合わせ"""
+
+    def __init__(self, requests, batch_blocks, errors):
+        self.manufacturer = "omron"
+        self.requests = requests
+        self.batch_blocks = batch_blocks
+        self.errors = errors
+
+    @property
+    def request_count(self):
+        return len(self.requests) + len(self.batch_blocks)
+
+    def __repr__(self):
+        return f"FinsMultiReadPlan(複数エリア{len(self.requests)}回 + 一括{len(self.batch_blocks)}回)"
+
+def build_fins_multi_plan(plan, batch_threshold=FINS_MULTI_READ_BATCH_THRESHOLD, max_items=FINS_MULTI_READ_MAX_ITEMS):
+    """オムロンの読み取りプランを複数メモリエリア読出し中心のプランに変換
+
+    エリアをまたぐ小さなブロックをワード単位の項目として1フレームにまとめる。
+    ブロックの分割はしないため、読み取り後は通常のブロックデコードをそのまま使う。
+    """
+    requests = []
+    batch_blocks = []
+    request = None
+    for block in sorted(plan.blocks, key=lambda b: (b.area, b.start)):
+        if block.count > min(batch_threshold, max_items):
+            batch_blocks.append(block)
+            continue
+        if request is None or not request.fits(block, max_items):
+            request = FinsMultiReadRequest()
+            requests.append(request)
+        request.add(block)
+
+    # 1ブロックだけの要求はメモリエリア読出しの方が応答が小さい
+    for request in [r for r in requests if len(r.blocks) == 1]:
+        requests.remove(request)
+        batch_blocks.extend(request.blocks)
+    return FinsMultiReadPlan(requests, batch_blocks, plan.errors)
+
+def get_fins_multi_plan(plan):
+    """ReadPlanに対応する複数エリア読出しプランを返す（初回のみ生成）"""
+    if plan.fins_multi_plan is None:
+        plan.fins_multi_plan = build_fins_multi_plan(plan)
+    return plan.fins_multi_plan
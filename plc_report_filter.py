@@ -0,0 +1,122 @@
+import os
+import time
+
+# 変化分のみ送信するモード（report-by-exception）の既定値
+REPORT_BY_EXCEPTION = os.getenv("REPORT_BY_EXCEPTION", "false").lower() == "true"
+# 変化が無くても全項目を送信する最大間隔（秒、ハートビート）
+REPORT_HEARTBEAT_SEC = float(os.getenv("REPORT_HEARTBEAT_SEC", "300"))
+
+def _to_float(value):
+    try:
+        return float(value) if value not in (None, "") else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+class ReportByExceptionFilter:
+    """デッドバンドとハートビートによる送信フィルタ
+
+    データ項目ごとに絶対値デッドバンド（deadband）・変化率デッドバンド
+    （deadband_percent, 前回送信値に対する%）を持ち、前回送信値から
+    デッドバンドを超えて変化した項目だけを送信対象にする。両方指定した
+    場合は両方を超えたときに送信する（広い方のデッドバンドが有効）。
+    デッドバンド未指定の項目は値が変化したときに送信する。
+    heartbeat_sec ごとに変化の有無にかかわらず全項目を送信する。
+
+    送信結果が後で確定する場合（まとめ送信）は、送信時に mark_pending() で
+    送信中として記録し、確定後に commit()（成功）または discard()（失敗）を呼ぶ。
+    送信中の値は重複して送らないよう比較に使うが、失敗した値は次回再送する。
+    """
+
+    def __init__(self, data_points, heartbeat_sec=REPORT_HEARTBEAT_SEC):
+        self.heartbeat = heartbeat_sec
+        self.deadbands = {
+            key: (abs(_to_float(setting.get("deadband"))), abs(_to_float(setting.get("deadband_percent"))))
+            for key, setting in data_points.items()
+        }
+        self.reported = {}
+        self.last_full = None
+        self.pending = {}             # 送信中の値: {項目: (送信番号, 値)}
+        self.pending_full = None      # 送信中の全項目送信: (送信番号, 時刻)
+        self._pending_id = 0
+        self.stats = {
+            "samples": 0,
+            "sent_values": 0,
+            "suppressed_values": 0,
+            "suppressed_reports": 0,
+            "full_reports": 0,
+        }
+
+    def exceeds(self, key, value, last):
+        """前回送信値からデッドバンドを超えて変化したか"""
+        if last is None:
+            return True
+        if not isinstance(value, (int, float)) or not isinstance(last, (int, float)):
+            return value != last
+        delta = abs(value - last)
+        absolute, percent = self.deadbands.get(key, (0.0, 0.0))
+        if not absolute and not percent:
+            return delta != 0
+        if absolute and delta <= absolute:
+            return False
+        if percent and delta <= abs(last) * percent / 100.0:
+            return False
+        return True
+
+    def filter(self, values, now=None):
+        """送信する値を返す: (payload, 全項目送信か)。送信不要なら payload は None"""
+        now = time.monotonic() if now is None else now
+        self.stats["samples"] += 1
+        last_full = self.pending_full[1] if self.pending_full else self.last_full
+        if last_full is None or now - last_full >= self.heartbeat:
+            return dict(values), True
+
+        changed = {key: value for key, value in values.items()
+                   if self.exceeds(key, value, self._last_value(key))}
+        self.stats["suppressed_values"] += len(values) - len(changed)
+        if not changed:
+            self.stats["suppressed_reports"] += 1
+            return None, False
+        return changed, False
+
+    def _last_value(self, key):
+        if key in self.pending:
+            return self.pending[key][1]
+        return self.reported.get(key)
+
+    def mark_pending(self, payload, full, now=None):
+        """送信中の値として記録し、commit() / discard() に渡す送信番号を返す"""
+        now = time.monotonic() if now is None else now
+        self._pending_id += 1
+        token = self._pending_id
+        for key, value in payload.items():
+            self.pending[key] = (token, value)
+        if full:
+            self.pending_full = (token, now)
+        return token
+
+    def _release(self, token):
+        if token is None:
+            return None
+        self.pending = {key: entry for key, entry in self.pending.items() if entry[0] != token}
+        started = None
+        if self.pending_full and self.pending_full[0] == token:
+            started = self.pending_full[1]
+            self.pending_full = None
+        return started
+
+    def commit(self, payload, full, now=None, token=None):
+        """送信成功した値を前回送信値として記録（token は mark_pending() の送信番号）"""
+        started = self._release(token)
+        if started is not None:
+            now = started
+        elif now is None:
+            now = time.monotonic()
+        self.reported.update(payload)
+        self.stats["sent_values"] += len(payload)
+        if full:
+            self.last_full = now
+            self.stats["full_reports"] += 1
+
+    def discard(self, token):
+        """送信に失敗した送信中の値を取り消す（次回の filter() で再び送信対象になる）"""
+        self._release(token)
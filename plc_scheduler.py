@@ -0,0 +1,107 @@
+import os
+import json
+from math import gcd
+from plc_connection_pool import normalize_manufacturer
+from plc_read_plan import READ_PLAN_GAP_TOLERANCE, ADDRESS_PARSERS, get_read_plan
+
+# スキャンクラス名 → 周期(ms)。数値（"250" や 250）を直接指定することも可能
+SCAN_CLASS_RATES = {
+    "fast": int(os.getenv("SCAN_CLASS_FAST_MS", "100")),
+    "normal": int(os.getenv("SCAN_CLASS_NORMAL_MS", "1000")),
+    "slow": int(os.getenv("SCAN_CLASS_SLOW_MS", "10000")),
+}
+
+# スキャン周期の下限（ms）。PLC・ネットワーク負荷の上限として使用
+MIN_SCAN_RATE_MS = int(os.getenv("MIN_SCAN_RATE_MS", "50"))
+
+def resolve_scan_rate(scan_class, default_ms):
+    """スキャンクラス指定を周期(ms)に変換（未指定・不正値は設備の interval）"""
+    if scan_class is None or scan_class == "" or scan_class == "default":
+        return int(default_ms)
+    rate = SCAN_CLASS_RATES.get(str(scan_class).strip().lower())
+    if rate is None:
+        try:
+            rate = int(str(scan_class).strip().lower().removesuffix("ms"))
+        except ValueError:
+            return int(default_ms)
+    return max(MIN_SCAN_RATE_MS, rate)
+
+class MultiRateScheduler:
+    """データ項目ごとのスキャンクラスに基づく読み取りスケジューラ
+
+    全スキャン周期の最大公約数を基本ティックとし、各ティックで周期が到来した
+    スキャンクラスの項目をまとめて1つの読み取りプランにする。同時に到来した
+    クラスはブロック読み取りを共有するため、速い項目を追加しても遅い項目の
+    読み取り回数は増えない。
+    """
+
+    def __init__(self, manufacturer, data_points, default_rate_ms, gap_tolerance=READ_PLAN_GAP_TOLERANCE):
+        self.vendor = normalize_manufacturer(manufacturer)
+        self.gap_tolerance = gap_tolerance
+        self.default_rate = int(default_rate_ms or 5000)
+
+        # 周期(ms) → {キー: 設定}
+        self.groups = {}
+        self.rates = {}
+        for key, setting in data_points.items():
+            if not setting.get("enabled", False):
+                continue
+            rate = resolve_scan_rate(setting.get("scan_class"), self.default_rate)
+            self.groups.setdefault(rate, {})[key] = setting
+            self.rates[key] = rate
+
+        rates = sorted(self.groups) or [self.default_rate]
+        tick = 0
+        for rate in rates:
+            tick = gcd(tick, rate)
+        # 周期の公約数が細かすぎる場合（例: 333ms と 1000ms）は下限ティックで近似
+        self.tick_ms = max(tick, MIN_SCAN_RATE_MS)
+        self.tick = 0
+        self._previous = None
+        self._cycles = {}
+
+    def next_cycle(self, tick=None):
+        """次ティックで読み取る項目とプランを返す: (周期のタプル, data_points, plan)
+
+        tick を指定した場合はそのティック番号で判定する（タイマーがティックを
+        飛ばした場合も、飛ばした間に境界を迎えたクラスは次のティックで読む）。
+        """
+        tick = self.tick if tick is None else tick
+        elapsed = tick * self.tick_ms
+        previous = self._previous
+        self.tick = tick + 1
+        self._previous = elapsed
+        # 前回読み取ったティックから周期の境界をまたいだクラスが到来
+        due = tuple(rate for rate in sorted(self.groups)
+                    if previous is None or elapsed // rate != previous // rate)
+        return self.cycle_for(due)
+
+    def cycle_for(self, due):
+        """到来した周期の組み合わせに対する data_points と読み取りプラン（組み合わせごとにキャッシュ）"""
+        cycle = self._cycles.get(due)
+        if cycle is None:
+            data_points = {}
+            for rate in due:
+                data_points.update(self.groups[rate])
+            plan = None
+            if self.vendor in ADDRESS_PARSERS:
+                plan = get_read_plan(self.vendor, data_points, self.gap_tolerance)
+            cycle = (due, data_points, plan)
+            self._cycles[due] = cycle
+        return cycle
+
+    def faster_than(self, rate_ms):
+        """指定周期より速いスキャンクラスの項目キー"""
+        return {key for key, rate in self.rates.items() if rate < rate_ms}
+
+    def describe(self):
+        return {f"{rate}ms": sorted(points) for rate, points in sorted(self.groups.items())}
+
+def scheduler_signature(target):
+    """スケジューラの再構築が必要かを判定するためのシグネチャ"""
+    return json.dumps([
+        normalize_manufacturer(target.get("manufacturer")),
+        target.get("interval"),
+        target.get("read_gap_tolerance", READ_PLAN_GAP_TOLERANCE),
+        target.get("data_points", {}),
+    ], sort_keys=True, ensure_ascii=False)
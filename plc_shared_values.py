@@ -0,0 +1,365 @@
+import os
+import json
+import time
+import struct
+import logging
+import threading
+from multiprocessing import shared_memory
+
+logger = logging.getLogger(__name__)
+
+# 最新値を公開するリングバッファの件数（1件 = 1ターゲットの1回分の取得値）
+PLC_SHM_SLOTS = int(os.getenv("PLC_SHM_SLOTS", "256"))
+# 共有できる項目数（全ターゲットの合計）の下限。作成時に設定の項目数から広げる
+PLC_SHM_MAX_TAGS = int(os.getenv("PLC_SHM_MAX_TAGS", "1024"))
+# 共有できなかった項目名を状態に含める件数の上限
+DROPPED_TAG_NAMES = 20
+
+# 共有メモリのレイアウト（形式を変更したら LAYOUT_VERSION を上げる）
+MAGIC = b"PLCV"
+LAYOUT_VERSION = 2
+TAG_ENTRY_BYTES = 64             # 項目名（"ターゲット名/項目名"、UTF-8 最大63バイト）+ 型（1バイト）
+STATUS_BYTES = 64 * 1024         # エージェントの状態（JSON）の領域
+
+# ヘッダー: magic, レイアウト版, スロット数, 最大項目数
+HEADER = struct.Struct("<4sIII")
+WRITE_SEQ_OFFSET = 16            # 公開済みサンプル数（Q）
+TAG_COUNT_OFFSET = 24            # 登録済み項目数（I）
+WRITER_PID_OFFSET = 28           # 書き込み側（エージェント）のPID（I）
+HEARTBEAT_OFFSET = 32            # 書き込み側の最終生存時刻（d, epoch秒）
+STATUS_SEQ_OFFSET = 40           # 状態領域のシーケンス番号（Q、奇数 = 書き込み中）
+STATUS_LEN_OFFSET = 48           # 状態JSONのバイト数（I）
+TAG_GENERATION_OFFSET = 52       # 項目表の世代（I、項目表を作り直すたびに増える）
+TAG_SEQ_OFFSET = 56              # 項目表のシーケンス番号（Q、奇数 = 書き込み中）
+HEADER_BYTES = 64
+
+# スロット: シーケンス番号（奇数 = 書き込み中）, タイムスタンプ, 項目表の世代, 品質フラグ
+#           + 項目の有無のビットマスク（最大項目数ビット）+ 値（double × 最大項目数）
+SLOT_HEADER = struct.Struct("<QdII")
+
+KIND_INT = b"i"
+KIND_FLOAT = b"f"
+
+# 取得値の品質（スロットの品質フラグ）
+QUALITY_GOOD = 0                 # PLCから読み取った値
+QUALITY_LAST_KNOWN = 1           # PLCと通信できないため最終取得値を使用
+QUALITY_DUMMY = 2                # ダミーデータ（USE_DUMMY_PLC または取得実績なしのフォールバック）
+QUALITY_NAMES = {QUALITY_GOOD: "good", QUALITY_LAST_KNOWN: "last_known", QUALITY_DUMMY: "dummy"}
+
+# 読み取り中に書き込まれた場合の再試行回数
+READ_RETRIES = 5
+
+class _Layout:
+    """最大項目数から決まる各領域の位置（バイト）"""
+
+    def __init__(self, slots, max_tags):
+        self.slots = slots
+        self.max_tags = max_tags
+        self.mask_bytes = (max_tags + 63) // 64 * 8
+        self.slot_bytes = SLOT_HEADER.size + self.mask_bytes + max_tags * 8
+        self.slot_doubles = self.slot_bytes // 8
+        self.values_double_offset = (SLOT_HEADER.size + self.mask_bytes) // 8
+        self.tag_table_offset = HEADER_BYTES
+        self.status_offset = self.tag_table_offset + max_tags * TAG_ENTRY_BYTES
+        self.ring_offset = self.status_offset + STATUS_BYTES
+        self.size = self.ring_offset + slots * self.slot_bytes
+
+def _attach_untracked(name):
+    """既存の共有メモリを開く（このプロセスの終了時に削除されないよう resource_tracker の管理から外す）"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.12 以前は track 引数が無いため登録を取り消す
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+class SharedValueTable:
+    """PLCの取得値をプロセス間で共有する固定レイアウトの共有メモリ
+
+    UIプロセスが create() で作成し、エージェントプロセスが attach() で開いて
+    publish() で取得値をリングバッファに書き込む。書き込み側は1プロセス1スレッド
+    （ロックで直列化）で、各スロットと項目表はシーケンスロック（書き込み中は奇数）で保護する。
+    読み取り側はロックを取らずに memoryview から直接読み、読み取り中に書き換えられた
+    スロットは読み直す。値は double で持つため、整数は 2**53 まで正確に表せる。
+
+    項目表は追記のみで、エージェントの起動時と設定の変更時に reset_tags() で作り直す
+    （世代を上げ、以前の世代のサンプルは読み取り側で無視する）。
+    """
+
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.name = shm.name
+        self.owner = owner
+        self.buf = shm.buf
+        magic, version, slots, max_tags = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            raise ValueError(f"共有メモリのレイアウトが一致しません: {shm.name}")
+        self.layout = _Layout(slots, max_tags)
+        self.slots = slots
+        self.max_tags = max_tags
+        self._ring = self.buf[self.layout.ring_offset:self.layout.size]
+        self.doubles = self._ring.cast("d")
+        self._lock = threading.Lock()
+        # 登録済み項目のキャッシュ: (項目表の世代, [(ターゲット名, 項目名, 型)])
+        # 複数スレッドから読むため、作成済みのリストは変更せず組ごと差し替える
+        self._tag_cache = (None, [])
+        # 書き込み側: 項目名 → 番号（attach 直後は登録済みの項目を引き継ぐ）
+        self._tag_index = {f"{target}/{key}": index for index, (target, key, _) in enumerate(self.tags())}
+        self.dropped_tags = set()
+        self.skipped_values = 0
+
+    @classmethod
+    def create(cls, name=None, slots=PLC_SHM_SLOTS, max_tags=PLC_SHM_MAX_TAGS):
+        """共有メモリを作成（作成したプロセスが close(unlink=True) で削除する）
+
+        max_tags は全ターゲット合計の項目数の上限（設定の項目数に余裕を持たせて指定する）。
+        """
+        max_tags = max(1, int(max_tags))
+        # 新しい共有メモリは0で初期化されている（シーケンス番号・件数はすべて0から）
+        shm = shared_memory.SharedMemory(name=name, create=True, size=_Layout(slots, max_tags).size)
+        HEADER.pack_into(shm.buf, 0, MAGIC, LAYOUT_VERSION, slots, max_tags)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """作成済みの共有メモリを開く"""
+        return cls(_attach_untracked(name))
+
+    # === 書き込み側（エージェント） ===
+
+    def _begin_tag_update(self):
+        seq = struct.unpack_from("<Q", self.buf, TAG_SEQ_OFFSET)[0]
+        struct.pack_into("<Q", self.buf, TAG_SEQ_OFFSET, seq + 1)
+        return seq + 2
+
+    def _register_tag(self, tag, value):
+        index = self._tag_index.get(tag)
+        if index is not None:
+            return index
+        count = struct.unpack_from("<I", self.buf, TAG_COUNT_OFFSET)[0]
+        encoded = tag.encode("utf-8")
+        if count >= self.max_tags or len(encoded) > TAG_ENTRY_BYTES - 1:
+            if tag not in self.dropped_tags:
+                self.dropped_tags.add(tag)
+                logger.warning(f"⚠️ 共有メモリに登録できない項目: {tag}"
+                               f"（上限 {self.max_tags}項目 / 名前 {TAG_ENTRY_BYTES - 1}バイト）")
+            return None
+        offset = self.layout.tag_table_offset + count * TAG_ENTRY_BYTES
+        kind = KIND_FLOAT if isinstance(value, float) else KIND_INT
+        end_seq = self._begin_tag_update()
+        self.buf[offset:offset + TAG_ENTRY_BYTES] = encoded.ljust(TAG_ENTRY_BYTES - 1, b"\0") + kind
+        struct.pack_into("<I", self.buf, TAG_COUNT_OFFSET, count + 1)
+        struct.pack_into("<Q", self.buf, TAG_SEQ_OFFSET, end_seq)
+        self._tag_index[tag] = count
+        return count
+
+    def reset_tags(self):
+        """項目表を作り直す（エージェント起動時・設定変更時。使われなくなった項目の枠を空ける）"""
+        with self._lock:
+            end_seq = self._begin_tag_update()
+            generation = struct.unpack_from("<I", self.buf, TAG_GENERATION_OFFSET)[0]
+            struct.pack_into("<I", self.buf, TAG_COUNT_OFFSET, 0)
+            struct.pack_into("<I", self.buf, TAG_GENERATION_OFFSET, (generation + 1) & 0xFFFFFFFF)
+            struct.pack_into("<Q", self.buf, TAG_SEQ_OFFSET, end_seq)
+            self._tag_index = {}
+            self.dropped_tags = set()
+
+    def publish(self, target, values, timestamp=None, quality=0):
+        """1ターゲットの取得値をリングバッファに書き込む（数値以外の値は共有しない）"""
+        timestamp = time.time() if timestamp is None else timestamp
+        layout = self.layout
+        with self._lock:
+            entries = []
+            for key, value in values.items():
+                if not isinstance(value, (int, float)):
+                    self.skipped_values += 1
+                    continue
+                index = self._register_tag(f"{target}/{key}", value)
+                if index is not None:
+                    entries.append((index, float(value)))
+            if not entries:
+                return None
+
+            seq = struct.unpack_from("<Q", self.buf, WRITE_SEQ_OFFSET)[0]
+            generation = struct.unpack_from("<I", self.buf, TAG_GENERATION_OFFSET)[0]
+            slot = seq % self.slots
+            offset = layout.ring_offset + slot * layout.slot_bytes
+            mask = 0
+            for index, _ in entries:
+                mask |= 1 << index
+            SLOT_HEADER.pack_into(self.buf, offset, 2 * seq + 1, timestamp, generation, quality)
+            mask_offset = offset + SLOT_HEADER.size
+            self.buf[mask_offset:mask_offset + layout.mask_bytes] = mask.to_bytes(layout.mask_bytes, "little")
+            base = slot * layout.slot_doubles + layout.values_double_offset
+            for index, value in entries:
+                self.doubles[base + index] = value
+            struct.pack_into("<Q", self.buf, offset, 2 * seq + 2)
+            struct.pack_into("<Q", self.buf, WRITE_SEQ_OFFSET, seq + 1)
+            return seq
+
+    def heartbeat(self):
+        """書き込み側の生存時刻とPIDを更新"""
+        struct.pack_into("<Id", self.buf, WRITER_PID_OFFSET, os.getpid(), time.time())
+
+    def write_status(self, status):
+        """エージェントの状態（JSONにできる dict）を状態領域に書き込む"""
+        body = json.dumps(status, ensure_ascii=False, default=str).encode("utf-8")
+        if len(body) > STATUS_BYTES:
+            body = json.dumps({"error": f"status too large ({len(body)} bytes)"}).encode("utf-8")
+        with self._lock:
+            seq = struct.unpack_from("<Q", self.buf, STATUS_SEQ_OFFSET)[0]
+            struct.pack_into("<Q", self.buf, STATUS_SEQ_OFFSET, seq + 1)
+            struct.pack_into("<I", self.buf, STATUS_LEN_OFFSET, len(body))
+            self.buf[self.layout.status_offset:self.layout.status_offset + len(body)] = body
+            struct.pack_into("<Q", self.buf, STATUS_SEQ_OFFSET, seq + 2)
+
+    # === 読み取り側（UI） ===
+
+    @property
+    def write_seq(self):
+        """公開済みサンプル数（次に書き込まれるサンプルの番号）"""
+        return struct.unpack_from("<Q", self.buf, WRITE_SEQ_OFFSET)[0]
+
+    def writer_info(self):
+        """書き込み側のPIDと最終生存時刻（未書き込みなら (0, 0.0)）"""
+        return struct.unpack_from("<Id", self.buf, WRITER_PID_OFFSET)
+
+    @property
+    def tag_generation(self):
+        """項目表の世代（reset_tags() のたびに変わる）"""
+        return struct.unpack_from("<I", self.buf, TAG_GENERATION_OFFSET)[0]
+
+    def tags(self):
+        """登録済み項目の一覧 [(ターゲット名, 項目名, 型)]（同じ世代なら増えた分のみ読み込む）"""
+        return self._tag_snapshot()[1]
+
+    def _tag_snapshot(self):
+        """項目表の世代と項目一覧の組（同じ組のまま参照すれば他スレッドの更新と混ざらない）"""
+        cache = self._tag_cache
+        for _ in range(READ_RETRIES):
+            seq = struct.unpack_from("<Q", self.buf, TAG_SEQ_OFFSET)[0]
+            if seq % 2:
+                time.sleep(0)
+                continue
+            count = struct.unpack_from("<I", self.buf, TAG_COUNT_OFFSET)[0]
+            generation = self.tag_generation
+            known = cache[1] if generation == cache[0] else []
+            added = []
+            for index in range(len(known), count):
+                offset = self.layout.tag_table_offset + index * TAG_ENTRY_BYTES
+                entry = bytes(self.buf[offset:offset + TAG_ENTRY_BYTES])
+                added.append(entry)
+            if struct.unpack_from("<Q", self.buf, TAG_SEQ_OFFSET)[0] != seq:
+                continue                 # 読み取り中に項目表が書き換えられた
+            if known is cache[1] and not added:
+                return cache
+            parsed = []
+            for entry in added:
+                target, _, key = entry[:-1].rstrip(b"\0").decode("utf-8").partition("/")
+                parsed.append((target, key, entry[-1:]))
+            cache = (generation, known + parsed)
+            self._tag_cache = cache
+            return cache
+        return cache
+
+    def read(self, seq):
+        """番号 seq のサンプルを読む（上書き済み・書き込み中なら None）
+
+        戻り値: {"seq", "target", "timestamp", "quality", "values": {項目名: 値}}
+        """
+        layout = self.layout
+        slot = seq % self.slots
+        offset = layout.ring_offset + slot * layout.slot_bytes
+        mask_offset = offset + SLOT_HEADER.size
+        base = slot * layout.slot_doubles + layout.values_double_offset
+        for _ in range(READ_RETRIES):
+            begin, timestamp, generation, quality = SLOT_HEADER.unpack_from(self.buf, offset)
+            if begin != 2 * seq + 2:
+                if begin == 2 * seq + 1:
+                    continue             # 書き込み中 → 読み直す
+                return None
+            mask = int.from_bytes(self.buf[mask_offset:mask_offset + layout.mask_bytes], "little")
+            raw = []
+            bits = mask
+            while bits:
+                index = (bits & -bits).bit_length() - 1
+                raw.append((index, self.doubles[base + index]))
+                bits &= bits - 1
+            if struct.unpack_from("<Q", self.buf, offset)[0] != begin:
+                continue                 # 読み取り中に書き換えられた
+            tags_generation, tags = self._tag_snapshot()
+            if generation != tags_generation or not raw or raw[-1][0] >= len(tags):
+                return None              # 作り直す前の項目表のサンプル
+            values = {}
+            for index, value in raw:
+                _, key, kind = tags[index]
+                values[key] = int(value) if kind == KIND_INT and value.is_integer() else value
+            return {"seq": seq, "target": tags[raw[0][0]][0], "timestamp": timestamp,
+                    "quality": quality, "values": values}
+        return None
+
+    def read_since(self, seq, limit=None):
+        """番号 seq 以降のサンプル（上書き済みの分は飛ばす）と次に読む番号を返す"""
+        end = self.write_seq
+        start = max(seq, end - self.slots)
+        if limit is not None:
+            start = max(start, end - limit)
+        samples = [sample for sample in (self.read(n) for n in range(start, end)) if sample]
+        return samples, end
+
+    def latest(self):
+        """ターゲットごとの最新サンプル {ターゲット名: サンプル}"""
+        targets = {target for target, _, _ in self.tags()}
+        result = {}
+        end = self.write_seq
+        for seq in range(end - 1, max(-1, end - 1 - self.slots), -1):
+            sample = self.read(seq)
+            if sample and sample["target"] not in result:
+                result[sample["target"]] = sample
+                if len(result) >= len(targets):
+                    break
+        return result
+
+    def read_status(self):
+        """エージェントの状態（未書き込みなら None）"""
+        for _ in range(READ_RETRIES):
+            begin = struct.unpack_from("<Q", self.buf, STATUS_SEQ_OFFSET)[0]
+            if begin == 0:
+                return None
+            if begin % 2:
+                time.sleep(0.001)
+                continue
+            length = struct.unpack_from("<I", self.buf, STATUS_LEN_OFFSET)[0]
+            body = bytes(self.buf[self.layout.status_offset:self.layout.status_offset + length])
+            if struct.unpack_from("<Q", self.buf, STATUS_SEQ_OFFSET)[0] == begin:
+                return json.loads(body)
+        return None
+
+    def get_stats(self):
+        """項目表の使用状況（書き込み側。共有できなかった項目はエージェントの状態に表示する）"""
+        dropped = sorted(self.dropped_tags)
+        return {
+            "max_tags": self.max_tags,
+            "tags": struct.unpack_from("<I", self.buf, TAG_COUNT_OFFSET)[0],
+            "tag_generation": self.tag_generation,
+            "dropped_tags": len(dropped),
+            "dropped_tag_names": dropped[:DROPPED_TAG_NAMES],
+            "skipped_values": self.skipped_values,
+        }
+
+    def close(self, unlink=None):
+        """共有メモリを閉じる（作成したプロセスでは削除も行う）"""
+        self.doubles.release()
+        self._ring.release()
+        self.buf = None
+        self.shm.close()
+        if self.owner if unlink is None else unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
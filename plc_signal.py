@@ -0,0 +1,185 @@
+import os
+import math
+import time
+import threading
+
+import numpy as np
+
+# 疑似信号の乱数シード（同じシード・同じ時刻なら同じ値を生成）
+SIGNAL_SEED = int(os.getenv("SIGNAL_SEED", "0"))
+# ノイズの更新間隔（秒）。この間隔内の同じ時刻では同じノイズ値
+SIGNAL_NOISE_RESOLUTION = float(os.getenv("SIGNAL_NOISE_RESOLUTION", "0.1"))
+
+SIGNAL_KINDS = ("ramp", "counter", "sine", "noise", "step")
+INTEGER_TYPES = ("bit", "word", "int16", "bcd", "dword", "uint32", "int32", "bcd32")
+
+# 信号パラメータ（未指定時の値）
+#   low/high: 値の範囲（step は low=正常値, low+1〜high=異常コード）
+#   period_sec: ramp/sine の周期、step の判定間隔
+#   rate: counter の1秒あたりの増加数、rollover: counter の桁あふれ値（low に戻る）
+#   noise: sine に加えるガウスノイズの標準偏差、probability: step の異常発生確率
+#   decimals: 小数点以下の桁数（整数型は0）
+SIGNAL_DEFAULTS = {
+    "low": 0.0, "high": 100.0, "period_sec": 60.0, "rate": 1.0, "rollover": 65536,
+    "noise": 0.0, "probability": 0.05, "decimals": 1,
+}
+
+# 既存のデータ項目名ごとの信号（従来のダミーデータの範囲を踏襲）
+NAMED_SIGNALS = {
+    "production_count": {"kind": "counter", "low": 1000, "rate": 0.5, "rollover": 10000, "decimals": 0},
+    "current": {"kind": "sine", "low": 2.0, "high": 5.0, "period_sec": 30.0, "noise": 0.1, "decimals": 1},
+    "temperature": {"kind": "sine", "low": 20.0, "high": 40.0, "period_sec": 600.0, "noise": 0.3, "decimals": 1},
+    "pressure": {"kind": "noise", "low": 0.1, "high": 0.8, "decimals": 2},
+    "cycle_time": {"kind": "noise", "low": 800, "high": 1200, "decimals": 0},
+    "error_code": {"kind": "step", "low": 0, "high": 5, "period_sec": 10.0, "decimals": 0},
+}
+
+# データ型ごとの信号
+TYPE_SIGNALS = {
+    "bit": {"kind": "step", "low": 0, "high": 1, "period_sec": 5.0, "probability": 0.3},
+    "dword": {"kind": "counter", "rate": 10.0, "rollover": 2 ** 32},
+    "uint32": {"kind": "counter", "rate": 10.0, "rollover": 2 ** 32},
+    "float32": {"kind": "sine", "low": 0.0, "high": 1000.0, "noise": 5.0, "decimals": 3},
+    "float64": {"kind": "sine", "low": 0.0, "high": 1000.0, "noise": 5.0, "decimals": 3},
+}
+
+# splitmix64 の定数（位置・時刻から決まる乱数列に使う）
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+def _mix(x):
+    """splitmix64 の混合関数（uint64 配列、桁あふれは切り捨て）"""
+    with np.errstate(over="ignore"):
+        x = (x ^ (x >> np.uint64(30))) * _MIX1
+        x = (x ^ (x >> np.uint64(27))) * _MIX2
+        return x ^ (x >> np.uint64(31))
+
+def default_signal_spec(key, setting):
+    """データ項目の信号設定（項目名 → データ型 → 正弦波の順。setting["signal"] で上書き）"""
+    data_type = setting.get("data_type", "word")
+    spec = dict(NAMED_SIGNALS.get(key) or TYPE_SIGNALS.get(data_type) or {"kind": "sine", "noise": 1.0})
+    spec.update(setting.get("signal") or {})
+    if data_type in INTEGER_TYPES and "decimals" not in spec:
+        spec["decimals"] = 0
+    return spec
+
+class SignalEngine:
+    """時刻から決定的に値を生成する疑似信号エンジン（タグ数千件を NumPy でまとめて計算）
+
+    値は (シード, デバイス番号, タグ番号, 時刻) のみで決まり、呼び出し順や
+    呼び出し回数に依存しない。同じ設定・同じシードなら何度でも同じ系列を
+    再生でき、デバイス番号ごとに位相・乱数をずらすことで多数の仮想設備を
+    1つのエンジンで生成できる。
+    """
+
+    def __init__(self, specs, seed=SIGNAL_SEED, noise_resolution=SIGNAL_NOISE_RESOLUTION):
+        """specs: [(タグ名, 信号設定), ...]"""
+        self.names = [name for name, _ in specs]
+        self.seed = int(seed)
+        self.noise_resolution = float(noise_resolution)
+        params = [dict(SIGNAL_DEFAULTS, **spec) for _, spec in specs]
+        for name, param in zip(self.names, params):
+            if param.get("kind", "sine") not in SIGNAL_KINDS:
+                raise ValueError(f"不明な信号の種類: {name} = {param['kind']} ({'/'.join(SIGNAL_KINDS)})")
+
+        column = lambda field: np.array([float(p[field]) for p in params], dtype=np.float64)
+        self.low = column("low")
+        self.high = column("high")
+        self.period = np.maximum(column("period_sec"), 1e-3)
+        self.rate = column("rate")
+        self.rollover = column("rollover")
+        self.noise = column("noise")
+        self.probability = column("probability")
+        self.scale = 10.0 ** column("decimals")
+        self.integer = np.array([p["decimals"] == 0 for p in params], dtype=bool)
+        self.tag_ids = np.arange(len(specs), dtype=np.uint64) * _GOLDEN
+        self.kinds = {kind: np.array([i for i, p in enumerate(params) if p.get("kind", "sine") == kind],
+                                     dtype=np.intp)
+                      for kind in SIGNAL_KINDS}
+
+    def __len__(self):
+        return len(self.names)
+
+    def _uniform(self, devices, index, counter, salt):
+        """[0, 1) の一様乱数（デバイス × タグ × カウンタ ごとに決定的）"""
+        base = _mix(np.uint64(self.seed) * _GOLDEN + devices.astype(np.uint64) + np.uint64(salt << 32))
+        with np.errstate(over="ignore"):
+            h = _mix(base ^ self.tag_ids[index] ^ _mix(np.asarray(counter).astype(np.int64).astype(np.uint64)))
+        return (h >> np.uint64(11)).astype(np.float64) * (1.0 / 9007199254740992.0)
+
+    def sample_fleet(self, t, devices):
+        """時刻 t（秒）の値を (デバイス数, タグ数) の配列で返す
+
+        devices はデバイス番号の配列（または台数）。
+        """
+        devices = np.arange(devices) if np.isscalar(devices) else np.asarray(devices)
+        devices = devices.reshape(-1, 1)
+        values = np.empty((len(devices), len(self.names)), dtype=np.float64)
+        span = self.high - self.low
+        tick = int(t // self.noise_resolution)
+
+        for kind, index in self.kinds.items():
+            if not len(index):
+                continue
+            # デバイス・タグごとの位相（時刻に依存しない）
+            phase = self._uniform(devices, index, 0, salt=1)
+            cycles = t / self.period[index] + phase
+            if kind == "ramp":
+                result = self.low[index] + span[index] * (cycles % 1.0)
+            elif kind == "sine":
+                result = self.low[index] + span[index] * (0.5 + 0.5 * np.sin(2.0 * math.pi * cycles))
+                if self.noise[index].any():
+                    # Box-Muller 法でガウスノイズ
+                    u1 = self._uniform(devices, index, tick, salt=2)
+                    u2 = self._uniform(devices, index, tick, salt=3)
+                    gauss = np.sqrt(-2.0 * np.log1p(-u1)) * np.cos(2.0 * math.pi * u2)
+                    result = result + self.noise[index] * gauss
+            elif kind == "noise":
+                result = self.low[index] + span[index] * self._uniform(devices, index, tick, salt=4)
+            elif kind == "counter":
+                # low から数え始め、rollover に達したら low に戻る
+                length = np.maximum(self.rollover[index] - self.low[index], 1.0)
+                result = self.low[index] + np.floor(phase * length + self.rate[index] * t) % length
+            else:
+                # step: 判定間隔ごとに probability の確率で異常コード（low+1〜high）を保持
+                segment = np.floor(cycles)
+                active = self._uniform(devices, index, segment, salt=5) < self.probability[index]
+                code = self.low[index] + 1 + np.floor(self._uniform(devices, index, segment, salt=6) * span[index])
+                result = np.where(active, np.minimum(code, self.high[index]), self.low[index])
+            values[:, index] = result
+
+        return np.rint(values * self.scale) / self.scale
+
+    def sample(self, t, device=0):
+        """時刻 t（秒）の1台分の値（タグ数の配列）"""
+        return self.sample_fleet(t, [device])[0]
+
+    def to_dict(self, values):
+        """sample() の配列を {タグ名: 値} に変換（整数型は int）"""
+        return {name: int(value) if integer else value
+                for name, value, integer in zip(self.names, values.tolist(), self.integer.tolist())}
+
+    def sample_dict(self, t, device=0):
+        return self.to_dict(self.sample(t, device))
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+def get_signal_engine(data_points, seed=SIGNAL_SEED):
+    """有効なデータ項目の信号エンジン（設定が同じ間は再利用）"""
+    specs = [(key, default_signal_spec(key, setting))
+             for key, setting in data_points.items() if setting.get("enabled", False)]
+    cache_key = (seed, repr(specs))
+    with _engines_lock:
+        engine = _engines.get(cache_key)
+        if engine is None:
+            if len(_engines) >= 16:
+                _engines.clear()
+            engine = _engines[cache_key] = SignalEngine(specs, seed)
+    return engine
+
+def generate_signal_data(data_points, t=None, device=0, seed=SIGNAL_SEED):
+    """データ項目の疑似値 {項目名: 値}（ダミーPLCとして使用）"""
+    engine = get_signal_engine(data_points, seed)
+    return engine.sample_dict(time.time() if t is None else t, device)
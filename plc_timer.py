@@ -0,0 +1,97 @@
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+# 周期超過（オーバーラン）時の動作: skip = 遅れたティックを飛ばして次の境界に合わせる
+#                                  catch_up = 遅れたティックを間を空けずに順に実行
+OVERRUN_POLICY = os.getenv("OVERRUN_POLICY", "skip").lower()
+# catch_up で追いかける最大ティック数（これ以上遅れた場合は skip と同じく飛ばす）
+MAX_CATCH_UP_TICKS = int(os.getenv("MAX_CATCH_UP_TICKS", "3"))
+# ジッタ統計（p95）に使う直近のサンプル数
+JITTER_WINDOW = int(os.getenv("JITTER_WINDOW", "200"))
+
+OVERRUN_POLICIES = ("skip", "catch_up")
+
+class FixedRateTimer:
+    """monotonic 時刻上の絶対タイムラインで周期を刻む固定レートタイマー
+
+    ティック n の予定時刻は「開始時刻 + n × 周期」で、処理時間や sleep の
+    誤差が次の周期に積み重ならない（ドリフトしない）。処理が次の予定時刻を
+    超えた場合はオーバーランとして記録し、policy に従って遅れを処理する。
+    予定時刻と実際の起動時刻の差をジッタとして記録する。
+    """
+
+    def __init__(self, period_sec, policy=OVERRUN_POLICY, max_catch_up=MAX_CATCH_UP_TICKS,
+                 clock=time.monotonic):
+        if policy not in OVERRUN_POLICIES:
+            raise ValueError(f"不明なオーバーラン動作: {policy} ({'/'.join(OVERRUN_POLICIES)})")
+        self.period = float(period_sec)
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+        self.clock = clock
+        self.origin = clock()
+        # 送信・共有メモリとも UTC の naive datetime で扱うため tzinfo は外す
+        self.wall_origin = datetime.now(timezone.utc).replace(tzinfo=None)
+        self.tick = 0                 # 現在のティック番号
+        self.cycles = 0
+        self.overruns = 0             # 処理が次の予定時刻を超えた回数
+        self.missed_ticks = 0         # skip で飛ばしたティック数
+        self.caught_up_ticks = 0      # catch_up で遅れて実行したティック数
+        self.last_jitter = None
+        self.max_jitter = 0.0
+        self._jitter_sum = 0.0
+        self._jitters = deque(maxlen=JITTER_WINDOW)
+
+    def deadline(self, tick=None):
+        """ティックの予定時刻（monotonic）"""
+        return self.origin + (self.tick if tick is None else tick) * self.period
+
+    def scheduled_time(self, tick=None):
+        """ティックの予定時刻（UTC）。OEE 計算などで等間隔のタイムスタンプとして使う"""
+        return self.wall_origin + timedelta(seconds=(self.tick if tick is None else tick) * self.period)
+
+    def fired(self, now=None):
+        """ティックの処理開始を記録（予定時刻からの遅れをジッタとして集計）"""
+        now = self.clock() if now is None else now
+        jitter = max(0.0, now - self.deadline())
+        self.cycles += 1
+        self.last_jitter = jitter
+        self.max_jitter = max(self.max_jitter, jitter)
+        self._jitter_sum += jitter
+        self._jitters.append(jitter)
+        return self.tick
+
+    def advance(self, now=None):
+        """次のティックへ進め、それまでの待ち時間（秒）を返す"""
+        now = self.clock() if now is None else now
+        self.tick += 1
+        behind = int((now - self.deadline()) // self.period)
+        if behind < 0:
+            return self.deadline() - now
+
+        self.overruns += 1
+        if self.policy == "catch_up" and behind < self.max_catch_up:
+            # 遅れたティックを待たずに順に実行
+            self.caught_up_ticks += 1
+            return 0.0
+        # 遅れたティックを飛ばし、次の周期境界に合わせる（位相は維持）
+        self.tick += behind + 1
+        self.missed_ticks += behind + 1
+        return self.deadline() - now
+
+    def to_dict(self):
+        jitters = sorted(self._jitters)
+        p95 = jitters[min(len(jitters) - 1, int(len(jitters) * 0.95))] if jitters else None
+        return {
+            "period_ms": round(self.period * 1000, 1),
+            "policy": self.policy,
+            "cycles": self.cycles,
+            "overruns": self.overruns,
+            "missed_ticks": self.missed_ticks,
+            "caught_up_ticks": self.caught_up_ticks,
+            "jitter_last_ms": round(self.last_jitter * 1000, 2) if self.last_jitter is not None else None,
+            "jitter_mean_ms": round(self._jitter_sum / self.cycles * 1000, 2) if self.cycles else None,
+            "jitter_p95_ms": round(p95 * 1000, 2) if p95 is not None else None,
+            "jitter_max_ms": round(self.max_jitter * 1000, 2),
+        }
@@ -0,0 +1 @@
+"""PLC実機なしで収集処理を検証するためのローカルPLCシミュレータ"""
@@ -0,0 +1,206 @@
+"""
+シミュレータ共通部品（asyncio TCPサーバー・遅延/障害注入・レジスタマップ）
+
+各プロトコルのシミュレータは SimulatorServer を継承し、read_frame（1要求の
+受信）と handle_frame（応答の生成）を実装する。要求ごとに FaultInjector の
+判定で遅延・応答なし・異常応答・切断を注入する。遅延は要求ごとに非同期で
+待つため、パイプライン送信された要求は並行して応答する。
+"""
+
+import json
+import random
+import asyncio
+import threading
+
+class FaultInjector:
+    """要求ごとの遅延・障害の注入設定
+
+    latency_ms ± jitter_ms の遅延を加え、drop_rate の確率で応答しない
+    （クライアントはタイムアウト）、error_rate の確率で異常応答を返す、
+    disconnect_rate の確率で接続を切断する。seed 指定時は再現可能。
+    """
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, drop_rate=0.0, error_rate=0.0,
+                 disconnect_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.drop_rate = drop_rate
+        self.error_rate = error_rate
+        self.disconnect_rate = disconnect_rate
+        self.random = random.Random(seed)
+
+    def delay(self):
+        """応答までの遅延（秒）"""
+        delay = self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, delay) / 1000.0
+
+    def decide(self):
+        """要求に対する動作: "disconnect" / "drop" / "error" / "ok" """
+        roll = self.random.random()
+        if roll < self.disconnect_rate:
+            return "disconnect"
+        roll -= self.disconnect_rate
+        if roll < self.drop_rate:
+            return "drop"
+        roll -= self.drop_rate
+        if roll < self.error_rate:
+            return "error"
+        return "ok"
+
+def load_register_map(path):
+    """レジスタマップ（JSON）を読み込む
+
+    形式: {"エリア名": {"アドレス": 値 または [連続する値, ...]}}
+    アドレスは10進数、"0x" 付きは16進数（三菱 X/Y 等）。
+    例: {"D": {"100": 1234, "200": [1, 2, 3]}, "M": {"10": 1}}
+    """
+    if not path:
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    register_map = {}
+    for area, entries in raw.items():
+        for address, value in entries.items():
+            values = value if isinstance(value, list) else [value]
+            register_map.setdefault(area, {})[int(address, 0)] = [int(v) for v in values]
+    return register_map
+
+def add_simulator_arguments(parser, default_port):
+    """シミュレータ共通のコマンドライン引数"""
+    parser.add_argument("--port", type=int, default=default_port, help="待ち受けポート")
+    parser.add_argument("--map", help="レジスタマップ（JSON）")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="応答遅延")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="応答遅延のゆらぎ（±）")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="応答しない確率")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="異常応答を返す確率")
+    parser.add_argument("--disconnect-rate", type=float, default=0.0, help="接続を切断する確率")
+    parser.add_argument("--seed", type=int, help="障害注入の乱数シード")
+    parser.add_argument("--update-ms", type=int, default=100, help="周期的に変化する値の更新周期")
+
+def faults_from_args(args):
+    return FaultInjector(args.latency_ms, args.jitter_ms, args.drop_rate, args.error_rate,
+                         args.disconnect_rate, args.seed)
+
+class SimulatorServer:
+    """プロトコルシミュレータの基底クラス（別スレッドの asyncio ループで待ち受け）"""
+
+    label = "PLC"
+
+    def __init__(self, port, faults=None, register_map=None, host="0.0.0.0", update_ms=100):
+        self.host = host
+        self.port = port
+        self.update_ms = update_ms
+        self.faults = faults or FaultInjector()
+        self.stats = {"connections": 0, "frames": 0, "dropped": 0, "errors": 0, "disconnects": 0}
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+        for area, entries in (register_map or {}).items():
+            for address, values in entries.items():
+                self.write(area, address, values)
+
+    # --- プロトコルごとに実装 ---
+    def write(self, area, address, values):
+        """エリアに値を書き込む"""
+        raise NotImplementedError
+
+    async def read_frame(self, reader):
+        """要求1件を受信（切断時は asyncio.IncompleteReadError）"""
+        raise NotImplementedError
+
+    def handle_frame(self, frame, session):
+        """要求に対する応答を返す（None なら応答しない）"""
+        raise NotImplementedError
+
+    def error_frame(self, frame, session):
+        """障害注入時の異常応答"""
+        raise NotImplementedError
+
+    def update(self, counter):
+        """update_ms ごとに呼ばれる値の更新（周期的に変化する値の書き込み）"""
+
+    # --- 共通処理 ---
+    async def _handle_client(self, reader, writer):
+        self.stats["connections"] += 1
+        session = {}
+        pending = set()
+        try:
+            while True:
+                frame = await self.read_frame(reader)
+                self.stats["frames"] += 1
+                action = self.faults.decide()
+                if action == "disconnect":
+                    self.stats["disconnects"] += 1
+                    break
+                if action == "drop":
+                    self.stats["dropped"] += 1
+                    continue
+                if action == "error":
+                    self.stats["errors"] += 1
+                    response = self.error_frame(frame, session)
+                else:
+                    response = self.handle_frame(frame, session)
+                if response is None:
+                    continue
+                delay = self.faults.delay()
+                if delay:
+                    task = asyncio.ensure_future(self._reply_later(writer, response, delay))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+                else:
+                    writer.write(response)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.CancelledError:
+            # 停止時: キャンセル扱いで終えると asyncio のストリーム側が例外を記録するため正常終了させる
+            pass
+        finally:
+            for task in pending:
+                task.cancel()
+            writer.close()
+
+    async def _reply_later(self, writer, response, delay):
+        await asyncio.sleep(delay)
+        if not writer.is_closing():
+            writer.write(response)
+
+    async def _update_loop(self):
+        counter = 0
+        while True:
+            await asyncio.sleep(self.update_ms / 1000.0)
+            counter = (counter + 1) & 0x7FFF
+            self.update(counter)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle_client, self.host, self.port, reuse_address=True)
+        )
+        if self.update_ms:
+            self._loop.create_task(self._update_loop())
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.close()
+
+    async def _shutdown(self):
+        # 待ち受けを閉じ、接続中のクライアント処理・更新ループを終了
+        self._server.close()
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"{self.label}-simulator")
+        self._thread.start()
+        self._ready.wait(5)
+        return self
+
+    def stop(self):
+        if self._loop is not None and self._loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=5)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
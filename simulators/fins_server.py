@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+オムロン FINS/TCP PLCシミュレータ
+
+ノードアドレスのハンドシェイク、メモリエリア読出し (0101)、複数メモリエリア
+読出し (0104) に応答する FINS/TCP サーバー。実機の代わりに FINS/TCP
+クライアントの動作確認・スループット計測の接続先として使う。
+遅延・障害注入は simulators/base.py の FaultInjector。
+
+エリア（DM/CIO/WR/HR）の初期値は「ワードアドレスの下位16bit」のパターンで、
+DM の先頭には周期的に変化する値（D0: カウンタ, D1: 正弦波 ×100）を書き込む。
+
+使い方:
+    python simulators/fins_server.py [--port 9600] [--words 32768] [--map map.json] [--latency-ms 20]
+
+レジスタマップの例（エリア名は DM / CIO / WR / HR）:
+    {"DM": {"100": 1234, "200": [1, 2, 3]}, "CIO": {"10": 8}}
+
+エージェント側の設定例（config/plc_config.json）:
+    "manufacturer": "オムロン", "plc_ip": "127.0.0.1", "plc_port": 9600, "fins_transport": "tcp"
+"""
+
+import os
+import sys
+import math
+import time
+import struct
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from simulators.base import SimulatorServer, add_simulator_arguments, faults_from_args, load_register_map
+
+FINS_TCP_HEADER = struct.Struct(">4sIII")
+# ワード指定のメモリエリアコード
+FINS_AREAS = {"DM": 0x82, "CIO": 0xB0, "WR": 0xB1, "HR": 0xB2}
+# 終了コード
+END_OK = b"\x00\x00"
+END_SERVICE_CANCELED = b"\x00\x01"   # 障害注入
+END_UNDEFINED_COMMAND = b"\x04\x01"
+END_AREA_ERROR = b"\x11\x01"     # エリア種別エラー
+END_ADDRESS_ERROR = b"\x11\x03"  # アドレス範囲外
+
+class FinsSimulator(SimulatorServer):
+    """FINS/TCP サーバーとメモリエリアを持つシミュレータ"""
+
+    label = "FINS"
+
+    def __init__(self, port=9600, faults=None, register_map=None, host="0.0.0.0", update_ms=100,
+                 words=32768, node=1):
+        self.node = node
+        self.words = words
+        self.areas = {code: bytearray(struct.pack(f">{words}H", *(i & 0xFFFF for i in range(words))))
+                      for code in FINS_AREAS.values()}
+        self._next_node = 2
+        super().__init__(port, faults, register_map, host, update_ms)
+
+    def assign_node(self):
+        node = self._next_node
+        self._next_node = self._next_node % 254 + 1
+        if self._next_node == self.node:
+            self._next_node += 1
+        return node
+
+    def write(self, area, address, values):
+        """エリアにワード値を書き込む"""
+        self.areas[FINS_AREAS.get(area, area)][address * 2:(address + len(values)) * 2] = \
+            struct.pack(f">{len(values)}H", *(v & 0xFFFF for v in values))
+
+    def update(self, counter):
+        self.write("DM", 0, [counter, int(5000 + 1000 * math.sin(counter / 20.0))])
+
+    def _read(self, code, address, count):
+        memory = self.areas.get(code)
+        if memory is None:
+            return None, END_AREA_ERROR
+        if address + count > self.words:
+            return None, END_ADDRESS_ERROR
+        return bytes(memory[address * 2:(address + count) * 2]), END_OK
+
+    async def read_frame(self, reader):
+        header = await reader.readexactly(FINS_TCP_HEADER.size)
+        length = FINS_TCP_HEADER.unpack(header)[1]
+        return header + await reader.readexactly(length - 8)
+
+    def _tcp(self, command, data, error=0):
+        return FINS_TCP_HEADER.pack(b"FINS", 8 + len(data), command, error) + data
+
+    def _response_header(self, frame):
+        # 応答ヘッダ: ICF=応答, 送信先と送信元を入れ替え, SID はそのまま
+        header = frame[16:26]
+        return bytes([0xC0, 0x00, 0x02, header[6], header[7], header[8],
+                      header[3], header[4], header[5], header[9]]) + frame[26:28]
+
+    def error_frame(self, frame, session):
+        if FINS_TCP_HEADER.unpack_from(frame)[2] != 2 or "node" not in session:
+            return self.handle_frame(frame, session)
+        return self._tcp(2, self._response_header(frame) + END_SERVICE_CANCELED)
+
+    def handle_frame(self, frame, session):
+        magic, _, command, _ = FINS_TCP_HEADER.unpack_from(frame)
+        if magic != b"FINS":
+            raise ConnectionError("FINS/TCPヘッダが不正")
+        if command == 0:
+            # ノードアドレス: 0 指定時はサーバーが割り当てる
+            requested = struct.unpack_from(">I", frame, 16)[0]
+            session["node"] = requested or self.assign_node()
+            return self._tcp(1, struct.pack(">II", session["node"], self.node))
+        if command != 2 or "node" not in session:
+            # ハンドシェイク前のフレーム送信・未対応コマンド
+            return self._tcp(command, b"", error=3 if "node" not in session else 1)
+
+        response = self._response_header(frame)
+        fins_command, body = frame[26:28], frame[28:]
+        if fins_command == b"\x01\x01":
+            code, address, _, count = struct.unpack(">BHBH", body[:6])
+            data, end_code = self._read(code, address, count)
+            return self._tcp(2, response + end_code + (data or b""))
+
+        if fins_command == b"\x01\x04":
+            data = bytearray()
+            for index in range(0, len(body) - len(body) % 4, 4):
+                code, address, _ = struct.unpack(">BHB", body[index:index + 4])
+                value, end_code = self._read(code, address, 1)
+                if value is None:
+                    return self._tcp(2, response + end_code)
+                data += bytes([code]) + value
+            return self._tcp(2, response + END_OK + bytes(data))
+
+        return self._tcp(2, response + END_UNDEFINED_COMMAND)
+
+def main():
+    parser = argparse.ArgumentParser(description="オムロン FINS/TCP PLCシミュレータ")
+    add_simulator_arguments(parser, default_port=9600)
+    parser.add_argument("--words", type=int, default=32768, help="エリアあたりのワード数")
+    args = parser.parse_args()
+
+    simulator = FinsSimulator(args.port, faults_from_args(args), load_register_map(args.map),
+                              update_ms=args.update_ms, words=args.words).start()
+    print(f"🏭 FINSシミュレータ起動: 0.0.0.0:{args.port} (DM/CIO/WR/HR 各{args.words}ワード, 遅延 {args.latency_ms}ms)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.stop()
+        print(f"🛑 FINSシミュレータ停止: {simulator.stats}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+仮想設備群のログ送信シミュレータ（中央サーバーの負荷試験）
+
+plc_signal.SignalEngine で多数の仮想設備 × タグの疑似信号をまとめて生成し、
+収集周期ごとに中央サーバーの /api/logs へ送信する。値は (シード, 設備番号,
+時刻) で決まるため、同じシードなら何度でも同じ系列を再生できる。
+送信時刻は FixedRateTimer の予定時刻（エージェントと同じ等間隔のタイムスタンプ）。
+
+使い方:
+    python simulators/fleet_replay.py [--server http://192.168.1.10:5000] [--devices 100]
+        [--tags 0] [--interval-ms 1000] [--duration-sec 60] [--seed 0] [--register] [--dry-run]
+
+--tags は標準6項目（生産数・電流・温度・圧力・サイクルタイム・異常コード）に
+追加する疑似タグ数。--dry-run は送信せず生成性能のみ計測する。
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+from datetime import timezone
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import requests
+
+from plc_signal import SignalEngine, default_signal_spec, SIGNAL_SEED
+from plc_timer import FixedRateTimer
+
+STANDARD_ITEMS = ("production_count", "current", "temperature", "pressure", "cycle_time", "error_code")
+EXTRA_TYPES = ("word", "float32", "bit", "dword")
+
+def make_specs(extra_tags):
+    """標準6項目 + 追加の疑似タグの信号設定"""
+    specs = [(key, default_signal_spec(key, {})) for key in STANDARD_ITEMS]
+    for i in range(extra_tags):
+        specs.append((f"tag_{i}", default_signal_spec(f"tag_{i}", {"data_type": EXTRA_TYPES[i % len(EXTRA_TYPES)]})))
+    return specs
+
+def equipment_id(prefix, index):
+    return f"{prefix}-{index:05d}"
+
+class FleetSender:
+    """スレッドごとの HTTP セッションでログを送信し、結果を集計"""
+
+    def __init__(self, base_url, workers):
+        self.base_url = base_url.rstrip("/")
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fleet")
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.latencies = []
+
+    def _session(self):
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def _post(self, path, payload):
+        started = time.perf_counter()
+        try:
+            ok = self._session().post(f"{self.base_url}{path}", json=payload, timeout=5).status_code == 200
+        except requests.RequestException:
+            ok = False
+        with self.lock:
+            self.latencies.append(time.perf_counter() - started)
+            if ok:
+                self.sent += 1
+            else:
+                self.failed += 1
+        return ok
+
+    def submit(self, path, payloads):
+        return [self.executor.submit(self._post, path, payload) for payload in payloads]
+
+    def take_latencies(self):
+        with self.lock:
+            latencies, self.latencies = sorted(self.latencies), []
+        return latencies
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+def register_fleet(sender, args):
+    """仮想設備を中央サーバーに登録（/api/logs は未登録の設備を受け付けないため）"""
+    payloads = [{
+        "equipment_id": equipment_id(args.prefix, i),
+        "mac_address": "02:00:%02x:%02x:%02x:%02x" % (i >> 24 & 0xFF, i >> 16 & 0xFF, i >> 8 & 0xFF, i & 0xFF),
+        "manufacturer": "simulator",
+        "interval": args.interval_ms,
+    } for i in range(args.devices)]
+    results = [future.result() for future in sender.submit("/register", payloads)]
+    print(f"📝 仮想設備を登録: {sum(results)}/{len(results)} 台")
+
+def main():
+    default_server = f"http://{os.getenv('CENTRAL_SERVER_IP', '192.168.1.10')}:{os.getenv('CENTRAL_SERVER_PORT', '5000')}"
+    parser = argparse.ArgumentParser(description="仮想設備群のログ送信シミュレータ")
+    parser.add_argument("--server", default=default_server, help="中央サーバーのURL")
+    parser.add_argument("--devices", type=int, default=100, help="仮想設備の台数")
+    parser.add_argument("--tags", type=int, default=0, help="標準6項目に追加する疑似タグ数")
+    parser.add_argument("--interval-ms", type=int, default=1000, help="送信周期")
+    parser.add_argument("--duration-sec", type=float, default=60.0, help="送信を続ける時間")
+    parser.add_argument("--seed", type=int, default=SIGNAL_SEED, help="疑似信号のシード")
+    parser.add_argument("--prefix", default="SIM", help="仮想設備IDの接頭辞")
+    parser.add_argument("--workers", type=int, default=16, help="送信スレッド数")
+    parser.add_argument("--register", action="store_true", help="開始前に仮想設備を登録")
+    parser.add_argument("--dry-run", action="store_true", help="送信せず生成のみ（生成性能の計測）")
+    args = parser.parse_args()
+
+    engine = SignalEngine(make_specs(args.tags), seed=args.seed)
+    ids = [equipment_id(args.prefix, i) for i in range(args.devices)]
+    sender = None if args.dry_run else FleetSender(f"{args.server.rstrip('/')}/api", args.workers)
+    if sender and args.register:
+        register_fleet(sender, args)
+
+    print(f"🏭 仮想設備 {args.devices}台 × {len(engine)}項目 を {args.interval_ms}ms 周期で"
+          f"{'生成（送信なし）' if args.dry_run else '送信: ' + args.server}")
+    timer = FixedRateTimer(args.interval_ms / 1000.0)
+    ticks = max(1, int(args.duration_sec * 1000 / args.interval_ms))
+    generate_time = 0.0
+    pending = []
+    try:
+        for _ in range(ticks):
+            tick = timer.fired()
+            scheduled = timer.scheduled_time(tick)
+            started = time.perf_counter()
+            values = engine.sample_fleet(scheduled.replace(tzinfo=timezone.utc).timestamp(), args.devices)
+            stamp = scheduled.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+            payloads = [dict(engine.to_dict(row), equipment_id=eid, timestamp=stamp) for eid, row in zip(ids, values)]
+            generate_time += time.perf_counter() - started
+            if sender:
+                pending = [f for f in pending if not f.done()] + sender.submit("/logs", payloads)
+            if (tick + 1) % 10 == 0 and sender:
+                latencies = sender.take_latencies()
+                p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0
+                print(f"📡 tick {tick + 1}: 送信 {sender.sent} / 失敗 {sender.failed} / 未完了 {len(pending)}"
+                      f" / p95 {p95:.1f}ms")
+            delay = timer.advance()
+            if delay > 0:
+                time.sleep(delay)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if sender:
+            sender.close()
+
+    cycles = max(timer.cycles, 1)
+    rows = cycles * args.devices
+    print(f"📊 生成: {cycles}周期 平均 {generate_time / cycles * 1000:.2f}ms/周期 "
+          f"({rows * len(engine) / max(generate_time, 1e-9):,.0f} 値/秒), オーバーラン {timer.overruns}回")
+    if sender:
+        print(f"📊 送信: 成功 {sender.sent} / 失敗 {sender.failed}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+三菱 MCプロトコル PLCシミュレータ（3E / 4E フレーム、バイナリ）
+
+一括読出し (0401)・ランダム読出し (0403)・一括書込み (1401) に応答する。
+3E フレーム（pymcprotocol Type3E）と、シリアル番号付きの 4E フレーム
+（パイプライン読み取り）の両方を受け付ける。遅延・障害注入は
+simulators/base.py の FaultInjector。
+
+ワードデバイス（D/W/R/ZR/SD/SW）の初期値は「デバイス番号の下位16bit」の
+パターン、ビットデバイス（M/X/Y/B 等）はデバイス番号が3の倍数のときON。
+D0 は周期的に変化するカウンタ。
+
+使い方:
+    python simulators/mc_server.py [--port 5000] [--map map.json] [--latency-ms 20]
+
+レジスタマップの例（エリア名はデバイス名、X/Y/B/W 等は "0x" 付きで16進指定可）:
+    {"D": {"100": 1234, "200": [1, 2, 3]}, "M": {"10": 1}, "X": {"0x1F": 1}}
+
+エージェント側の設定例（config/plc_config.json）:
+    "manufacturer": "三菱", "plc_ip": "127.0.0.1", "plc_port": 5000
+"""
+
+import os
+import sys
+import time
+import array
+import struct
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from simulators.base import SimulatorServer, add_simulator_arguments, faults_from_args, load_register_map
+
+# デバイスコード（Q/L シリーズ互換）
+WORD_DEVICES = {0xA8: "D", 0xB4: "W", 0xAF: "R", 0xB0: "ZR", 0xA9: "SD", 0xB5: "SW"}
+BIT_DEVICES = {0x90: "M", 0x9C: "X", 0x9D: "Y", 0xA0: "B", 0x92: "L", 0x93: "F", 0x91: "SM",
+               0xA1: "SB", 0xA2: "DX", 0xA3: "DY"}
+DEVICE_SIZE = 0x10000
+
+# 終了コード
+END_OK = 0x0000
+END_COMMAND_ERROR = 0xC059       # コマンド・サブコマンド指定誤り
+END_DEVICE_ERROR = 0xC056        # デバイス指定範囲外
+END_INJECTED_ERROR = 0xC0B5      # 障害注入（CPUで扱えないデータ）
+
+class MCSimulator(SimulatorServer):
+    """MCプロトコル 3E/4E バイナリサーバー"""
+
+    label = "MC"
+
+    def __init__(self, port=5000, faults=None, register_map=None, host="0.0.0.0", update_ms=100):
+        pattern = array.array("H", (i & 0xFFFF for i in range(DEVICE_SIZE)))
+        self.words = {name: array.array("H", pattern) for name in WORD_DEVICES.values()}
+        bits = bytes(1 if i % 3 == 0 else 0 for i in range(DEVICE_SIZE))
+        self.bits = {name: bytearray(bits) for name in BIT_DEVICES.values()}
+        super().__init__(port, faults, register_map, host, update_ms)
+
+    def write(self, area, address, values):
+        if area in self.bits:
+            self.bits[area][address:address + len(values)] = bytes(1 if v else 0 for v in values)
+        else:
+            for i, value in enumerate(values):
+                self.words[area][address + i] = value & 0xFFFF
+
+    def update(self, counter):
+        self.words["D"][0] = counter
+
+    def _read_words(self, code, address, count):
+        """ワード単位の読み出し（ビットデバイスは16点を1ワードに詰める）"""
+        if address + count * (16 if code in BIT_DEVICES else 1) > DEVICE_SIZE:
+            return None
+        if code in WORD_DEVICES:
+            return list(self.words[WORD_DEVICES[code]][address:address + count])
+        bits = self.bits[BIT_DEVICES[code]]
+        return [sum(bits[address + i * 16 + j] << j for j in range(16)) for i in range(count)]
+
+    async def read_frame(self, reader):
+        subheader = await reader.readexactly(2)
+        # 4E はサブヘッダ後にシリアル番号(2) + 予備(2)
+        prefix = await reader.readexactly(4) if subheader == b"\x54\x00" else b""
+        header = await reader.readexactly(7)
+        length = struct.unpack_from("<H", header, 5)[0]
+        return subheader + prefix + header + await reader.readexactly(length)
+
+    def _split(self, frame):
+        """(応答ヘッダの先頭, 経路, 要求データ) に分解"""
+        if frame[:2] == b"\x54\x00":
+            return b"\xd4\x00" + frame[2:6], frame[6:11], frame[13:]
+        return b"\xd0\x00", frame[2:7], frame[9:]
+
+    def _response(self, frame, end_code, data=b""):
+        head, route, request = self._split(frame)
+        if end_code:
+            # 異常応答: 終了コード + エラー情報（経路 + コマンド + サブコマンド）
+            data = route + request[2:6]
+        return head + route + struct.pack("<HH", len(data) + 2, end_code) + data
+
+    def error_frame(self, frame, session):
+        return self._response(frame, END_INJECTED_ERROR)
+
+    def handle_frame(self, frame, session):
+        _, _, request = self._split(frame)
+        command, subcommand = struct.unpack_from("<HH", request, 2)
+        body = request[6:]
+
+        if command == 0x0401 and subcommand in (0x0000, 0x0001):
+            address = int.from_bytes(body[:3], "little")
+            code, count = body[3], struct.unpack_from("<H", body, 4)[0]
+            if code not in WORD_DEVICES and code not in BIT_DEVICES:
+                return self._response(frame, END_DEVICE_ERROR)
+            if subcommand == 0x0000:
+                words = self._read_words(code, address, count)
+                if words is None:
+                    return self._response(frame, END_DEVICE_ERROR)
+                return self._response(frame, END_OK, struct.pack(f"<{count}H", *words))
+            if code not in BIT_DEVICES or address + count > DEVICE_SIZE:
+                return self._response(frame, END_DEVICE_ERROR)
+            # ビット単位: 1バイトに2点（上位4bitが先頭の点）
+            bits = list(self.bits[BIT_DEVICES[code]][address:address + count]) + [0]
+            return self._response(frame, END_OK, bytes(bits[i] << 4 | bits[i + 1] for i in range(0, count, 2)))
+
+        if command == 0x0403 and subcommand == 0x0000:
+            word_count, dword_count = body[0], body[1]
+            data = b""
+            for index in range(word_count + dword_count):
+                entry = body[2 + index * 4:6 + index * 4]
+                address, code = int.from_bytes(entry[:3], "little"), entry[3]
+                if code not in WORD_DEVICES and code not in BIT_DEVICES:
+                    return self._response(frame, END_DEVICE_ERROR)
+                words = self._read_words(code, address, 1 if index < word_count else 2)
+                if words is None:
+                    return self._response(frame, END_DEVICE_ERROR)
+                data += struct.pack(f"<{len(words)}H", *words)
+            return self._response(frame, END_OK, data)
+
+        if command == 0x1401 and subcommand == 0x0000:
+            address = int.from_bytes(body[:3], "little")
+            code, count = body[3], struct.unpack_from("<H", body, 4)[0]
+            if code not in WORD_DEVICES:
+                return self._response(frame, END_DEVICE_ERROR)
+            self.write(WORD_DEVICES[code], address, list(struct.unpack_from(f"<{count}H", body, 6)))
+            return self._response(frame, END_OK)
+
+        return self._response(frame, END_COMMAND_ERROR)
+
+def main():
+    parser = argparse.ArgumentParser(description="三菱 MCプロトコル（3E/4E バイナリ）PLCシミュレータ")
+    add_simulator_arguments(parser, default_port=5000)
+    args = parser.parse_args()
+
+    simulator = MCSimulator(
+        args.port, faults_from_args(args), load_register_map(args.map), update_ms=args.update_ms
+    ).start()
+    print(f"🏭 MCシミュレータ起動: 0.0.0.0:{args.port} (遅延 {args.latency_ms}ms)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.stop()
+        print(f"🛑 MCシミュレータ停止: {simulator.stats}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Modbus/TCP PLCシミュレータ（キーエンス KV の Modbus 接続の代わり）
+
+Holding Register（FC03/FC04/FC06/FC16）と Coil（FC01/FC02/FC05/FC15）に
+応答する。トランザクションIDをそのまま返すため、パイプライン読み取りの
+接続先にも使える。遅延・障害注入は simulators/base.py の FaultInjector。
+
+Holding Register の初期値は「アドレスの下位16bit」のパターン、Coil は
+アドレスが3の倍数のときON。DM0（Holding 0）は周期的に変化するカウンタ。
+
+使い方:
+    python simulators/modbus_server.py [--port 5020] [--map map.json] [--latency-ms 20]
+
+レジスタマップの例（エリア名は holding / coil）:
+    {"holding": {"100": 1234, "200": [1, 2, 3]}, "coil": {"1603": 1}}
+
+エージェント側の設定例（config/plc_config.json）:
+    "manufacturer": "キーエンス", "plc_ip": "127.0.0.1", "modbus_port": 5020
+"""
+
+import os
+import sys
+import time
+import array
+import struct
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from simulators.base import SimulatorServer, add_simulator_arguments, faults_from_args, load_register_map
+
+MODBUS_SIZE = 0x10000
+# 例外コード
+ILLEGAL_FUNCTION = 0x01
+ILLEGAL_DATA_ADDRESS = 0x02
+SERVER_DEVICE_FAILURE = 0x04
+
+class ModbusSimulator(SimulatorServer):
+    """Modbus/TCP サーバー（Holding Register / Coil）"""
+
+    label = "Modbus"
+
+    def __init__(self, port=5020, faults=None, register_map=None, host="0.0.0.0", update_ms=100):
+        self.holding = array.array("H", (i & 0xFFFF for i in range(MODBUS_SIZE)))
+        self.coils = bytearray(1 if i % 3 == 0 else 0 for i in range(MODBUS_SIZE))
+        super().__init__(port, faults, register_map, host, update_ms)
+
+    def write(self, area, address, values):
+        if area == "coil":
+            self.coils[address:address + len(values)] = bytes(1 if v else 0 for v in values)
+        else:
+            for i, value in enumerate(values):
+                self.holding[address + i] = value & 0xFFFF
+
+    def update(self, counter):
+        self.holding[0] = counter
+
+    async def read_frame(self, reader):
+        header = await reader.readexactly(7)
+        length = struct.unpack_from(">H", header, 4)[0]
+        return header + await reader.readexactly(length - 1)
+
+    def _exception(self, frame, code):
+        function = frame[7] | 0x80
+        return frame[:4] + struct.pack(">HBBB", 3, frame[6], function, code)
+
+    def _response(self, frame, pdu):
+        return frame[:4] + struct.pack(">HB", len(pdu) + 1, frame[6]) + pdu
+
+    def error_frame(self, frame, session):
+        return self._exception(frame, SERVER_DEVICE_FAILURE)
+
+    def handle_frame(self, frame, session):
+        function = frame[7]
+        if function in (0x01, 0x02, 0x03, 0x04):
+            address, count = struct.unpack_from(">HH", frame, 8)
+            if address + count > MODBUS_SIZE:
+                return self._exception(frame, ILLEGAL_DATA_ADDRESS)
+            if function in (0x03, 0x04):
+                data = struct.pack(f">{count}H", *self.holding[address:address + count])
+            else:
+                bits = self.coils[address:address + count]
+                data = bytes(sum(bit << j for j, bit in enumerate(bits[i:i + 8])) for i in range(0, count, 8))
+            return self._response(frame, bytes([function, len(data)]) + data)
+
+        if function in (0x05, 0x06):
+            address, value = struct.unpack_from(">HH", frame, 8)
+            if function == 0x05:
+                self.coils[address] = 1 if value == 0xFF00 else 0
+            else:
+                self.holding[address] = value
+            return self._response(frame, frame[7:12])
+
+        if function in (0x0F, 0x10):
+            address, count, _ = struct.unpack_from(">HHB", frame, 8)
+            data = frame[13:]
+            if function == 0x10:
+                self.write("holding", address, list(struct.unpack(f">{count}H", data[:count * 2])))
+            else:
+                self.write("coil", address, [data[i // 8] >> (i % 8) & 1 for i in range(count)])
+            return self._response(frame, frame[7:12])
+
+        return self._exception(frame, ILLEGAL_FUNCTION)
+
+def main():
+    parser = argparse.ArgumentParser(description="Modbus/TCP PLCシミュレータ")
+    add_simulator_arguments(parser, default_port=5020)
+    args = parser.parse_args()
+
+    simulator = ModbusSimulator(
+        args.port, faults_from_args(args), load_register_map(args.map), update_ms=args.update_ms
+    ).start()
+    print(f"🏭 Modbusシミュレータ起動: 0.0.0.0:{args.port} (遅延 {args.latency_ms}ms)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.stop()
+        print(f"🛑 Modbusシミュレータ停止: {simulator.stats}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+シーメンスS7 PLCシミュレータ（snap7 サーバー）
+
+DB・M・I・Q エリアを持つ snap7 サーバーを起動し、実機の代わりに
+read_multi_vars の動作確認・スループット計測の接続先として使う。
+
+エリアの初期値は「バイト位置の下位8bit」のパターンで、DB1 の先頭には
+周期的に変化する値（DBW0: カウンタ, DBD4: float32 の正弦波）を書き込む。
+
+使い方:
+    python simulators/s7_server.py [--port 1102] [--dbs 1,2] [--size 1024]
+
+エージェント側の設定例（config/plc_config.json）:
+    "manufacturer": "シーメンス", "plc_ip": "127.0.0.1", "s7_port": 1102
+"""
+
+import math
+import time
+import ctypes
+import struct
+import argparse
+import threading
+
+import snap7
+import snap7.server
+
+try:
+    from snap7.type import SrvArea
+    SERVER_AREAS = {"DB": SrvArea.DB, "M": SrvArea.MK, "I": SrvArea.PE, "Q": SrvArea.PA}
+    BYTEARRAY_AREAS = True       # python-snap7 3.x: bytearray を登録し、そのまま書き換えられる
+except ImportError:
+    from snap7.types import srvAreaDB, srvAreaMK, srvAreaPE, srvAreaPA
+    SERVER_AREAS = {"DB": srvAreaDB, "M": srvAreaMK, "I": srvAreaPE, "Q": srvAreaPA}
+    BYTEARRAY_AREAS = False      # python-snap7 1.x/2.x: ctypes 配列を共有メモリとして登録
+
+def _make_area(size):
+    """パターン値で初期化したエリアバッファ"""
+    pattern = bytes(i & 0xFF for i in range(size))
+    if BYTEARRAY_AREAS:
+        return bytearray(pattern)
+    buffer = (ctypes.c_ubyte * size)()
+    buffer[:] = pattern
+    return buffer
+
+class S7Simulator:
+    """snap7 サーバーにエリアを登録し、DB1 の先頭を周期的に更新するシミュレータ"""
+
+    def __init__(self, port=1102, db_numbers=(1, 2), size=1024, update_ms=100):
+        self.port = port
+        self.update_ms = update_ms
+        self.server = snap7.server.Server()
+        self.areas = {}
+        for db_number in db_numbers:
+            self._register("DB", db_number, size)
+        for name in ("M", "I", "Q"):
+            self._register(name, 0, 256)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _register(self, name, index, size):
+        buffer = _make_area(size)
+        self.server.register_area(SERVER_AREAS[name], index, buffer)
+        self.areas[(name, index)] = buffer
+
+    def write(self, name, index, offset, data):
+        """エリアに値を書き込む（ビッグエンディアンのバイト列）"""
+        self.areas[(name, index)][offset:offset + len(data)] = data
+
+    def _update_loop(self):
+        counter = 0
+        first_db = min(index for name, index in self.areas if name == "DB")
+        while not self._stop.wait(self.update_ms / 1000.0):
+            counter = (counter + 1) & 0x7FFF
+            self.write("DB", first_db, 0, struct.pack(">h", counter))
+            self.write("DB", first_db, 4, struct.pack(">f", 50.0 + 10.0 * math.sin(counter / 20.0)))
+
+    def start(self):
+        self.server.start(tcp_port=self.port)
+        self._thread = threading.Thread(target=self._update_loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.server.stop()
+        self.server.destroy()
+
+def main():
+    parser = argparse.ArgumentParser(description="シーメンスS7 PLCシミュレータ")
+    parser.add_argument("--port", type=int, default=1102, help="待ち受けポート（102は要root）")
+    parser.add_argument("--dbs", default="1,2", help="登録するDB番号（カンマ区切り）")
+    parser.add_argument("--size", type=int, default=1024, help="DBあたりのバイト数")
+    parser.add_argument("--update-ms", type=int, default=100, help="DB1先頭の値の更新周期")
+    args = parser.parse_args()
+
+    db_numbers = [int(n) for n in args.dbs.split(",") if n.strip()]
+    simulator = S7Simulator(args.port, db_numbers, args.size, args.update_ms).start()
+    print(f"🏭 S7シミュレータ起動: 0.0.0.0:{args.port} (DB{db_numbers}, {args.size}バイト)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.stop()
+        print("🛑 S7シミュレータ停止")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import os
+from datetime import datetime, timedelta
+
+try:
+    import msgpack
+except ImportError:  # msgpack が無い環境では JSON で送信
+    msgpack = None
+
+# ログのまとめ送信の形式: json（既定）/ msgpack（列形式のバイナリ）
+TELEMETRY_FORMAT = os.getenv("TELEMETRY_FORMAT", "json").lower()
+
+MSGPACK_CONTENT_TYPE = "application/x-msgpack"
+# 列形式バッチのスキーマID（形式を変更したらバージョンを上げる）
+LOG_BATCH_SCHEMA = "plc-log-batch/1"
+
+EPOCH = datetime(1970, 1, 1)
+ONE_MS = timedelta(milliseconds=1)
+
+# 列の型: i = 整数, f = 浮動小数点, v = その他（文字列など）
+COLUMN_INT = "i"
+COLUMN_FLOAT = "f"
+COLUMN_ANY = "v"
+
+def msgpack_available():
+    return msgpack is not None
+
+def _column_type(values):
+    present = [v for v in values if v is not None]
+    if all(isinstance(v, int) for v in present):
+        return COLUMN_INT
+    if all(isinstance(v, (int, float)) for v in present):
+        return COLUMN_FLOAT
+    return COLUMN_ANY
+
+def encode_log_batch(records):
+    """ログの列を列形式の MessagePack にまとめる
+
+    records: equipment_id / payload / partial / timestamp（UTC の naive datetime）属性を持つ記録
+    形式:
+        schema: スキーマID
+        equipment_ids: 設備IDの一覧、equipment: 行ごとの設備IDの番号
+        t0: 先頭行の時刻（epoch ミリ秒）、dt: 行ごとの直前の行からの差（ミリ秒、先頭は0）
+        partial: 変化分のみの行の番号
+        columns: {項目名: [型, 行ごとの値]}（値が無い項目は nil）
+    """
+    if msgpack is None:
+        raise RuntimeError("msgpack がインストールされていません")
+    equipment_ids = []
+    equipment_index = {}
+    equipment = []
+    times = []
+    keys = {}
+    for record in records:
+        index = equipment_index.get(record.equipment_id)
+        if index is None:
+            index = equipment_index[record.equipment_id] = len(equipment_ids)
+            equipment_ids.append(record.equipment_id)
+        equipment.append(index)
+        times.append((record.timestamp - EPOCH) // ONE_MS)
+        for key in record.payload:
+            keys.setdefault(key, None)
+
+    columns = {}
+    for key in keys:
+        values = [record.payload.get(key) for record in records]
+        column_type = _column_type(values)
+        if column_type == COLUMN_FLOAT:
+            values = [float(v) if v is not None else None for v in values]
+        columns[key] = [column_type, values]
+
+    return msgpack.packb({
+        "schema": LOG_BATCH_SCHEMA,
+        "equipment_ids": equipment_ids,
+        "equipment": equipment,
+        "t0": times[0] if times else 0,
+        "dt": [0] + [times[i] - times[i - 1] for i in range(1, len(times))] if times else [],
+        "partial": [i for i, record in enumerate(records) if record.partial],
+        "columns": columns,
+    }, use_bin_type=True)
+
+def decode_log_batch(body):
+    """列形式の MessagePack をログの配列（/api/logs と同じ形式の dict、timestamp は datetime）に戻す"""
+    if msgpack is None:
+        raise RuntimeError("msgpack がインストールされていません")
+    try:
+        batch = msgpack.unpackb(body, raw=False, strict_map_key=False)
+    except (ValueError, msgpack.UnpackException) as e:
+        raise ValueError(f"MessagePack を解析できません: {e}")
+    if not isinstance(batch, dict) or batch.get("schema") != LOG_BATCH_SCHEMA:
+        raise ValueError(f"未対応のスキーマ: {batch.get('schema') if isinstance(batch, dict) else None}")
+
+    equipment_ids = batch["equipment_ids"]
+    equipment = batch["equipment"]
+    deltas = batch["dt"]
+    columns = batch["columns"]
+    count = len(equipment)
+    if len(deltas) != count or any(len(column[1]) != count for column in columns.values()):
+        raise ValueError("列の長さが一致しません")
+
+    items = []
+    elapsed = batch["t0"]
+    for row in range(count):
+        elapsed += deltas[row]
+        item = {"equipment_id": equipment_ids[equipment[row]], "timestamp": EPOCH + elapsed * ONE_MS}
+        for key, (_, values) in columns.items():
+            if values[row] is not None:
+                item[key] = values[row]
+        items.append(item)
+    for row in batch.get("partial", []):
+        items[row]["partial"] = True
+    return items